@@ -1,13 +1,26 @@
 from django.contrib import admin
-from .models import FileUpload, ProductBatch, Product
+from .models import (
+    FileUpload, ProductBatch, Product, ImportProfile, ValidationResult,
+    ProtheusProduct, ProtheusSupplier, RegistrySyncState, NcmCode, TipiRate, FiscalTableLoad,
+)
+
+
+@admin.register(ImportProfile)
+class ImportProfileAdmin(admin.ModelAdmin):
+    list_display = ['fornecedor_code', 'file_type', 'sheet_name', 'header_row', 'product_group', 'normalization_rule', 'last_used_at']
+    list_filter = ['file_type', 'normalization_rule']
+    search_fields = ['fornecedor_code']
+    readonly_fields = ['created_at', 'updated_at', 'last_used_at']
 
 
 @admin.register(FileUpload)
 class FileUploadAdmin(admin.ModelAdmin):
-    list_display = ['id', 'file_type', 'uploaded_by', 'uploaded_at', 'status', 'total_records', 'processed_records']
-    list_filter = ['file_type', 'status', 'uploaded_at']
-    search_fields = ['uploaded_by__username']
-    readonly_fields = ['uploaded_at']
+    list_display = ['id', 'file_type', 'uploaded_by', 'uploaded_at', 'status', 'total_records', 'processed_records', 'processing_time', 'rows_per_second']
+    list_filter = ['file_type', 'status', 'multi_sheet', 'import_mode', 'uploaded_at']
+    search_fields = ['uploaded_by__username', 'fornecedor_code']
+    readonly_fields = ['uploaded_at', 'processing_time', 'rows_per_second', 'peak_memory_kb', 'stage_metrics', 'column_mapping',
+                       'parsed_cache', 'delta_summary', 'file_report']
+    raw_id_fields = ['parent']
     ordering = ['-uploaded_at']
 
 
@@ -51,7 +64,7 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('supplier_code', 'supplier_name')
         }),
         ('Outros', {
-            'fields': ('barcode', 'active', 'observations')
+            'fields': ('barcode', 'active', 'observations', 'source_sheet')
         }),
         ('Sincronização Protheus', {
             'fields': ('synced_to_protheus', 'protheus_sync_date', 'protheus_error')
@@ -60,3 +73,52 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'updated_at', 'raw_data')
         }),
     )
+
+
+@admin.register(ValidationResult)
+class ValidationResultAdmin(admin.ModelAdmin):
+    list_display = ['normalized_code', 'product_group', 'supplier_code', 'is_valid', 'validated_code', 'checked_at']
+    list_filter = ['is_valid', 'product_group', 'supplier_code']
+    search_fields = ['normalized_code', 'validated_code']
+    readonly_fields = ['checked_at']
+
+
+@admin.register(ProtheusProduct)
+class ProtheusProductAdmin(admin.ModelAdmin):
+    list_display = ['code', 'description', 'product_group', 'ncm_code', 'ipi_percentage', 'blocked', 'source_modified_at']
+    list_filter = ['blocked', 'product_group']
+    search_fields = ['code', 'description']
+    readonly_fields = ['source_modified_at', 'synced_at']
+
+
+@admin.register(ProtheusSupplier)
+class ProtheusSupplierAdmin(admin.ModelAdmin):
+    list_display = ['code', 'store', 'name', 'cnpj', 'blocked', 'source_modified_at']
+    list_filter = ['blocked']
+    search_fields = ['code', 'name', 'cnpj']
+    readonly_fields = ['source_modified_at', 'synced_at']
+
+
+@admin.register(RegistrySyncState)
+class RegistrySyncStateAdmin(admin.ModelAdmin):
+    list_display = ['registry', 'watermark', 'last_synced_at', 'last_source', 'records_synced', 'version']
+    readonly_fields = ['watermark', 'last_synced_at', 'last_source', 'records_synced', 'version']
+
+
+@admin.register(NcmCode)
+class NcmCodeAdmin(admin.ModelAdmin):
+    list_display = ['code', 'description']
+    search_fields = ['code', 'description']
+
+
+@admin.register(TipiRate)
+class TipiRateAdmin(admin.ModelAdmin):
+    list_display = ['ncm_code', 'ex_tipi', 'ipi_rate']
+    search_fields = ['ncm_code']
+
+
+@admin.register(FiscalTableLoad)
+class FiscalTableLoadAdmin(admin.ModelAdmin):
+    list_display = ['table', 'source', 'records', 'loaded_at']
+    list_filter = ['table']
+    readonly_fields = ['table', 'source', 'records', 'loaded_at']
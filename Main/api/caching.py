@@ -0,0 +1,90 @@
+"""
+GET condicional (ETag/Last-Modified) e cache curto das listagens consultadas
+periodicamente pelo integrador do Protheus
+
+A versão dos dados de uma resposta é, para cada queryset que a compõe, a
+quantidade de linhas e o maior updated_at (um único aggregate por queryset,
+sem serializar nada). Se o cliente já tem essa versão, a resposta é um 304.
+
+O cache guarda os dados serializados com a versão na chave: qualquer escrita
+em produtos ou lotes (save, update com updated_at, bulk_create, exclusão) muda
+a versão e a entrada antiga deixa de ser consultada, em todos os workers.
+"""
+import hashlib
+from typing import Callable, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, QuerySet
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+CACHE_KEY_PREFIX = 'api:list'
+
+
+def data_version(querysets: Iterable[QuerySet]) -> Tuple[str, int, Optional[int]]:
+    """
+    Versão dos dados das querysets
+
+    Returns:
+        (versão, total de linhas, maior updated_at em timestamp ou None)
+    """
+    parts = []
+    rows = 0
+    last_modified = None
+    for queryset in querysets:
+        aggregate = queryset.order_by().aggregate(rows=Count('pk'), updated=Max('updated_at'))
+        updated = aggregate['updated']
+        parts.append(f"{aggregate['rows']}:{updated.isoformat() if updated else '-'}")
+        rows += aggregate['rows']
+        if updated and (last_modified is None or updated > last_modified):
+            last_modified = updated
+
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return '|'.join(parts), rows, timestamp
+
+
+class ConditionalListMixin:
+    """
+    Respostas com ETag/Last-Modified (304 quando nada mudou) e cache curto
+    dos dados serializados
+    """
+
+    def conditional_response(self, request, querysets: Iterable[QuerySet],
+                             render: Callable[[], Response]) -> Response:
+        # API navegável (HTML) fica de fora: a página depende do usuário e do formulário
+        if request.accepted_renderer.format != 'json':
+            return render()
+
+        version, rows, last_modified = data_version(querysets)
+        digest = hashlib.sha1(f"{request.get_full_path()}|{version}".encode()).hexdigest()
+        etag = quote_etag(digest)
+
+        response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = self._cached_response(digest, rows, render)
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # O cliente sempre revalida; só o 304 evita o corpo
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    @staticmethod
+    def _cached_response(digest: str, rows: int, render: Callable[[], Response]) -> Response:
+        ttl = getattr(settings, 'API_CACHE_TTL', 10)
+        if ttl <= 0 or rows > getattr(settings, 'API_CACHE_MAX_ROWS', 10000):
+            return render()
+
+        key = f"{CACHE_KEY_PREFIX}:{digest}"
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = render()
+        if response.status_code == 200:
+            cache.set(key, response.data, ttl)
+        return response
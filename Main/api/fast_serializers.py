@@ -0,0 +1,123 @@
+"""
+Leitura rápida para listagens grandes: linhas montadas a partir de
+.values_list() com a mesma saída do ModelSerializer correspondente
+
+A lista de colunas e os conversores são calculados uma vez a partir dos campos
+do serializer. Por linha, só os valores que o DRF transforma (Decimal para
+texto quantizado, datetime para ISO 8601 no fuso atual) passam por conversão;
+texto, inteiros e booleanos seguem como vieram do banco.
+"""
+import decimal
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+# Campos do DRF cuja representação é o próprio valor lido do banco
+PASSTHROUGH_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+
+
+def _decimal_converter(field: serializers.DecimalField) -> Callable[[], Callable]:
+    """
+    Equivalente ao DecimalField.to_representation (sem localize/normalize)
+    """
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if field.localize or field.normalize_output or not coerce_to_string:
+        raise ValueError(f"Campo {field.field_name}: só Decimal como texto tem leitura rápida")
+
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    quantum = decimal.Decimal('.1') ** field.decimal_places if field.decimal_places is not None else None
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        if quantum is not None:
+            value = value.quantize(quantum, rounding=rounding, context=context)
+        return '{:f}'.format(value)
+
+    return lambda: convert
+
+
+def _datetime_converter(field: serializers.DateTimeField) -> Callable[[], Callable]:
+    """
+    Equivalente ao DateTimeField.to_representation no formato ISO 8601
+
+    O fuso (o ativo na requisição) é resolvido uma vez por serialização, não por valor.
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        raise ValueError(f"Campo {field.field_name}: só datas ISO 8601 têm leitura rápida")
+
+    def make_converter():
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+
+        def convert(value):
+            if field_timezone is not None and value.tzinfo is not None:
+                value = value.astimezone(field_timezone)
+            else:
+                value = field.enforce_timezone(value)
+            value = value.isoformat()
+            if value.endswith('+00:00'):
+                value = value[:-6] + 'Z'
+            return value
+
+        return convert
+
+    return make_converter
+
+
+class ValuesSerializer:
+    """
+    Serializa querysets via .values_list() com a saída de `serializer_class`
+
+    Aceita campos de modelo e campos com `source` pontuado (FK); campos
+    calculados (SerializerMethodField, serializers aninhados) não são suportados.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.names, self.columns, self.converters = self._build(serializer_class())
+
+    @staticmethod
+    def _build(serializer) -> Tuple[List[str], List[str], List[Tuple[int, Callable[[], Callable]]]]:
+        names = []
+        columns = []
+        converters = []
+        for field in serializer._readable_fields:
+            if field.source == '*' or isinstance(field, (serializers.SerializerMethodField, serializers.BaseSerializer)):
+                raise ValueError(f"Campo {field.field_name} não pode ser lido por .values()")
+
+            if isinstance(field, serializers.DecimalField):
+                converters.append((len(names), _decimal_converter(field)))
+            elif isinstance(field, serializers.DateTimeField):
+                converters.append((len(names), _datetime_converter(field)))
+            elif not isinstance(field, PASSTHROUGH_FIELDS):
+                raise ValueError(f"Campo {field.field_name} ({type(field).__name__}) sem leitura rápida")
+
+            names.append(field.field_name)
+            columns.append('__'.join(field.source_attrs))
+        return names, columns, converters
+
+    def values(self, queryset):
+        """
+        Queryset de tuplas na ordem dos campos (pode ser paginada antes de to_rows)
+        """
+        return queryset.values_list(*self.columns)
+
+    def to_rows(self, tuples: Iterable[tuple]) -> List[Dict[str, Any]]:
+        names = self.names
+        converters = [(index, make_converter()) for index, make_converter in self.converters]
+        rows = []
+        for values in tuples:
+            values = list(values)
+            for index, convert in converters:
+                if values[index] is not None:
+                    values[index] = convert(values[index])
+            rows.append(dict(zip(names, values)))
+        return rows
+
+    def rows(self, queryset) -> List[Dict[str, Any]]:
+        return self.to_rows(self.values(queryset))
@@ -0,0 +1,31 @@
+"""
+JSONRenderer com orjson para as listagens grandes da API
+
+Gera os mesmos bytes do JSONRenderer do DRF (compacto, UTF-8, \\u2028/\\u2029
+escapados). Datas e tipos que o orjson não conhece passam pelo encoder do DRF;
+saída indentada, ensure_ascii ou valores que o orjson recusa (chaves não
+textuais, inteiros acima de 64 bits) caem no JSONRenderer padrão.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson é opcional
+    orjson = None
+
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS if orjson else 0
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
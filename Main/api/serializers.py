@@ -35,6 +35,7 @@ class ProductSerializer(serializers.ModelSerializer):
             'weight_unit',
             'active',
             'observations',
+            'source_sheet',
             'synced_to_protheus',
             'protheus_sync_date',
             'created_at',
@@ -114,5 +115,14 @@ class FileUploadSerializer(serializers.ModelSerializer):
             'processed_records',
             'error_message',
             'batch_code',
+            'processing_time',
+            'rows_per_second',
+            'peak_memory_kb',
+            'stage_metrics',
+            'import_mode',
+            'delta_summary',
+        ]
+        read_only_fields = [
+            'id', 'uploaded_at', 'uploaded_by_username', 'batch_code',
+            'processing_time', 'rows_per_second', 'peak_memory_kb', 'stage_metrics', 'delta_summary',
         ]
-        read_only_fields = ['id', 'uploaded_at', 'uploaded_by_username', 'batch_code']
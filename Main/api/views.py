@@ -2,10 +2,14 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
 from django.utils import timezone
 from django.db.models import Q
 
 from Main.models import Product, ProductBatch, FileUpload
+from .caching import ConditionalListMixin
+from .fast_serializers import ValuesSerializer
+from .renderers import FastJSONRenderer
 from .serializers import (
     ProductSerializer,
     ProductBatchSerializer,
@@ -14,8 +18,11 @@ from .serializers import (
     ProductSyncUpdateSerializer
 )
 
+# Listagens de produtos sem instanciar modelos: mesma saída do ProductSerializer
+PRODUCT_ROWS = ValuesSerializer(ProductSerializer)
 
-class ProductViewSet(viewsets.ModelViewSet):
+
+class ProductViewSet(ConditionalListMixin, viewsets.ModelViewSet):
     queryset = Product.objects.select_related('batch').all()
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated]
@@ -23,6 +30,18 @@ class ProductViewSet(viewsets.ModelViewSet):
     search_fields = ['product_code', 'description', 'barcode', 'supplier_name']
     ordering_fields = ['created_at', 'product_code', 'description', 'sale_price']
     ordering = ['-created_at']
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(request, [queryset], lambda: self._list_rows(queryset))
+
+    def _list_rows(self, queryset):
+        rows = PRODUCT_ROWS.values(queryset)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(PRODUCT_ROWS.to_rows(page))
+        return Response(PRODUCT_ROWS.to_rows(rows))
 
     @action(detail=False, methods=['get'])
     def pending_sync(self, request):
@@ -35,11 +54,13 @@ class ProductViewSet(viewsets.ModelViewSet):
         if batch_code:
             products = products.filter(batch__batch_code=batch_code)
 
-        serializer = self.get_serializer(products, many=True)
-        return Response({
-            'count': products.count(),
-            'results': serializer.data
-        })
+        def render():
+            return Response({
+                'count': products.count(),
+                'results': PRODUCT_ROWS.rows(products)
+            })
+
+        return self.conditional_response(request, [products], render)
 
     @action(detail=False, methods=['post'])
     def sync(self, request):
@@ -59,11 +80,9 @@ class ProductViewSet(viewsets.ModelViewSet):
         else:
             products = self.queryset.filter(synced_to_protheus=False)
 
-        product_serializer = self.get_serializer(products, many=True)
-
         return Response({
             'count': products.count(),
-            'products': product_serializer.data
+            'products': PRODUCT_ROWS.rows(products)
         })
 
     @action(detail=False, methods=['post'])
@@ -140,11 +159,23 @@ class ProductViewSet(viewsets.ModelViewSet):
         })
 
 
-class ProductBatchViewSet(viewsets.ReadOnlyModelViewSet):
+class ProductBatchViewSet(ConditionalListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = ProductBatch.objects.all().order_by('-created_at')
     serializer_class = ProductBatchSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'batch_code'
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def list(self, request, *args, **kwargs):
+        """
+        Lotes com total de produtos sincronizados: a versão inclui os produtos dos lotes
+        """
+        render = super().list
+        batches = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(
+            request, [batches, Product.objects.filter(batch__in=batches)],
+            lambda: render(request, *args, **kwargs)
+        )
 
     @action(detail=True, methods=['get'])
     def products(self, request, batch_code=None):
@@ -154,11 +185,10 @@ class ProductBatchViewSet(viewsets.ReadOnlyModelViewSet):
         batch = self.get_object()
         products = batch.products.all()
 
-        serializer = ProductSerializer(products, many=True)
         return Response({
             'batch_code': batch.batch_code,
             'total_products': products.count(),
-            'products': serializer.data
+            'products': PRODUCT_ROWS.rows(products)
         })
 
     @action(detail=True, methods=['post'])
@@ -171,7 +201,8 @@ class ProductBatchViewSet(viewsets.ReadOnlyModelViewSet):
         batch.products.update(
             synced_to_protheus=True,
             protheus_sync_date=timezone.now(),
-            protheus_error=None
+            protheus_error=None,
+            updated_at=timezone.now()
         )
 
         batch.synced_to_protheus = True
@@ -0,0 +1,150 @@
+import random
+import xml.etree.ElementTree as ET
+from typing import Dict, List
+
+import pandas as pd
+
+from Main.services.excel_parser import ExcelParser
+from Main.services.xml_parser import NFE_NAMESPACE, XMLParser
+
+
+SUPPLIERS = [
+    ('JF', 'JF Máquinas'),
+    ('JAN', 'Jan Implementos'),
+    ('TATU', 'Tatu Marchesan'),
+    ('JACTO', 'Máquinas Agrícolas Jacto'),
+    ('KUHN', 'Kuhn do Brasil'),
+]
+
+ORIGINS = ['0', '1', '2']
+ICMS_RATES = ['4', '7', '12', '18']
+
+
+def _pick_aliases(mapping: Dict[str, List[str]], variant: int) -> Dict[str, str]:
+    """
+    Escolhe um alias por campo, variando conforme o número da variante,
+    sem repetir cabeçalhos (alguns aliases são compartilhados entre campos)
+    """
+    chosen = {}
+    used = set()
+    for field_name, aliases in mapping.items():
+        for offset in range(len(aliases)):
+            alias = aliases[(variant + offset) % len(aliases)]
+            if alias.lower() not in used:
+                chosen[field_name] = alias
+                used.add(alias.lower())
+                break
+    return chosen
+
+
+def _product_row(rng: random.Random, idx: int) -> Dict[str, str]:
+    supplier_code, supplier_name = rng.choice(SUPPLIERS)
+    price = rng.uniform(1, 5000)
+    return {
+        'codigo': f"{rng.randint(0, 99):02d}{idx:08d}",
+        'descricao': f"PECA SINTETICA {idx} {supplier_name.upper()}",
+        'unidade': rng.choice(['UN', 'PC', 'KG', 'CX']),
+        'preco_venda': f"{price:.2f}".replace('.', ','),
+        'preco_custo': f"{price * 0.7:.2f}",
+        'quantidade': str(rng.randint(1, 200)),
+        'valor_unitario': f"{price:.2f}",
+        'ncm': f"8432{rng.randint(1000, 9999)}",
+        'ipi': rng.choice(['0', '3.25', '5']),
+        'icms': rng.choice(ICMS_RATES),
+        'origem': rng.choice(ORIGINS),
+        'fornecedor_codigo': supplier_code,
+        'fornecedor_nome': supplier_name,
+        'codigo_barras': f"789{rng.randint(10 ** 9, 10 ** 10 - 1)}",
+        'peso': f"{rng.uniform(0.1, 80):.3f}",
+    }
+
+
+def generate_rows(rows: int, seed: int = 0) -> List[Dict[str, str]]:
+    rng = random.Random(seed)
+    return [_product_row(rng, idx) for idx in range(rows)]
+
+
+def generate_excel(path: str, rows: int, seed: int = 0, variant: int = 0) -> str:
+    """
+    Gera uma planilha sintética usando aliases de ExcelParser.COLUMN_MAPPING
+    """
+    data = generate_rows(rows, seed)
+    aliases = _pick_aliases(ExcelParser.COLUMN_MAPPING, variant)
+    columns = {field_name: aliases[field_name] for field_name in data[0]}
+
+    df = pd.DataFrame(data).rename(columns=columns)
+    df.to_excel(path, index=False)
+    return path
+
+
+# Campos do XML (TAG_MAPPING) equivalentes às colunas geradas para o Excel
+XML_FIELDS = {
+    'codigo': 'product_code',
+    'descricao': 'description',
+    'unidade': 'unit_of_measure',
+    'preco_venda': 'sale_price',
+    'preco_custo': 'cost_price',
+    'quantidade': 'quantity',
+    'valor_unitario': 'unit_value',
+    'ncm': 'ncm_code',
+    'ipi': 'ipi_percentage',
+    'icms': 'icms_percentage',
+    'origem': 'origin',
+    'fornecedor_codigo': 'supplier_code',
+    'fornecedor_nome': 'supplier_name',
+    'codigo_barras': 'barcode',
+    'peso': 'weight',
+}
+
+
+def generate_xml(path: str, rows: int, seed: int = 0, variant: int = 0) -> str:
+    """
+    Gera um XML sintético usando aliases de XMLParser.TAG_MAPPING
+    """
+    data = generate_rows(rows, seed)
+    aliases = _pick_aliases(XMLParser.TAG_MAPPING, variant)
+
+    root = ET.Element('produtos')
+    for row in data:
+        product_elem = ET.SubElement(root, 'produto')
+        for field_name, value in row.items():
+            ET.SubElement(product_elem, aliases[XML_FIELDS[field_name]]).text = value
+
+    ET.ElementTree(root).write(path, encoding='utf-8', xml_declaration=True)
+    return path
+
+
+def generate_nfe(path: str, rows: int, seed: int = 0) -> str:
+    """
+    Gera uma NF-e sintética (nfeProc no namespace do portal fiscal) com um det por linha
+    """
+    data = generate_rows(rows, seed)
+    ns = f"{{{NFE_NAMESPACE}}}"
+
+    root = ET.Element(f"{ns}nfeProc", versao='4.00')
+    inf_nfe = ET.SubElement(ET.SubElement(root, f"{ns}NFe"), f"{ns}infNFe", Id='NFe0000', versao='4.00')
+    emit = ET.SubElement(inf_nfe, f"{ns}emit")
+    ET.SubElement(emit, f"{ns}CNPJ").text = '12345678000199'
+    ET.SubElement(emit, f"{ns}xNome").text = data[0]['fornecedor_nome'] if data else ''
+
+    for idx, row in enumerate(data, start=1):
+        det = ET.SubElement(inf_nfe, f"{ns}det", nItem=str(idx))
+        prod = ET.SubElement(det, f"{ns}prod")
+        for tag, value in (
+            ('cProd', row['codigo']), ('cEAN', row['codigo_barras']), ('xProd', row['descricao']),
+            ('NCM', row['ncm']), ('CFOP', '5102'), ('uCom', row['unidade']), ('qCom', row['quantidade']),
+            ('vUnCom', row['valor_unitario']), ('vProd', row['valor_unitario']),
+        ):
+            ET.SubElement(prod, f"{ns}{tag}").text = value
+        imposto = ET.SubElement(det, f"{ns}imposto")
+        icms = ET.SubElement(ET.SubElement(imposto, f"{ns}ICMS"), f"{ns}ICMS00")
+        for tag, value in (('orig', row['origem']), ('CST', '00'), ('modBC', '3'),
+                           ('vBC', row['valor_unitario']), ('pICMS', row['icms'])):
+            ET.SubElement(icms, f"{ns}{tag}").text = value
+        ipi_trib = ET.SubElement(ET.SubElement(imposto, f"{ns}IPI"), f"{ns}IPITrib")
+        ET.SubElement(ipi_trib, f"{ns}CST").text = '50'
+        ET.SubElement(ipi_trib, f"{ns}pIPI").text = row['ipi']
+
+    ET.register_namespace('', NFE_NAMESPACE)
+    ET.ElementTree(root).write(path, encoding='utf-8', xml_declaration=True)
+    return path
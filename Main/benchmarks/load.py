@@ -0,0 +1,267 @@
+"""
+Benchmark de carga dos perfis de servidor do gunicorn.conf.py
+
+O portal sobe num gunicorn de verdade com cada perfil (workers sync ou gthread
+sobre WSGI, uvicorn sobre ASGI), apontando para o stub do Protheus com atraso
+(um ERP lento). Muitas requisições concorrentes são disparadas e, durante a
+carga, uma página leve (login) é consultada periodicamente: com workers sync
+ela espera na fila atrás das chamadas ao Protheus; com ASGI continua respondendo.
+
+Cenários:
+    protheus: validate-codes e submit (espera pelo Protheus)
+    pages: listagem de produtos e API (CPU e banco)
+"""
+import asyncio
+import os
+import secrets
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+import httpx
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import Client
+
+from .runner import BENCH_PASSWORD, BENCH_USERNAME, BenchmarkRunner
+from .stub_protheus import run_stub_server
+
+# GUNICORN_WORKER_CLASS do gunicorn.conf.py
+PROFILES = ('sync', 'gthread', 'uvicorn')
+
+SCENARIOS = ('protheus', 'pages')
+
+PROBE_INTERVAL = 0.25
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+
+def _latency_summary(latencies: List[float]) -> Dict[str, Any]:
+    if not latencies:
+        return {'p50_s': None, 'p95_s': None, 'max_s': None}
+    return {
+        'p50_s': round(statistics.median(latencies), 4),
+        'p95_s': round(_percentile(latencies, 95), 4),
+        'max_s': round(max(latencies), 4),
+    }
+
+
+class LoadBenchmark:
+    """
+    Executa a mesma carga contra cada tipo de servidor
+
+    Deve rodar sobre um banco de teste SQLite em arquivo (database_path): o
+    gunicorn é outro processo e acessa o mesmo arquivo.
+    """
+
+    def __init__(self, database_path: str, requests: int = 40, concurrency: int = 40, workers: int = 2,
+                 threads: int = 4, delay: float = 1.0, rows: int = 20, batches: int = 4, timeout: float = 15.0,
+                 scenario: str = 'protheus', log=None):
+        self.database_path = database_path
+        self.scenario = scenario
+        self.threads = threads
+        self.requests = requests
+        self.concurrency = concurrency
+        self.workers = workers
+        self.delay = delay
+        self.rows = rows
+        self.batches = batches
+        self.timeout = timeout
+        self.log = log or (lambda message: None)
+        self.batch_codes: List[str] = []
+        self.product_ids: Dict[str, List[int]] = {}
+        self.cookies: Dict[str, str] = {}
+        self.csrf_token = secrets.token_hex(16)
+
+    # ------------------------------------------------------------------
+    # Preparação
+    # ------------------------------------------------------------------
+
+    def prepare(self):
+        runner = BenchmarkRunner(sizes=[self.rows])
+        for _ in range(self.batches):
+            batch = runner._create_batch(self.rows)
+            batch.product_group = '0007'
+            batch.fornecedor_code = 'TATU'
+            batch.save()
+            batch.products.update(validation_status='VALID', supplier_code='TATU')
+            self.batch_codes.append(batch.batch_code)
+            self.product_ids[batch.batch_code] = list(batch.products.values_list('id', flat=True))
+
+        user, created = User.objects.get_or_create(username=BENCH_USERNAME)
+        if created:
+            user.set_password(BENCH_PASSWORD)
+            user.save()
+        client = Client()
+        client.force_login(user)
+        self.cookies = {
+            settings.SESSION_COOKIE_NAME: client.cookies[settings.SESSION_COOKIE_NAME].value,
+            settings.CSRF_COOKIE_NAME: self.csrf_token,
+        }
+
+    # ------------------------------------------------------------------
+    # Servidor
+    # ------------------------------------------------------------------
+
+    def _start_server(self, profile: str, port: int, stub_url: str) -> subprocess.Popen:
+        env = {
+            **os.environ,
+            'GUNICORN_WORKER_CLASS': profile,
+            'GUNICORN_WORKERS': str(self.workers),
+            'GUNICORN_THREADS': str(self.threads),
+            'GUNICORN_BIND': f"127.0.0.1:{port}",
+            'GUNICORN_TIMEOUT': str(int(self.timeout * 4)),
+            'GUNICORN_LOG_LEVEL': 'warning',
+            'DATABASE_URL': f"sqlite:///{self.database_path}",
+            'DB_CONN_MAX_AGE': '0',
+            'PROTHEUS_API_URL': stub_url,
+            'PRODUCT_VALIDATION_SOURCE': 'seek',
+            # Sem cache de resultados: toda validação consulta o Protheus
+            'VALIDATION_CACHE_TTL': '0',
+            'VALIDATION_NEGATIVE_CACHE_TTL': '0',
+            'QUERY_TIMING_ENABLED': 'False',
+        }
+        return subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', os.path.join(settings.BASE_DIR, 'gunicorn.conf.py')],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+    @staticmethod
+    def _wait_ready(base_url: str, process: subprocess.Popen, timeout: float = 30.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"gunicorn terminou com código {process.returncode}")
+            try:
+                httpx.get(f"{base_url}/main/login/", timeout=1.0)
+                return
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        raise RuntimeError(f"gunicorn não respondeu em {timeout:.0f}s")
+
+    # ------------------------------------------------------------------
+    # Carga
+    # ------------------------------------------------------------------
+
+    def _request(self, index: int):
+        """
+        (tipo, método, URL, dados, status esperado) da requisição de número `index`
+        """
+        batch_code = self.batch_codes[index % len(self.batch_codes)]
+        if self.scenario == 'pages':
+            if index % 2:
+                return 'api_products', 'GET', '/api/products/', None, 200
+            return 'product_list', 'GET', f"/main/products/?batch={batch_code}", None, 200
+
+        if index % 2:
+            return 'submit', 'POST', f"/main/submit/{batch_code}/", {
+                'filial': '0501', 'loja': '01', 'condicao_pagamento': '001',
+            }, 302
+        return 'validate', 'POST', '/main/validate-codes/', {'product_ids[]': self.product_ids[batch_code]}, 200
+
+    async def _load(self, base_url: str) -> Dict[str, Any]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        results: Dict[str, List[float]] = {}
+        errors: Dict[str, int] = {}
+        probes: List[float] = []
+        done = asyncio.Event()
+
+        async with httpx.AsyncClient(base_url=base_url, cookies=self.cookies, limits=limits,
+                                     timeout=self.timeout,
+                                     headers={'X-CSRFToken': self.csrf_token}) as client:
+
+            async def fire(index):
+                kind, method, url, data, expected = self._request(index)
+                async with semaphore:
+                    start = time.perf_counter()
+                    try:
+                        response = await client.request(method, url, data=data)
+                    except httpx.TimeoutException:
+                        errors['timeout'] = errors.get('timeout', 0) + 1
+                        return
+                    except httpx.HTTPError as e:
+                        errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                        return
+                    elapsed = time.perf_counter() - start
+                if response.status_code != expected:
+                    errors[f"http_{response.status_code}"] = errors.get(f"http_{response.status_code}", 0) + 1
+                    return
+                results.setdefault(kind, []).append(elapsed)
+
+            async def probe():
+                # Página sem Protheus nem sessão: mede a espera por um worker livre
+                async with httpx.AsyncClient(base_url=base_url, timeout=self.timeout) as probe_client:
+                    while not done.is_set():
+                        start = time.perf_counter()
+                        try:
+                            await probe_client.get('/main/login/')
+                            probes.append(time.perf_counter() - start)
+                        except httpx.HTTPError:
+                            probes.append(self.timeout)
+                        await asyncio.sleep(PROBE_INTERVAL)
+
+            probe_task = asyncio.create_task(probe())
+            start = time.perf_counter()
+            await asyncio.gather(*(fire(index) for index in range(self.requests)))
+            wall = time.perf_counter() - start
+            done.set()
+            await probe_task
+
+        completed = sum(len(latencies) for latencies in results.values())
+        return {
+            'wall_s': round(wall, 4),
+            'completed': completed,
+            'errors': errors,
+            'requests_per_second': round(completed / wall, 2) if wall > 0 else None,
+            **{kind: _latency_summary(latencies) for kind, latencies in sorted(results.items())},
+            'probe': {**_latency_summary(probes), 'count': len(probes)},
+        }
+
+    def run(self, profiles: List[str]) -> Dict[str, Any]:
+        results = []
+        with run_stub_server(delay=self.delay) as stub:
+            for profile in profiles:
+                port = _free_port()
+                base_url = f"http://127.0.0.1:{port}"
+                self.log(f"{profile}: {self.workers or 'auto'} workers, {self.requests} requisições "
+                         f"({self.concurrency} simultâneas, cenário {self.scenario})...")
+                process = self._start_server(profile, port, stub.base_url)
+                try:
+                    self._wait_ready(base_url, process)
+                    result = {'profile': profile, **asyncio.run(self._load(base_url))}
+                finally:
+                    process.terminate()
+                    process.wait(timeout=30)
+                results.append(result)
+                self.log(
+                    f"  {result['completed']}/{self.requests} concluídas em {result['wall_s']:.2f}s "
+                    f"({result['requests_per_second']} req/s), erros {result['errors'] or '-'}, "
+                    f"login p95 {result['probe']['p95_s']}s"
+                )
+
+        return {
+            'meta': {
+                'scenario': self.scenario,
+                'requests': self.requests,
+                'concurrency': self.concurrency,
+                'workers': self.workers or 'auto',
+                'threads': self.threads,
+                'protheus_delay_s': self.delay,
+                'rows_per_batch': self.rows,
+                'client_timeout_s': self.timeout,
+            },
+            'results': results,
+        }
@@ -0,0 +1,328 @@
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import django
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import Client
+from django.test.utils import override_settings
+
+from rest_framework.renderers import JSONRenderer
+
+from Main.api.fast_serializers import ValuesSerializer
+from Main.api.renderers import FastJSONRenderer
+from Main.api.serializers import ProductSerializer
+from Main.models import FileUpload, Product, ProductBatch
+from Main.services.excel_parser import ExcelParser
+from Main.services.xml_parser import XMLParser
+from Main.services.file_processor import FileProcessor
+from Main.services.parse_executor import pack_records
+from Main.services.code_validation import check_product_codes
+from Main.services.normalization import normalize_product_code
+from .datagen import generate_excel, generate_nfe, generate_xml
+from .stub_protheus import run_stub_server
+
+
+BENCH_USERNAME = 'benchmark'
+BENCH_PASSWORD = 'benchmark'
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class BenchmarkRunner:
+    """
+    Executa os casos de benchmark sobre dados sintéticos
+
+    Cada caso recebe o número de linhas e devolve uma função sem argumentos
+    que é cronometrada `repeat` vezes (setup e limpeza ficam fora da medição).
+    Deve rodar sobre um banco de teste: os casos criam e apagam lotes.
+    """
+
+    def __init__(self, sizes: List[int], repeat: int = 3, seed: int = 0,
+                 work_dir: str = None, log: Callable[[str], None] = None):
+        self.sizes = sizes
+        self.repeat = repeat
+        self.seed = seed
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix='portalweb-bench-')
+        self.log = log or (lambda message: None)
+        self.results: List[Dict[str, Any]] = []
+        self._files: Dict[Any, str] = {}
+        self._products: Dict[int, list] = {}
+        self.stub_server = None
+
+    # ------------------------------------------------------------------
+    # Infraestrutura
+    # ------------------------------------------------------------------
+
+    @property
+    def cases(self) -> Dict[str, Callable]:
+        return {
+            'excel_parse': self.case_excel_parse,
+            'xml_parse': self.case_xml_parse,
+            'nfe_parse': self.case_nfe_parse,
+            'save_products': self.case_save_products,
+            'validate_codes': self.case_validate_codes,
+            'seek_products': self.case_seek_products,
+            'submit_to_protheus': self.case_submit_to_protheus,
+            'api_products_list': self.case_api_products_list,
+            'api_pending_sync': self.case_api_pending_sync,
+            'api_batches_list': self.case_api_batches_list,
+            'api_uploads_list': self.case_api_uploads_list,
+            'api_batch_products': self.case_api_batch_products,
+            'render_products_serializer': self.case_render_products_serializer,
+            'render_products_values': self.case_render_products_values,
+        }
+
+    def run(self, case_names: List[str] = None) -> Dict[str, Any]:
+        case_names = case_names or list(self.cases)
+        # Os uploads do benchmark não têm arquivo no storage: sem cache do parse
+        with run_stub_server() as self.stub_server, override_settings(PROTHEUS_API_URL=self.stub_server.base_url,
+                                                                       PARSED_CACHE_ENABLED=False):
+            for rows in self.sizes:
+                for name in case_names:
+                    self.log(f"{name} ({rows} linhas)...")
+                    timings = self._measure(self.cases[name], rows)
+                    result = self._summarize(name, rows, timings)
+                    self.results.append(result)
+                    self.log(f"  mediana {result['median_s']:.4f}s ({result['rows_per_second']} linhas/s)")
+        return self.as_dict()
+
+    def _measure(self, case: Callable, rows: int) -> List[float]:
+        timings = []
+        for _ in range(self.repeat):
+            func, cleanup = case(rows)
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+            if cleanup:
+                cleanup()
+        return timings
+
+    def _summarize(self, name: str, rows: int, timings: List[float]) -> Dict[str, Any]:
+        median = statistics.median(timings)
+        return {
+            'case': name,
+            'rows': rows,
+            'repeat': len(timings),
+            'min_s': round(min(timings), 6),
+            'median_s': round(median, 6),
+            'mean_s': round(statistics.mean(timings), 6),
+            'max_s': round(max(timings), 6),
+            'rows_per_second': round(rows / median, 1) if median > 0 else None,
+        }
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'meta': {
+                'git_commit': git_commit(),
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'pandas': pd.__version__,
+                'platform': platform.platform(),
+                'database': settings.DATABASES['default']['ENGINE'],
+                'sizes': self.sizes,
+                'repeat': self.repeat,
+                'seed': self.seed,
+            },
+            'results': self.results,
+        }
+
+    # ------------------------------------------------------------------
+    # Dados
+    # ------------------------------------------------------------------
+
+    def _file(self, kind: str, rows: int) -> str:
+        key = (kind, rows)
+        if key not in self._files:
+            extension = {'excel': 'xlsx', 'nfe': 'nfe.xml'}.get(kind, 'xml')
+            path = os.path.join(self.work_dir, f"bench_{rows}.{extension}")
+            if kind == 'excel':
+                generate_excel(path, rows, seed=self.seed, variant=self.seed)
+            elif kind == 'nfe':
+                generate_nfe(path, rows, seed=self.seed)
+            else:
+                generate_xml(path, rows, seed=self.seed, variant=self.seed)
+            self._files[key] = path
+        return self._files[key]
+
+    def _parsed_products(self, rows: int) -> list:
+        """
+        Produtos da planilha nos blocos compactos devolvidos pelo pool de parse
+        """
+        if rows not in self._products:
+            products = ExcelParser(self._file('excel', rows)).parse()
+            self._products[rows] = pack_records(products, settings.PARSE_CHUNK_SIZE)
+        return self._products[rows]
+
+    def _new_upload(self, rows: int) -> FileUpload:
+        return FileUpload.objects.create(file=f"bench/bench_{rows}.xlsx", file_type='EXCEL', status='PROCESSING')
+
+    def _create_batch(self, rows: int) -> ProductBatch:
+        processor = FileProcessor(self._new_upload(rows))
+        result = processor._save_products(self._parsed_products(rows), rows)
+        return result['batch']
+
+    def _client(self) -> Client:
+        user, created = User.objects.get_or_create(username=BENCH_USERNAME)
+        if created:
+            user.set_password(BENCH_PASSWORD)
+            user.save()
+        client = Client()
+        client.force_login(user)
+        return client
+
+    def _clear(self):
+        FileUpload.objects.all().delete()
+
+    # ------------------------------------------------------------------
+    # Casos
+    # ------------------------------------------------------------------
+
+    def case_excel_parse(self, rows: int):
+        path = self._file('excel', rows)
+        return (lambda: ExcelParser(path).parse()), None
+
+    def case_xml_parse(self, rows: int):
+        path = self._file('xml', rows)
+        return (lambda: XMLParser(path).parse()), None
+
+    def case_nfe_parse(self, rows: int):
+        path = self._file('nfe', rows)
+        return (lambda: XMLParser(path).parse()), None
+
+    def case_save_products(self, rows: int):
+        chunks = self._parsed_products(rows)
+        processor = FileProcessor(self._new_upload(rows))
+        return (lambda: processor._save_products(chunks, rows)), self._clear
+
+    def case_validate_codes(self, rows: int):
+        batch = self._create_batch(rows)
+        batch.product_group = '0007'
+        batch.fornecedor_code = 'TATU'
+        batch.save()
+        product_ids = list(batch.products.values_list('id', flat=True))
+        client = self._client()
+
+        def func():
+            response = client.post('/main/validate-codes/', {'product_ids[]': product_ids})
+            assert response.status_code == 200, response.status_code
+
+        return func, self._clear
+
+    def case_seek_products(self, rows: int):
+        codes = [
+            normalize_product_code(product['product_code'], '0007', 'TATU')
+            for product in self._parsed_products(rows)
+        ]
+        requests_before = self.stub_server.seek_count
+
+        def func():
+            with override_settings(PRODUCT_VALIDATION_SOURCE='seek'):
+                results = check_product_codes(codes, '0007', 'TATU')
+            assert len(results) == len(set(codes)), len(results)
+            assert self.stub_server.seek_count > requests_before, 'consulta não chegou ao stub'
+
+        return func, None
+
+    def case_submit_to_protheus(self, rows: int):
+        batch = self._create_batch(rows)
+        batch.products.update(validation_status='VALID', supplier_code='TATU')
+        client = self._client()
+        form = {
+            'filial': '0501',
+            'loja': '01',
+            'condicao_pagamento': '001',
+            'data_emissao': '2026-01-01',
+        }
+
+        orders_before = self.stub_server.order_count
+
+        def func():
+            response = client.post(f'/main/submit/{batch.batch_code}/', form)
+            assert response.status_code == 302, response.status_code
+            assert self.stub_server.order_count == orders_before + 1, 'pedido não chegou ao stub'
+
+        return func, self._clear
+
+    def _api_case(self, rows: int, url: str):
+        self._create_batch(rows)
+        client = self._client()
+
+        def func():
+            response = client.get(url)
+            assert response.status_code == 200, response.status_code
+
+        return func, self._clear
+
+    def case_api_products_list(self, rows: int):
+        return self._api_case(rows, '/api/products/')
+
+    def case_api_pending_sync(self, rows: int):
+        return self._api_case(rows, '/api/products/pending_sync/')
+
+    def case_api_batches_list(self, rows: int):
+        return self._api_case(rows, '/api/batches/')
+
+    def case_api_uploads_list(self, rows: int):
+        return self._api_case(rows, '/api/uploads/')
+
+    def case_api_batch_products(self, rows: int):
+        batch = self._create_batch(rows)
+        client = self._client()
+
+        def func():
+            response = client.get(f'/api/batches/{batch.batch_code}/products/')
+            assert response.status_code == 200, response.status_code
+
+        return func, self._clear
+
+    # Serialização + JSON de um lote, sem HTTP: ProductSerializer e JSONRenderer
+    # do DRF contra a leitura por .values_list() com orjson (mesmos bytes)
+
+    def case_render_products_serializer(self, rows: int):
+        queryset = Product.objects.select_related('batch').filter(batch=self._create_batch(rows))
+        return (lambda: JSONRenderer().render(ProductSerializer(queryset.all(), many=True).data)), self._clear
+
+    def case_render_products_values(self, rows: int):
+        queryset = Product.objects.select_related('batch').filter(batch=self._create_batch(rows))
+        product_rows = ValuesSerializer(ProductSerializer)
+        expected = JSONRenderer().render(ProductSerializer(queryset.all(), many=True).data)
+        assert FastJSONRenderer().render(product_rows.rows(queryset.all())) == expected, 'saída diferente do serializer'
+        return (lambda: FastJSONRenderer().render(product_rows.rows(queryset.all()))), self._clear
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Compara as medianas de duas execuções (mesmo caso e número de linhas)
+    """
+    baseline_index = {(r['case'], r['rows']): r for r in baseline.get('results', [])}
+    comparison = []
+    for result in current.get('results', []):
+        previous = baseline_index.get((result['case'], result['rows']))
+        if not previous:
+            continue
+        change = (result['median_s'] - previous['median_s']) / previous['median_s'] if previous['median_s'] else None
+        comparison.append({
+            'case': result['case'],
+            'rows': result['rows'],
+            'baseline_median_s': previous['median_s'],
+            'median_s': result['median_s'],
+            'change_pct': round(change * 100, 1) if change is not None else None,
+        })
+    return comparison
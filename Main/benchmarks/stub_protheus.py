@@ -0,0 +1,118 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubProtheusHandler(BaseHTTPRequestHandler):
+    """
+    Imita as respostas JSON da API REST PRODCHECK (API/valida_produtos.prw)
+    """
+    server_version = 'StubProtheus/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        return json.loads(body or b'{}')
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.server.delay:
+            time.sleep(self.server.delay)
+
+        payload = self._read_json()
+        self.server.request_count += 1
+
+        if self.path.endswith('/seekProdutos'):
+            codes = payload.get('codes')
+            if not isinstance(codes, list):
+                self._send_json(400, {'errorMessage': 'Body vazio'})
+                return
+            self.server.seek_count += 1
+            self.server.seek_code_count += len(codes)
+            results = []
+            for code in codes:
+                code = str(code).strip()
+                description = self.server.lookup_product(code)
+                results.append({
+                    'code': code,
+                    'found': description is not None,
+                    'desc': description or '',
+                })
+            self._send_json(200, {'results': results})
+            return
+
+        if self.path.endswith('/createPedidoCompra'):
+            itens = payload.get('itens') or []
+            if not itens:
+                self._send_json(400, {'errorMessage': 'Lista de itens nao pode ficar vazia'})
+                return
+            self.server.order_count += 1
+            self._send_json(200, {
+                'status': 'sucesso',
+                'numero_pedido': f"{self.server.order_count:06d}",
+                'fornecedor': payload.get('fornecedor'),
+                'loja': payload.get('loja'),
+                'itens_processados': len(itens),
+            })
+            return
+
+        self._send_json(404, {'errorMessage': f'Rota desconhecida: {self.path}'})
+
+
+class StubProtheusServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, delay=0.0, products=None):
+        super().__init__(address, StubProtheusHandler)
+        self.delay = delay
+        # {código: descrição} do SB1 simulado; None = todo código existe
+        self.products = products
+        self.request_count = 0
+        self.order_count = 0
+        self.seek_count = 0
+        self.seek_code_count = 0
+
+    def lookup_product(self, code):
+        if self.products is None:
+            return f"PRODUTO {code}"
+        return self.products.get(code)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+@contextmanager
+def run_stub_server(delay: float = 0.0, host: str = '127.0.0.1', port: int = 0, products: dict = None):
+    """
+    Sobe o servidor stub do Protheus numa thread e devolve a instância
+
+    Args:
+        products: {código: descrição} que o seekProdutos encontra (padrão: todos)
+
+    Uso:
+        with run_stub_server() as server:
+            settings.PROTHEUS_API_URL = server.base_url
+    """
+    server = StubProtheusServer((host, port), delay=delay, products=products)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
@@ -1,19 +1,61 @@
 from django import forms
+from django.conf import settings
+
 from .models import FileUpload
+from .services.multi_upload import BATCH_MODE_CHOICES
+from .uploadhandlers import sniff_file_type
+
+
+FORNECEDOR_CHOICES = [
+    ('JF', 'JF'),
+    ('VENCE TUDO', 'VENCE TUDO'),
+    ('JAN', 'JAN'),
+    ('TATU', 'TATU'),
+    ('MACDON', 'MACDON'),
+    ('JUMIL', 'JUMIL'),
+    ('JACTO', 'JACTO'),
+    ('KUHN', 'KUHN'),
+    ('HORSH', 'HORSH'),
+    ('OUTROS', 'OUTROS'),
+]
+
+PRODUCT_GROUP_CHOICES = [
+    ('0052', '0052'),
+    ('0001', '0001'),
+    ('0002', '0002'),
+    ('0003', '0003'),
+    ('0004', '0004'),
+    ('0005', '0005'),
+    ('0007', '0007'),
+    ('0008', '0008'),
+    ('0009', '0009'),
+    ('OUTROS', 'OUTROS'),
+]
 
 
 class FileUploadForm(forms.Form):
     FILE_TYPE_CHOICES = [
         ('EXCEL', 'Excel (.xlsx, .xls)'),
-        ('XML', 'XML (.xml)'),
+        ('XML', 'XML / NF-e (.xml, .zip)'),
+        ('CSV', 'CSV / texto (.csv, .txt)'),
     ]
 
+    # Extensão -> formato identificado pelos primeiros bytes (sniff_file_type)
+    EXPECTED_CONTENT = {
+        'xlsx': 'zip',
+        'xls': 'ole',
+        'xml': 'xml',
+        'zip': 'zip',
+        'csv': 'text',
+        'txt': 'text',
+    }
+
     file = forms.FileField(
         label='Arquivo',
-        help_text='Selecione um arquivo Excel ou XML com os dados dos produtos',
+        help_text='Selecione um arquivo Excel, XML ou CSV com os dados dos produtos',
         widget=forms.FileInput(attrs={
             'class': 'form-control',
-            'accept': '.xlsx,.xls,.xml'
+            'accept': '.xlsx,.xls,.xml,.zip,.csv,.txt'
         })
     )
 
@@ -25,6 +67,36 @@ class FileUploadForm(forms.Form):
         })
     )
 
+    fornecedor_code = forms.ChoiceField(
+        label='Fornecedor',
+        required=False,
+        choices=[('', 'Não informado')] + FORNECEDOR_CHOICES,
+        help_text='Opcional: usa (ou aprende) o perfil de importação do fornecedor',
+        widget=forms.Select(attrs={
+            'class': 'form-control'
+        })
+    )
+
+    multi_sheet = forms.BooleanField(
+        label='Importar todas as planilhas',
+        required=False,
+        help_text='Para pastas de trabalho com uma planilha por linha de produto (apenas Excel)',
+        widget=forms.CheckboxInput(attrs={
+            'class': 'form-check-input'
+        })
+    )
+
+    import_mode = forms.ChoiceField(
+        label='Modo de Importação',
+        choices=FileUpload.IMPORT_MODE_CHOICES,
+        initial='FULL',
+        required=False,
+        help_text='Somente alterações: o lote recebe só os produtos novos ou alterados desde a última importação do mesmo fornecedor e código',
+        widget=forms.RadioSelect(attrs={
+            'class': 'form-check-input'
+        })
+    )
+
     def clean_file(self):
         file = self.cleaned_data.get('file')
 
@@ -32,17 +104,29 @@ class FileUploadForm(forms.Form):
             raise forms.ValidationError('Por favor, selecione um arquivo.')
 
         file_extension = file.name.split('.')[-1].lower()
-        valid_extensions = ['xlsx', 'xls', 'xml']
+        valid_extensions = list(self.EXPECTED_CONTENT)
 
         if file_extension not in valid_extensions:
             raise forms.ValidationError(
                 f'Tipo de arquivo não suportado. Use: {", ".join(valid_extensions)}'
             )
 
-        max_size = 10 * 1024 * 1024
-        if file.size > max_size:
+        max_size = settings.UPLOAD_MAX_SIZE
+        if getattr(file, 'too_large', False) or file.size > max_size:
             raise forms.ValidationError(
-                f'O arquivo é muito grande. Tamanho máximo: 10MB'
+                f'O arquivo é muito grande. Tamanho máximo: {max_size // (1024 * 1024)}MB'
+            )
+
+        # StreamingUploadHandler já identificou o tipo durante o recebimento
+        detected_type = getattr(file, 'detected_type', None)
+        if detected_type is None:
+            head = file.read(64)
+            file.seek(0)
+            detected_type = sniff_file_type(head)
+
+        if detected_type != self.EXPECTED_CONTENT[file_extension]:
+            raise forms.ValidationError(
+                f'O conteúdo do arquivo não corresponde à extensão .{file_extension}'
             )
 
         return file
@@ -60,9 +144,116 @@ class FileUploadForm(forms.Form):
                     'O tipo de arquivo selecionado não corresponde ao arquivo enviado.'
                 )
 
-            if file_type == 'XML' and file_extension != 'xml':
+            if file_type == 'XML' and file_extension not in ['xml', 'zip']:
+                raise forms.ValidationError(
+                    'O tipo de arquivo selecionado não corresponde ao arquivo enviado.'
+                )
+
+            if file_type == 'CSV' and file_extension not in ['csv', 'txt']:
                 raise forms.ValidationError(
                     'O tipo de arquivo selecionado não corresponde ao arquivo enviado.'
                 )
 
         return cleaned_data
+
+
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleFileField(forms.FileField):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('widget', MultipleFileInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        single_file_clean = super().clean
+        if isinstance(data, (list, tuple)):
+            return [single_file_clean(item, initial) for item in data]
+        return [single_file_clean(data, initial)] if data else []
+
+
+class MultiFileUploadForm(forms.Form):
+    """
+    Vários arquivos de uma vez: um ZIP ou uma seleção de planilhas/XMLs/CSVs
+    """
+    EXPECTED_CONTENT = FileUploadForm.EXPECTED_CONTENT
+
+    files = MultipleFileField(
+        label='Arquivos',
+        help_text='Um arquivo ZIP ou vários arquivos Excel, XML (NF-e) ou CSV',
+        widget=MultipleFileInput(attrs={
+            'class': 'form-control',
+            'accept': '.zip,.xlsx,.xls,.xml,.csv,.txt'
+        })
+    )
+
+    batch_mode = forms.ChoiceField(
+        label='Lotes',
+        choices=BATCH_MODE_CHOICES,
+        initial='SINGLE',
+        widget=forms.RadioSelect(attrs={
+            'class': 'form-check-input'
+        })
+    )
+
+    fornecedor_code = forms.ChoiceField(
+        label='Fornecedor',
+        required=False,
+        choices=[('', 'Não informado')] + FORNECEDOR_CHOICES,
+        help_text='Opcional: usa os perfis de importação do fornecedor',
+        widget=forms.Select(attrs={
+            'class': 'form-control'
+        })
+    )
+
+    import_mode = forms.ChoiceField(
+        label='Modo de Importação',
+        choices=FileUpload.IMPORT_MODE_CHOICES,
+        initial='FULL',
+        required=False,
+        widget=forms.RadioSelect(attrs={
+            'class': 'form-check-input'
+        })
+    )
+
+    def clean_files(self):
+        files = self.cleaned_data.get('files') or []
+
+        if not files:
+            raise forms.ValidationError('Por favor, selecione ao menos um arquivo.')
+
+        max_files = settings.MULTI_UPLOAD_MAX_FILES
+        if len(files) > max_files:
+            raise forms.ValidationError(f'Envie no máximo {max_files} arquivos por vez.')
+
+        max_size = settings.UPLOAD_MAX_SIZE
+        extensions = []
+        for file in files:
+            file_extension = file.name.split('.')[-1].lower()
+            if file_extension not in self.EXPECTED_CONTENT:
+                raise forms.ValidationError(
+                    f'{file.name}: tipo de arquivo não suportado. Use: {", ".join(self.EXPECTED_CONTENT)}'
+                )
+
+            if getattr(file, 'too_large', False) or file.size > max_size:
+                raise forms.ValidationError(
+                    f'{file.name}: arquivo muito grande. Tamanho máximo: {max_size // (1024 * 1024)}MB'
+                )
+
+            detected_type = getattr(file, 'detected_type', None)
+            if detected_type is None:
+                head = file.read(64)
+                file.seek(0)
+                detected_type = sniff_file_type(head)
+
+            if detected_type != self.EXPECTED_CONTENT[file_extension]:
+                raise forms.ValidationError(
+                    f'{file.name}: o conteúdo do arquivo não corresponde à extensão .{file_extension}'
+                )
+            extensions.append(file_extension)
+
+        if 'zip' in extensions and len(files) > 1:
+            raise forms.ValidationError('Envie um único arquivo ZIP ou vários arquivos sem compactar.')
+
+        return files
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Main.services.fiscal import load_ncm_table, load_tipi_table
+
+
+class Command(BaseCommand):
+    help = (
+        'Carrega as tabelas fiscais de referência (NCM e TIPI) a partir de arquivos '
+        'CSV ou JSON, substituindo o conteúdo atual'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ncm', default=None,
+                            help='Arquivo da tabela NCM (CSV com codigo;descricao ou JSON do Siscomex)')
+        parser.add_argument('--tipi', default=None,
+                            help='Arquivo da TIPI (CSV/JSON com ncm, ex e aliquota; "NT" = não tributado)')
+
+    def handle(self, *args, **options):
+        if not options['ncm'] and not options['tipi']:
+            raise CommandError('Informe --ncm e/ou --tipi')
+
+        try:
+            if options['ncm']:
+                count = load_ncm_table(options['ncm'])
+                self.stdout.write(self.style.SUCCESS(f"NCM: {count} códigos carregados"))
+            if options['tipi']:
+                count = load_tipi_table(options['tipi'])
+                self.stdout.write(self.style.SUCCESS(f"TIPI: {count} alíquotas carregadas"))
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Erro ao carregar tabela fiscal: {e}")
@@ -0,0 +1,71 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from Main.benchmarks.runner import BenchmarkRunner, compare_results
+
+
+class Command(BaseCommand):
+    help = (
+        'Executa os benchmarks de importação, validação e sincronização sobre '
+        'dados sintéticos num banco SQLite de teste e grava os resultados em JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000',
+                            help='Quantidades de linhas separadas por vírgula (ex: 1000,10000,100000)')
+        parser.add_argument('--cases', default='',
+                            help='Casos a executar separados por vírgula (padrão: todos)')
+        parser.add_argument('--repeat', type=int, default=3, help='Repetições por caso')
+        parser.add_argument('--seed', type=int, default=0, help='Semente dos dados sintéticos')
+        parser.add_argument('--output', default='bench_output.json', help='Arquivo JSON de saída')
+        parser.add_argument('--compare', default=None, help='JSON de uma execução anterior para comparação')
+        parser.add_argument('--list', action='store_true', help='Lista os casos disponíveis e sai')
+
+    def handle(self, *args, **options):
+        runner = BenchmarkRunner(
+            sizes=[int(size) for size in options['sizes'].split(',') if size.strip()],
+            repeat=options['repeat'],
+            seed=options['seed'],
+            log=lambda message: self.stdout.write(message),
+        )
+
+        if options['list']:
+            for name in runner.cases:
+                self.stdout.write(name)
+            return
+
+        case_names = [name.strip() for name in options['cases'].split(',') if name.strip()]
+        unknown = set(case_names) - set(runner.cases)
+        if unknown:
+            raise CommandError(f"Casos desconhecidos: {', '.join(sorted(unknown))}")
+
+        if connection.vendor != 'sqlite':
+            raise CommandError(
+                'Os benchmarks devem rodar em SQLite para serem comparáveis. '
+                'Remova DATABASE_URL do ambiente antes de executar.'
+            )
+
+        # Banco de teste isolado: os casos criam e apagam lotes livremente
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = runner.run(case_names or None)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f"Resultados gravados em {options['output']}"))
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as baseline_file:
+                baseline = json.load(baseline_file)
+            for row in compare_results(results, baseline):
+                self.stdout.write(
+                    f"{row['case']:<22} {row['rows']:>7} linhas  "
+                    f"{row['baseline_median_s']:.4f}s -> {row['median_s']:.4f}s  ({row['change_pct']:+.1f}%)"
+                )
@@ -0,0 +1,74 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from Main.benchmarks.load import PROFILES, SCENARIOS, LoadBenchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Dispara requisições concorrentes contra o portal servido pelo gunicorn em '
+        'cada perfil do gunicorn.conf.py (sync, gthread, uvicorn), com um Protheus '
+        'stub lento, e grava os resultados em JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default=','.join(PROFILES),
+                            help=f"Perfis a comparar separados por vírgula ({', '.join(PROFILES)})")
+        parser.add_argument('--scenario', default='protheus', choices=SCENARIOS,
+                            help='protheus: validação e envio ao Protheus; pages: listagens e API')
+        parser.add_argument('--requests', type=int, default=40, help='Total de requisições')
+        parser.add_argument('--concurrency', type=int, default=40, help='Requisições simultâneas')
+        parser.add_argument('--workers', type=int, default=2, help='Workers do gunicorn (0 = automático)')
+        parser.add_argument('--threads', type=int, default=4, help='Threads por worker no perfil gthread')
+        parser.add_argument('--delay', type=float, default=1.0, help='Atraso do stub do Protheus, em segundos')
+        parser.add_argument('--rows', type=int, default=20, help='Produtos por lote')
+        parser.add_argument('--timeout', type=float, default=15.0, help='Timeout de cada requisição, em segundos')
+        parser.add_argument('--output', default='load_output.json', help='Arquivo JSON de saída')
+
+    def handle(self, *args, **options):
+        profiles = [name.strip() for name in options['profiles'].split(',') if name.strip()]
+        unknown = set(profiles) - set(PROFILES)
+        if unknown:
+            raise CommandError(f"Perfis desconhecidos: {', '.join(sorted(unknown))}")
+
+        if connection.vendor != 'sqlite':
+            raise CommandError(
+                'O benchmark de carga roda em SQLite. Remova DATABASE_URL do ambiente antes de executar.'
+            )
+
+        # Banco de teste em arquivo: o gunicorn roda em outro processo e abre o mesmo arquivo
+        work_dir = tempfile.mkdtemp(prefix='portalweb-load-')
+        database_path = os.path.join(work_dir, 'load.sqlite3')
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = database_path
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            benchmark = LoadBenchmark(
+                database_path,
+                requests=options['requests'],
+                concurrency=options['concurrency'],
+                workers=options['workers'],
+                threads=options['threads'],
+                delay=options['delay'],
+                rows=options['rows'],
+                timeout=options['timeout'],
+                scenario=options['scenario'],
+                log=lambda message: self.stdout.write(message),
+            )
+            benchmark.prepare()
+            results = benchmark.run(profiles)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f"Resultados gravados em {options['output']}"))
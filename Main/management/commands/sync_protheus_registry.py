@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Main.services.registry import REGISTRIES, REGISTRY_SOURCES, get_registry_source, sync_registry
+
+
+class Command(BaseCommand):
+    help = (
+        'Atualiza o espelho local dos cadastros do Protheus (SB1 produtos, SA2 fornecedores), '
+        'importando apenas os registros alterados desde a última sincronização'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--registry', choices=[*REGISTRIES, 'all'], default='all',
+                            help='Cadastro a sincronizar (padrão: todos)')
+        parser.add_argument('--source', choices=list(REGISTRY_SOURCES), default=None,
+                            help='Origem dos dados (padrão: settings.REGISTRY_SOURCE)')
+        parser.add_argument('--stub-file', default=None,
+                            help='JSON {"products": [...], "suppliers": [...]} para a origem stub')
+        parser.add_argument('--full', action='store_true',
+                            help='Ignora a marca d\'água e relê o cadastro inteiro')
+
+    def handle(self, *args, **options):
+        kwargs = {}
+        if options['source'] == 'stub':
+            kwargs['file_path'] = options['stub_file']
+
+        try:
+            source = get_registry_source(options['source'], **kwargs)
+        except Exception as e:
+            raise CommandError(f"Não foi possível abrir a origem do cadastro: {e}")
+
+        registries = list(REGISTRIES) if options['registry'] == 'all' else [options['registry']]
+        try:
+            for registry in registries:
+                counts = sync_registry(source, registry, full=options['full'])
+                self.stdout.write(self.style.SUCCESS(
+                    f"{registry}: {counts['created']} novos, {counts['updated']} alterados, "
+                    f"{counts['deleted']} removidos"
+                ))
+        finally:
+            source.close()
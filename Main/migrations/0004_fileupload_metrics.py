@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0003_productbatch_product_group'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileupload',
+            name='peak_memory_kb',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Pico de Memória (KB)'),
+        ),
+        migrations.AddField(
+            model_name='fileupload',
+            name='processing_time',
+            field=models.FloatField(blank=True, null=True, verbose_name='Tempo de Processamento (s)'),
+        ),
+        migrations.AddField(
+            model_name='fileupload',
+            name='rows_per_second',
+            field=models.FloatField(blank=True, null=True, verbose_name='Linhas por Segundo'),
+        ),
+        migrations.AddField(
+            model_name='fileupload',
+            name='stage_metrics',
+            field=models.JSONField(blank=True, null=True, verbose_name='Métricas por Etapa'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0004_fileupload_metrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileupload',
+            name='column_mapping',
+            field=models.JSONField(blank=True, null=True, verbose_name='Mapeamento de Colunas'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:11
+
+import Main.models
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0005_fileupload_column_mapping'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileupload',
+            name='fornecedor_code',
+            field=models.CharField(blank=True, max_length=50, null=True, verbose_name='Código do Fornecedor'),
+        ),
+        migrations.CreateModel(
+            name='ImportProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fornecedor_code', models.CharField(max_length=50, verbose_name='Código do Fornecedor')),
+                ('file_type', models.CharField(choices=[('EXCEL', 'Excel'), ('XML', 'XML')], max_length=10, verbose_name='Tipo de Arquivo')),
+                ('sheet_name', models.CharField(blank=True, max_length=100, null=True, verbose_name='Planilha')),
+                ('header_row', models.IntegerField(default=0, help_text='Índice (base 0) da linha de cabeçalho na planilha', verbose_name='Linha do Cabeçalho')),
+                ('column_mapping', models.JSONField(blank=True, default=dict, help_text='Campo -> coluna (Excel) ou tag (XML)', verbose_name='Mapeamento de Colunas')),
+                ('dtypes', models.JSONField(blank=True, default=dict, help_text='Coluna -> dtype do pandas (ex: "str")', verbose_name='Tipos das Colunas')),
+                ('product_group', models.CharField(blank=True, max_length=50, null=True, verbose_name='Grupo de Produtos')),
+                ('normalization_rule', models.CharField(blank=True, choices=Main.models.normalization_rule_choices, default='', max_length=30, verbose_name='Regra de Normalização')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('last_used_at', models.DateTimeField(blank=True, null=True, verbose_name='Último Uso')),
+            ],
+            options={
+                'verbose_name': 'Perfil de Importação',
+                'verbose_name_plural': 'Perfis de Importação',
+                'ordering': ['fornecedor_code', 'file_type'],
+                'constraints': [models.UniqueConstraint(fields=('fornecedor_code', 'file_type'), name='unique_import_profile')],
+            },
+        ),
+        migrations.AddField(
+            model_name='fileupload',
+            name='import_profile',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='uploads', to='Main.importprofile', verbose_name='Perfil de Importação'),
+        ),
+    ]
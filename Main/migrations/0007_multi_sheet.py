@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0006_importprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileupload',
+            name='multi_sheet',
+            field=models.BooleanField(default=False, verbose_name='Todas as Planilhas'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='source_sheet',
+            field=models.CharField(blank=True, max_length=100, null=True, verbose_name='Planilha de Origem'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0007_multi_sheet'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileupload',
+            name='file_size',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Tamanho (bytes)'),
+        ),
+        migrations.AddField(
+            model_name='fileupload',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True, verbose_name='SHA-256'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0008_fileupload_size_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileupload',
+            name='parsed_cache',
+            field=models.CharField(blank=True, max_length=500, null=True, verbose_name='Cache do Parse'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0009_fileupload_parsed_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileupload',
+            name='delta_summary',
+            field=models.JSONField(blank=True, null=True, verbose_name='Resumo da Importação Delta'),
+        ),
+        migrations.AddField(
+            model_name='fileupload',
+            name='import_mode',
+            field=models.CharField(choices=[('FULL', 'Completa (novo lote com todos os produtos)'), ('DELTA', 'Somente alterações (atualiza produtos existentes)')], default='FULL', max_length=10, verbose_name='Modo de Importação'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=40, null=True, verbose_name='Hash do Conteúdo'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['supplier_code', 'product_code'], name='Main_produc_supplie_b58154_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0010_delta_import'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValidationResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('normalized_code', models.CharField(max_length=50, verbose_name='Código Normalizado')),
+                ('product_group', models.CharField(blank=True, default='', max_length=50, verbose_name='Grupo de Produtos')),
+                ('supplier_code', models.CharField(blank=True, default='', max_length=50, verbose_name='Código do Fornecedor')),
+                ('is_valid', models.BooleanField(verbose_name='Válido')),
+                ('validated_code', models.CharField(help_text='Código encontrado no cadastro (ex: variante com pontos do grupo 0007)', max_length=50, verbose_name='Código Validado')),
+                ('checked_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Verificado em')),
+            ],
+            options={
+                'verbose_name': 'Resultado de Validação',
+                'verbose_name_plural': 'Resultados de Validação',
+                'ordering': ['-checked_at'],
+                'constraints': [models.UniqueConstraint(fields=('normalized_code', 'product_group', 'supplier_code'), name='unique_validation_result')],
+            },
+        ),
+    ]
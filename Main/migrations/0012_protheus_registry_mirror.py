@@ -0,0 +1,68 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:32
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0011_validation_result'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistrySyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('registry', models.CharField(choices=[('products', 'Produtos (SB1)'), ('suppliers', 'Fornecedores (SA2)')], max_length=20, unique=True, verbose_name='Cadastro')),
+                ('watermark', models.DateTimeField(blank=True, help_text='Maior data de alteração já importada', null=True, verbose_name="Marca d'água")),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True, verbose_name='Última Sincronização')),
+                ('last_source', models.CharField(blank=True, default='', max_length=20, verbose_name='Origem')),
+                ('records_synced', models.IntegerField(default=0, verbose_name='Registros na Última Sincronização')),
+            ],
+            options={
+                'verbose_name': 'Estado de Sincronização',
+                'verbose_name_plural': 'Estados de Sincronização',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProtheusProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=50, unique=True, verbose_name='Código (B1_COD)')),
+                ('description', models.CharField(blank=True, default='', max_length=255, verbose_name='Descrição (B1_DESC)')),
+                ('product_group', models.CharField(blank=True, default='', max_length=10, verbose_name='Grupo (B1_GRUPO)')),
+                ('ncm_code', models.CharField(blank=True, max_length=20, null=True, verbose_name='NCM (B1_POSIPI)')),
+                ('ipi_percentage', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='% IPI (B1_IPI)')),
+                ('blocked', models.BooleanField(default=False, verbose_name='Bloqueado (B1_MSBLQL)')),
+                ('source_modified_at', models.DateTimeField(blank=True, null=True, verbose_name='Alterado no Protheus em')),
+                ('synced_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Sincronizado em')),
+            ],
+            options={
+                'verbose_name': 'Produto Protheus',
+                'verbose_name_plural': 'Produtos Protheus',
+                'ordering': ['code'],
+                'indexes': [models.Index(fields=['product_group', 'code'], name='Main_prothe_product_7f58cf_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProtheusSupplier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(db_index=True, max_length=50, verbose_name='Código (A2_COD)')),
+                ('store', models.CharField(blank=True, default='', max_length=10, verbose_name='Loja (A2_LOJA)')),
+                ('name', models.CharField(blank=True, default='', max_length=255, verbose_name='Nome (A2_NOME)')),
+                ('cnpj', models.CharField(blank=True, max_length=20, null=True, verbose_name='CNPJ/CPF (A2_CGC)')),
+                ('blocked', models.BooleanField(default=False, verbose_name='Bloqueado (A2_MSBLQL)')),
+                ('source_modified_at', models.DateTimeField(blank=True, null=True, verbose_name='Alterado no Protheus em')),
+                ('synced_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Sincronizado em')),
+            ],
+            options={
+                'verbose_name': 'Fornecedor Protheus',
+                'verbose_name_plural': 'Fornecedores Protheus',
+                'ordering': ['code', 'store'],
+                'constraints': [models.UniqueConstraint(fields=('code', 'store'), name='unique_protheus_supplier')],
+            },
+        ),
+    ]
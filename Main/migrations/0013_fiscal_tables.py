@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:36
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0012_protheus_registry_mirror'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FiscalTableLoad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(choices=[('NCM', 'NCM'), ('TIPI', 'TIPI')], max_length=10, verbose_name='Tabela')),
+                ('source', models.CharField(blank=True, default='', max_length=255, verbose_name='Arquivo de Origem')),
+                ('records', models.IntegerField(default=0, verbose_name='Registros')),
+                ('loaded_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Carregado em')),
+            ],
+            options={
+                'verbose_name': 'Carga de Tabela Fiscal',
+                'verbose_name_plural': 'Cargas de Tabelas Fiscais',
+                'ordering': ['-loaded_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NcmCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=8, unique=True, verbose_name='NCM')),
+                ('description', models.TextField(blank=True, default='', verbose_name='Descrição')),
+            ],
+            options={
+                'verbose_name': 'NCM',
+                'verbose_name_plural': 'Tabela NCM',
+                'ordering': ['code'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TipiRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ncm_code', models.CharField(max_length=8, verbose_name='NCM')),
+                ('ex_tipi', models.CharField(blank=True, default='', max_length=3, verbose_name='Ex TIPI')),
+                ('ipi_rate', models.DecimalField(blank=True, decimal_places=2, help_text='Vazio = NT (não tributado)', max_digits=5, null=True, verbose_name='Alíquota IPI (%)')),
+            ],
+            options={
+                'verbose_name': 'Alíquota TIPI',
+                'verbose_name_plural': 'Tabela TIPI',
+                'ordering': ['ncm_code', 'ex_tipi'],
+                'constraints': [models.UniqueConstraint(fields=('ncm_code', 'ex_tipi'), name='unique_tipi_rate')],
+            },
+        ),
+    ]
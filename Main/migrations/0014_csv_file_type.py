@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0013_fiscal_tables'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fileupload',
+            name='file_type',
+            field=models.CharField(choices=[('EXCEL', 'Excel'), ('XML', 'XML'), ('CSV', 'CSV')], max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='importprofile',
+            name='file_type',
+            field=models.CharField(choices=[('EXCEL', 'Excel'), ('XML', 'XML'), ('CSV', 'CSV')], max_length=10, verbose_name='Tipo de Arquivo'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0014_csv_file_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileupload',
+            name='file_report',
+            field=models.JSONField(blank=True, null=True, verbose_name='Relatório por Arquivo'),
+        ),
+        migrations.AddField(
+            model_name='fileupload',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='members', to='Main.fileupload', verbose_name='Pacote'),
+        ),
+        migrations.AlterField(
+            model_name='fileupload',
+            name='file_type',
+            field=models.CharField(choices=[('EXCEL', 'Excel'), ('XML', 'XML'), ('CSV', 'CSV'), ('ZIP', 'Pacote de arquivos')], max_length=10),
+        ),
+    ]
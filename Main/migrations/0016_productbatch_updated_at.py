@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0015_multi_file_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productbatch',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:31
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_product_code(apps, schema_editor):
+    # Melhor aproximação para os produtos existentes: o código atual
+    Product = apps.get_model('Main', 'Product')
+    Product.objects.filter(imported_code__isnull=True).update(imported_code=F('product_code'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0016_productbatch_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='Main_produc_supplie_b58154_idx',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='imported_code',
+            field=models.CharField(blank=True, max_length=50, null=True, verbose_name='Código Importado'),
+        ),
+        migrations.RunPython(copy_product_code, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='fileupload',
+            name='import_mode',
+            field=models.CharField(choices=[('FULL', 'Completa (novo lote com todos os produtos)'), ('DELTA', 'Somente alterações (novo lote com os produtos novos ou alterados)')], default='FULL', max_length=10, verbose_name='Modo de Importação'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['supplier_code', 'imported_code'], name='Main_produc_supplie_2a71b4_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0017_delta_imported_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registrysyncstate',
+            name='version',
+            field=models.IntegerField(default=0, help_text='Incrementada a cada sincronização que altera o espelho', verbose_name='Versão'),
+        ),
+    ]
@@ -3,10 +3,54 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 
 
+def normalization_rule_choices():
+    # Importação tardia: Main.services importa os models
+    from .services.normalization import NORMALIZATION_RULE_CHOICES
+    return NORMALIZATION_RULE_CHOICES
+
+
+class ImportProfile(models.Model):
+    """
+    Layout lembrado de um fornecedor: planilha, linha de cabeçalho, mapeamento
+    de colunas, dtypes e regra de normalização aplicados diretamente no parse
+    """
+    fornecedor_code = models.CharField(max_length=50, verbose_name='Código do Fornecedor')
+    file_type = models.CharField(max_length=10, choices=[('EXCEL', 'Excel'), ('XML', 'XML'), ('CSV', 'CSV')], verbose_name='Tipo de Arquivo')
+
+    sheet_name = models.CharField(max_length=100, null=True, blank=True, verbose_name='Planilha')
+    header_row = models.IntegerField(default=0, verbose_name='Linha do Cabeçalho',
+                                     help_text='Índice (base 0) da linha de cabeçalho na planilha')
+    column_mapping = models.JSONField(default=dict, blank=True, verbose_name='Mapeamento de Colunas',
+                                      help_text='Campo -> coluna (Excel) ou tag (XML)')
+    dtypes = models.JSONField(default=dict, blank=True, verbose_name='Tipos das Colunas',
+                              help_text='Coluna -> dtype do pandas (ex: "str")')
+
+    product_group = models.CharField(max_length=50, null=True, blank=True, verbose_name='Grupo de Produtos')
+    normalization_rule = models.CharField(max_length=30, choices=normalization_rule_choices, blank=True, default='',
+                                          verbose_name='Regra de Normalização')
+
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    last_used_at = models.DateTimeField(null=True, blank=True, verbose_name='Último Uso')
+
+    class Meta:
+        ordering = ['fornecedor_code', 'file_type']
+        verbose_name = 'Perfil de Importação'
+        verbose_name_plural = 'Perfis de Importação'
+        constraints = [
+            models.UniqueConstraint(fields=['fornecedor_code', 'file_type'], name='unique_import_profile'),
+        ]
+
+    def __str__(self):
+        return f"{self.fornecedor_code} ({self.file_type})"
+
+
 class FileUpload(models.Model):
     FILE_TYPE_CHOICES = [
         ('EXCEL', 'Excel'),
         ('XML', 'XML'),
+        ('CSV', 'CSV'),
+        ('ZIP', 'Pacote de arquivos'),
     ]
 
     STATUS_CHOICES = [
@@ -16,7 +60,14 @@ class FileUpload(models.Model):
         ('FAILED', 'Falhou'),
     ]
 
+    IMPORT_MODE_CHOICES = [
+        ('FULL', 'Completa (novo lote com todos os produtos)'),
+        ('DELTA', 'Somente alterações (novo lote com os produtos novos ou alterados)'),
+    ]
+
     file = models.FileField(upload_to='uploads/%Y/%m/%d/')
+    file_size = models.BigIntegerField(null=True, blank=True, verbose_name='Tamanho (bytes)')
+    sha256 = models.CharField(max_length=64, null=True, blank=True, db_index=True, verbose_name='SHA-256')
     file_type = models.CharField(max_length=10, choices=FILE_TYPE_CHOICES)
     uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     uploaded_at = models.DateTimeField(default=timezone.now)
@@ -25,6 +76,27 @@ class FileUpload(models.Model):
     processed_records = models.IntegerField(default=0)
     error_message = models.TextField(null=True, blank=True)
 
+    # Processing metrics (filled by FileProcessor)
+    processing_time = models.FloatField(null=True, blank=True, verbose_name='Tempo de Processamento (s)')
+    rows_per_second = models.FloatField(null=True, blank=True, verbose_name='Linhas por Segundo')
+    peak_memory_kb = models.IntegerField(null=True, blank=True, verbose_name='Pico de Memória (KB)')
+    stage_metrics = models.JSONField(null=True, blank=True, verbose_name='Métricas por Etapa')
+    column_mapping = models.JSONField(null=True, blank=True, verbose_name='Mapeamento de Colunas')
+    parsed_cache = models.CharField(max_length=500, null=True, blank=True, verbose_name='Cache do Parse')
+
+    fornecedor_code = models.CharField(max_length=50, null=True, blank=True, verbose_name='Código do Fornecedor')
+    multi_sheet = models.BooleanField(default=False, verbose_name='Todas as Planilhas')
+    import_mode = models.CharField(max_length=10, choices=IMPORT_MODE_CHOICES, default='FULL',
+                                   verbose_name='Modo de Importação')
+    delta_summary = models.JSONField(null=True, blank=True, verbose_name='Resumo da Importação Delta')
+    import_profile = models.ForeignKey(ImportProfile, on_delete=models.SET_NULL, null=True, blank=True,
+                                       related_name='uploads', verbose_name='Perfil de Importação')
+
+    # Upload de vários arquivos: cada arquivo com lote próprio aponta para o pacote
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True,
+                               related_name='members', verbose_name='Pacote')
+    file_report = models.JSONField(null=True, blank=True, verbose_name='Relatório por Arquivo')
+
     class Meta:
         ordering = ['-uploaded_at']
         verbose_name = 'Upload de Arquivo'
@@ -48,6 +120,9 @@ class ProductBatch(models.Model):
     synced_to_protheus = models.BooleanField(default=False)
     synced_at = models.DateTimeField(null=True, blank=True)
 
+    # Versão da listagem da API (ETag/Last-Modified)
+    updated_at = models.DateTimeField(auto_now=True)
+
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Lote de Produtos'
@@ -128,9 +203,17 @@ class Product(models.Model):
     protheus_sync_date = models.DateTimeField(null=True, blank=True, verbose_name='Data Sincronização Protheus')
     protheus_error = models.TextField(null=True, blank=True, verbose_name='Erro Protheus')
 
+    # Source sheet for multi-sheet workbooks
+    source_sheet = models.CharField(max_length=100, null=True, blank=True, verbose_name='Planilha de Origem')
+
     # Store raw data from Excel/XML for reference
     raw_data = models.JSONField(null=True, blank=True, verbose_name='Dados Brutos')
 
+    # Hash of the parsed fields, compared on delta imports
+    content_hash = models.CharField(max_length=40, null=True, blank=True, verbose_name='Hash do Conteúdo')
+    # Product code as imported (validation may rewrite product_code), matched on delta imports
+    imported_code = models.CharField(max_length=50, null=True, blank=True, verbose_name='Código Importado')
+
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Produto'
@@ -138,7 +221,176 @@ class Product(models.Model):
         indexes = [
             models.Index(fields=['product_code', 'batch']),
             models.Index(fields=['synced_to_protheus']),
+            models.Index(fields=['supplier_code', 'imported_code']),
         ]
 
     def __str__(self):
         return f"{self.product_code} - {self.description}"
+
+
+class ValidationResult(models.Model):
+    """
+    Resultado da validação de um código no cadastro do Protheus, reaproveitado
+    entre lotes enquanto estiver dentro do TTL (VALIDATION_CACHE_TTL; para códigos
+    não encontrados, VALIDATION_NEGATIVE_CACHE_TTL)
+    """
+    normalized_code = models.CharField(max_length=50, verbose_name='Código Normalizado')
+    product_group = models.CharField(max_length=50, blank=True, default='', verbose_name='Grupo de Produtos')
+    supplier_code = models.CharField(max_length=50, blank=True, default='', verbose_name='Código do Fornecedor')
+
+    is_valid = models.BooleanField(verbose_name='Válido')
+    validated_code = models.CharField(max_length=50, verbose_name='Código Validado',
+                                      help_text='Código encontrado no cadastro (ex: variante com pontos do grupo 0007)')
+    checked_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='Verificado em')
+
+    class Meta:
+        ordering = ['-checked_at']
+        verbose_name = 'Resultado de Validação'
+        verbose_name_plural = 'Resultados de Validação'
+        constraints = [
+            models.UniqueConstraint(fields=['normalized_code', 'product_group', 'supplier_code'],
+                                    name='unique_validation_result'),
+        ]
+
+    def __str__(self):
+        return f"{self.normalized_code} ({self.product_group}/{self.supplier_code}): {'válido' if self.is_valid else 'inválido'}"
+
+
+class ProtheusProduct(models.Model):
+    """
+    Espelho local do cadastro de produtos do Protheus (SB1), atualizado pelo
+    comando sync_protheus_registry
+    """
+    code = models.CharField(max_length=50, unique=True, verbose_name='Código (B1_COD)')
+    description = models.CharField(max_length=255, blank=True, default='', verbose_name='Descrição (B1_DESC)')
+    product_group = models.CharField(max_length=10, blank=True, default='', verbose_name='Grupo (B1_GRUPO)')
+    ncm_code = models.CharField(max_length=20, null=True, blank=True, verbose_name='NCM (B1_POSIPI)')
+    ipi_percentage = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, verbose_name='% IPI (B1_IPI)')
+    blocked = models.BooleanField(default=False, verbose_name='Bloqueado (B1_MSBLQL)')
+
+    source_modified_at = models.DateTimeField(null=True, blank=True, verbose_name='Alterado no Protheus em')
+    synced_at = models.DateTimeField(default=timezone.now, verbose_name='Sincronizado em')
+
+    class Meta:
+        ordering = ['code']
+        verbose_name = 'Produto Protheus'
+        verbose_name_plural = 'Produtos Protheus'
+        indexes = [
+            models.Index(fields=['product_group', 'code']),
+        ]
+
+    def __str__(self):
+        return f"{self.code} - {self.description}"
+
+
+class ProtheusSupplier(models.Model):
+    """
+    Espelho local do cadastro de fornecedores do Protheus (SA2)
+    """
+    code = models.CharField(max_length=50, db_index=True, verbose_name='Código (A2_COD)')
+    store = models.CharField(max_length=10, blank=True, default='', verbose_name='Loja (A2_LOJA)')
+    name = models.CharField(max_length=255, blank=True, default='', verbose_name='Nome (A2_NOME)')
+    cnpj = models.CharField(max_length=20, null=True, blank=True, verbose_name='CNPJ/CPF (A2_CGC)')
+    blocked = models.BooleanField(default=False, verbose_name='Bloqueado (A2_MSBLQL)')
+
+    source_modified_at = models.DateTimeField(null=True, blank=True, verbose_name='Alterado no Protheus em')
+    synced_at = models.DateTimeField(default=timezone.now, verbose_name='Sincronizado em')
+
+    class Meta:
+        ordering = ['code', 'store']
+        verbose_name = 'Fornecedor Protheus'
+        verbose_name_plural = 'Fornecedores Protheus'
+        constraints = [
+            models.UniqueConstraint(fields=['code', 'store'], name='unique_protheus_supplier'),
+        ]
+
+    def __str__(self):
+        return f"{self.code}/{self.store} - {self.name}"
+
+
+class RegistrySyncState(models.Model):
+    """
+    Marca d'água da última sincronização de cada cadastro espelhado
+    """
+    REGISTRY_CHOICES = [
+        ('products', 'Produtos (SB1)'),
+        ('suppliers', 'Fornecedores (SA2)'),
+    ]
+
+    registry = models.CharField(max_length=20, choices=REGISTRY_CHOICES, unique=True, verbose_name='Cadastro')
+    watermark = models.DateTimeField(null=True, blank=True, verbose_name='Marca d\'água',
+                                     help_text='Maior data de alteração já importada')
+    last_synced_at = models.DateTimeField(null=True, blank=True, verbose_name='Última Sincronização')
+    last_source = models.CharField(max_length=20, blank=True, default='', verbose_name='Origem')
+    records_synced = models.IntegerField(default=0, verbose_name='Registros na Última Sincronização')
+    version = models.IntegerField(default=0, verbose_name='Versão',
+                                  help_text='Incrementada a cada sincronização que altera o espelho')
+
+    class Meta:
+        verbose_name = 'Estado de Sincronização'
+        verbose_name_plural = 'Estados de Sincronização'
+
+    def __str__(self):
+        return f"{self.get_registry_display()}: {self.watermark}"
+
+
+class NcmCode(models.Model):
+    """
+    Tabela NCM (Nomenclatura Comum do Mercosul), carregada pelo comando load_fiscal_tables
+    """
+    code = models.CharField(max_length=8, unique=True, verbose_name='NCM')
+    description = models.TextField(blank=True, default='', verbose_name='Descrição')
+
+    class Meta:
+        ordering = ['code']
+        verbose_name = 'NCM'
+        verbose_name_plural = 'Tabela NCM'
+
+    def __str__(self):
+        return f"{self.code} - {self.description[:60]}"
+
+
+class TipiRate(models.Model):
+    """
+    Alíquota de IPI da TIPI por NCM (e exceção tarifária, quando houver)
+    """
+    ncm_code = models.CharField(max_length=8, verbose_name='NCM')
+    ex_tipi = models.CharField(max_length=3, blank=True, default='', verbose_name='Ex TIPI')
+    ipi_rate = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, verbose_name='Alíquota IPI (%)',
+                                   help_text='Vazio = NT (não tributado)')
+
+    class Meta:
+        ordering = ['ncm_code', 'ex_tipi']
+        verbose_name = 'Alíquota TIPI'
+        verbose_name_plural = 'Tabela TIPI'
+        constraints = [
+            models.UniqueConstraint(fields=['ncm_code', 'ex_tipi'], name='unique_tipi_rate'),
+        ]
+
+    def __str__(self):
+        rate = 'NT' if self.ipi_rate is None else f"{self.ipi_rate}%"
+        return f"{self.ncm_code}{f' ex {self.ex_tipi}' if self.ex_tipi else ''}: {rate}"
+
+
+class FiscalTableLoad(models.Model):
+    """
+    Registro de cada carga das tabelas fiscais; a mais recente define a versão
+    usada pelo cache em memória (Main.services.fiscal)
+    """
+    TABLE_CHOICES = [
+        ('NCM', 'NCM'),
+        ('TIPI', 'TIPI'),
+    ]
+
+    table = models.CharField(max_length=10, choices=TABLE_CHOICES, verbose_name='Tabela')
+    source = models.CharField(max_length=255, blank=True, default='', verbose_name='Arquivo de Origem')
+    records = models.IntegerField(default=0, verbose_name='Registros')
+    loaded_at = models.DateTimeField(default=timezone.now, verbose_name='Carregado em')
+
+    class Meta:
+        ordering = ['-loaded_at']
+        verbose_name = 'Carga de Tabela Fiscal'
+        verbose_name_plural = 'Cargas de Tabelas Fiscais'
+
+    def __str__(self):
+        return f"{self.table} ({self.records} registros) em {self.loaded_at:%d/%m/%Y %H:%M}"
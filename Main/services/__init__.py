@@ -1,5 +1,30 @@
-from .excel_parser import ExcelParser
-from .xml_parser import XMLParser
-from .file_processor import FileProcessor
+"""
+Serviços do portal
 
-__all__ = ['ExcelParser', 'XMLParser', 'FileProcessor']
+Os parsers e o FileProcessor são importados no primeiro acesso ao nome
+(PEP 562): importar Main.services, ou um submódulo leve como code_validation,
+não carrega pandas/numpy/lxml. A pilha de parse só entra quando um upload é
+processado.
+"""
+import importlib
+
+_LAZY_ATTRIBUTES = {
+    'ExcelParser': '.excel_parser',
+    'XMLParser': '.xml_parser',
+    'CSVParser': '.csv_parser',
+    'FileProcessor': '.file_processor',
+}
+
+__all__ = ['ExcelParser', 'XMLParser', 'CSVParser', 'FileProcessor']
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,393 @@
+"""
+Validação de códigos de produto/fornecedor no cadastro do Protheus, com cache
+persistente dos resultados (ValidationResult) por código normalizado, grupo e fornecedor
+"""
+import logging
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from Main.models import Product, ProtheusSupplier, ValidationResult
+from .normalization import normalize_product_code, normalize_product_code_with_dots_0007
+from .protheus_client import AsyncProtheusClient, get_async_protheus_client, get_protheus_client
+from .registry import registry_synced
+from .registry_index import get_registry_index
+from .validation_rules import apply_rules
+
+logger = logging.getLogger(__name__)
+
+LOOKUP_CHUNK_SIZE = 500
+
+CacheKey = Tuple[str, str, str]
+
+
+def validate_product_code(product_code, product_group):
+    """
+    Valida se o código do produto existe no cadastro do Protheus
+
+    Consulta o índice em memória do espelho local do SB1 (RegistryIndex),
+    atualizado pelo comando sync_protheus_registry: sem rede nem banco. Enquanto
+    o espelho nunca tiver sido sincronizado, todo código é considerado válido.
+
+    Args:
+        product_code (str): Código do produto a validar
+        product_group (str): Grupo do produto para filtrar busca
+
+    Returns:
+        bool: True se código existe no Protheus, False caso contrário
+    """
+    if not registry_synced('products'):
+        return True
+
+    return get_registry_index().has_product(product_code, product_group)
+
+
+def validate_supplier_code(supplier_code):
+    """
+    Valida se o código do fornecedor existe no cadastro do Protheus
+
+    Consulta o índice em memória do espelho local do SA2. Enquanto o espelho
+    nunca tiver sido sincronizado, todo código é considerado válido.
+
+    Args:
+        supplier_code (str): Código do fornecedor a validar
+
+    Returns:
+        bool: True se código existe no Protheus, False caso contrário
+    """
+    if not registry_synced('suppliers'):
+        return True
+
+    if not supplier_code:
+        return False
+    return get_registry_index().has_supplier(supplier_code)
+
+
+def supplier_codes_by_document(documents: Iterable[str]) -> Dict[str, str]:
+    """
+    Código do fornecedor (A2_COD) por CNPJ/CPF no espelho local do SA2
+
+    Fornecedores bloqueados ficam de fora; com várias lojas para o mesmo
+    documento vale o menor código/loja.
+
+    Returns:
+        {CNPJ/CPF: A2_COD} só para os documentos encontrados
+    """
+    documents = {document for document in documents if document}
+    if not documents:
+        return {}
+
+    codes = {}
+    queryset = (
+        ProtheusSupplier.objects
+        .filter(cnpj__in=documents, blocked=False)
+        .order_by('code', 'store')
+        .values_list('cnpj', 'code')
+    )
+    for document, code in queryset:
+        codes.setdefault(document, code)
+    return codes
+
+
+# ----------------------------------------------------------------------
+# Cache de resultados
+# ----------------------------------------------------------------------
+
+def cache_key(normalized_code, product_group, fornecedor) -> CacheKey:
+    return str(normalized_code), product_group or '', fornecedor or ''
+
+
+def _fresh_filter() -> Q:
+    """
+    Resultados dentro do TTL: VALIDATION_CACHE_TTL para códigos encontrados e
+    VALIDATION_NEGATIVE_CACHE_TTL (curto) para os não encontrados
+    """
+    now = timezone.now()
+    fresh_since = now - timedelta(seconds=getattr(settings, 'VALIDATION_CACHE_TTL', 86400))
+    negative_since = now - timedelta(seconds=getattr(settings, 'VALIDATION_NEGATIVE_CACHE_TTL', 300))
+    return Q(is_valid=True, checked_at__gte=fresh_since) | Q(is_valid=False, checked_at__gte=negative_since)
+
+
+def lookup_cached(keys: Iterable[CacheKey]) -> Dict[CacheKey, ValidationResult]:
+    """
+    Resultados ainda válidos (dentro do TTL) para as chaves informadas
+    """
+    by_scope: Dict[Tuple[str, str], List[str]] = {}
+    for normalized_code, product_group, fornecedor in set(keys):
+        by_scope.setdefault((product_group, fornecedor), []).append(normalized_code)
+
+    fresh = _fresh_filter()
+    results = {}
+    for (product_group, fornecedor), codes in by_scope.items():
+        for start in range(0, len(codes), LOOKUP_CHUNK_SIZE):
+            queryset = ValidationResult.objects.filter(
+                fresh,
+                product_group=product_group,
+                supplier_code=fornecedor,
+                normalized_code__in=codes[start:start + LOOKUP_CHUNK_SIZE],
+            )
+            for result in queryset:
+                results[(result.normalized_code, result.product_group, result.supplier_code)] = result
+    return results
+
+
+def store_results(results: Dict[CacheKey, Tuple[bool, str]]) -> Dict[CacheKey, ValidationResult]:
+    """
+    Grava os resultados em lote, substituindo os existentes para as mesmas chaves
+
+    Upsert (ON CONFLICT DO UPDATE): duas validações simultâneas do mesmo código
+    não falham na restrição unique_validation_result.
+    """
+    now = timezone.now()
+    instances = {
+        key: ValidationResult(
+            normalized_code=key[0], product_group=key[1], supplier_code=key[2],
+            is_valid=is_valid, validated_code=validated_code, checked_at=now,
+        )
+        for key, (is_valid, validated_code) in results.items()
+    }
+    ValidationResult.objects.bulk_create(
+        instances.values(),
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['normalized_code', 'product_group', 'supplier_code'],
+        update_fields=['is_valid', 'validated_code', 'checked_at'],
+    )
+    return instances
+
+
+def check_product_code(normalized_code, product_group, fornecedor) -> Tuple[bool, str]:
+    """
+    Consulta o cadastro (sem cache). Retorna (válido, código encontrado)
+    """
+    # Special handling for GRUPO 0007 (TATU): try without dots first, then with dots
+    if product_group == "0007" and fornecedor == "TATU":
+        if validate_product_code(normalized_code, product_group):
+            return True, normalized_code
+        code_with_dots = normalize_product_code_with_dots_0007(normalized_code)
+        return validate_product_code(code_with_dots, product_group), code_with_dots
+
+    return validate_product_code(normalized_code, product_group), normalized_code
+
+
+def _use_seek_endpoint() -> bool:
+    source = getattr(settings, 'PRODUCT_VALIDATION_SOURCE', 'auto')
+    if source == 'auto':
+        # Sem espelho local do SB1, consulta o Protheus diretamente
+        return not registry_synced('products')
+    return source == 'seek'
+
+
+def _found(seek_results, code) -> bool:
+    result = seek_results.get(str(code).strip())
+    return bool(result and result.found)
+
+
+def check_product_codes(normalized_codes: Iterable[str], product_group, fornecedor) -> Dict[str, Tuple[bool, str]]:
+    """
+    Consulta vários códigos no cadastro (sem cache). Retorna {código: (válido, código encontrado)}
+
+    Com o endpoint seekProdutos os códigos vão em lote: uma rodada com os códigos
+    normalizados e, para o GRUPO 0007 (TATU), uma segunda rodada só com a forma
+    com pontos dos que não foram encontrados. O seekProdutos não filtra por grupo.
+    """
+    normalized_codes = list(dict.fromkeys(normalized_codes))
+    if not _use_seek_endpoint():
+        return {code: check_product_code(code, product_group, fornecedor) for code in normalized_codes}
+
+    client = get_protheus_client()
+    found = client.seek_products(normalized_codes)
+    results = {code: (True, code) for code in normalized_codes if _found(found, code)}
+
+    with_dots = _second_round_codes(normalized_codes, results, product_group, fornecedor)
+    if with_dots:
+        found_with_dots = client.seek_products(with_dots.values())
+        for code, code_with_dots in with_dots.items():
+            results[code] = (_found(found_with_dots, code_with_dots), code_with_dots)
+
+    for code in normalized_codes:
+        results.setdefault(code, (False, code))
+    return results
+
+
+async def acheck_product_codes(normalized_codes: Iterable[str], product_group, fornecedor,
+                               client: AsyncProtheusClient = None) -> Dict[str, Tuple[bool, str]]:
+    """
+    Versão assíncrona do check_product_codes: as chamadas ao seekProdutos não
+    bloqueiam o worker (httpx); a consulta ao espelho local roda numa thread
+
+    `client`: o da view (async_protheus_client); padrão, o do event loop corrente
+    """
+    normalized_codes = list(dict.fromkeys(normalized_codes))
+    if not await sync_to_async(_use_seek_endpoint)():
+        return await sync_to_async(check_product_codes)(normalized_codes, product_group, fornecedor)
+
+    client = client or get_async_protheus_client()
+    found = await client.seek_products(normalized_codes)
+    results = {code: (True, code) for code in normalized_codes if _found(found, code)}
+
+    with_dots = _second_round_codes(normalized_codes, results, product_group, fornecedor)
+    if with_dots:
+        found_with_dots = await client.seek_products(with_dots.values())
+        for code, code_with_dots in with_dots.items():
+            results[code] = (_found(found_with_dots, code_with_dots), code_with_dots)
+
+    for code in normalized_codes:
+        results.setdefault(code, (False, code))
+    return results
+
+
+def _second_round_codes(normalized_codes: List[str], results, product_group, fornecedor) -> Dict[str, str]:
+    """
+    {código: forma com pontos} a consultar na segunda rodada (só GRUPO 0007, TATU)
+    """
+    if product_group != "0007" or fornecedor != "TATU":
+        return {}
+    return {
+        code: normalize_product_code_with_dots_0007(code)
+        for code in normalized_codes if code not in results
+    }
+
+
+# ----------------------------------------------------------------------
+# Validação de produtos
+# ----------------------------------------------------------------------
+
+def validate_products(products: Iterable[Product], product_group: Optional[str], fornecedor: Optional[str],
+                      file_type: str, remote: bool = True) -> int:
+    """
+    Normaliza, valida e grava a validação dos produtos de um lote usando o
+    cache de resultados
+
+    Códigos desconhecidos ou expirados são consultados no cadastro (e gravados
+    no cache) apenas quando `remote` é True; caso contrário ficam pendentes.
+    Com `remote`, os códigos que constam como não encontrados são consultados de novo.
+
+    Returns:
+        Quantidade de produtos validados
+    """
+    import requests
+
+    pending, cached, missing = _lookup_pending(products, product_group, fornecedor, recheck_invalid=remote)
+
+    if missing and remote:
+        try:
+            checked = check_product_codes((key[0] for key in missing), product_group, fornecedor)
+        except requests.RequestException as e:
+            # Sem resposta do Protheus os produtos ficam pendentes
+            logger.warning(f"Falha ao consultar o cadastro do Protheus: {e}")
+        else:
+            cached.update(store_results({key: checked[key[0]] for key in missing}))
+
+    return _save_validation(pending, cached, file_type)
+
+
+async def avalidate_products(products: Iterable[Product], product_group: Optional[str], fornecedor: Optional[str],
+                             file_type: str, client: AsyncProtheusClient = None) -> int:
+    """
+    Versão assíncrona do validate_products (sempre consulta o cadastro, inclusive
+    os códigos antes não encontrados): o banco é acessado em threads e o
+    Protheus sem bloquear o event loop
+
+    Returns:
+        Quantidade de produtos validados
+    """
+    import httpx
+
+    pending, cached, missing = await sync_to_async(_lookup_pending)(
+        products, product_group, fornecedor, recheck_invalid=True
+    )
+
+    if missing:
+        try:
+            checked = await acheck_product_codes((key[0] for key in missing), product_group, fornecedor, client)
+        except httpx.HTTPError as e:
+            # Sem resposta do Protheus os produtos ficam pendentes
+            logger.warning(f"Falha ao consultar o cadastro do Protheus: {e}")
+        else:
+            cached.update(await sync_to_async(store_results)({key: checked[key[0]] for key in missing}))
+
+    return await sync_to_async(_save_validation)(pending, cached, file_type)
+
+
+def _lookup_pending(products: Iterable[Product], product_group, fornecedor, recheck_invalid: bool = False):
+    """
+    Normaliza os códigos e busca o cache de resultados (sem os "não encontrado"
+    com `recheck_invalid`, para que sejam consultados de novo)
+
+    Returns:
+        ([(produto, chave)], {chave: ValidationResult}, chaves sem resultado no cache)
+    """
+    pending = []
+    for product in products:
+        normalized_code = normalize_product_code(product.product_code, product_group, fornecedor)
+        pending.append((product, cache_key(normalized_code, product_group, fornecedor)))
+
+    cached = lookup_cached(key for _, key in pending)
+    if recheck_invalid:
+        cached = {key: result for key, result in cached.items() if result.is_valid}
+    logger.info(f"Validação: {len(cached)} códigos no cache, {len({key for _, key in pending}) - len(cached)} desconhecidos")
+
+    missing = {key for _, key in pending if key not in cached}
+    return pending, cached, missing
+
+
+def _save_validation(pending, cached: Dict[CacheKey, ValidationResult], file_type: str) -> int:
+    """
+    Grava a validação dos produtos resolvidos e aplica as regras de negócio
+    """
+    supplier_results = {}
+    code_changed = []
+    # Produtos com o mesmo resultado são gravados juntos com um UPDATE
+    by_result: Dict[Tuple[bool, bool], List[int]] = {}
+    for product, key in pending:
+        result = cached.get(key)
+        if result is None:
+            continue
+
+        if product.supplier_code not in supplier_results:
+            supplier_results[product.supplier_code] = validate_supplier_code(product.supplier_code)
+
+        if product.product_code != result.validated_code:
+            product.product_code = result.validated_code
+            code_changed.append(product)
+
+        by_result.setdefault((result.is_valid, supplier_results[product.supplier_code]), []).append(product.pk)
+
+    with transaction.atomic():
+        Product.objects.bulk_update(code_changed, ['product_code'], batch_size=1000)
+        for (product_valid, supplier_valid), product_ids in by_result.items():
+            for start in range(0, len(product_ids), LOOKUP_CHUNK_SIZE):
+                Product.objects.filter(pk__in=product_ids[start:start + LOOKUP_CHUNK_SIZE]).update(
+                    product_code_validated=product_valid,
+                    supplier_code_validated=supplier_valid,
+                )
+
+        validated_ids = [product_id for product_ids in by_result.values() for product_id in product_ids]
+        apply_rules(validated_ids, file_type)
+
+    return len(validated_ids)
+
+
+def prevalidate_batch(batch) -> int:
+    """
+    Pré-valida um lote apenas com o cache (sem consultas ao cadastro)
+
+    Returns:
+        Quantidade de produtos resolvidos pelo cache
+    """
+    if not batch.product_group:
+        return 0
+
+    validated = validate_products(
+        batch.products.filter(validation_status='PENDING').defer('raw_data'),
+        batch.product_group, batch.fornecedor_code, batch.file_upload.file_type,
+        remote=False,
+    )
+    logger.info(f"Lote {batch.batch_code}: {validated} produtos pré-validados pelo cache")
+    return validated
@@ -0,0 +1,98 @@
+import hashlib
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple
+
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_header(value) -> str:
+    """
+    Normaliza um cabeçalho para comparação: remove acentos, pontuação
+    e espaços extras ("Código  Produto " -> "codigo produto")
+    """
+    text = unicodedata.normalize('NFKD', str(value))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    text = _NON_ALNUM.sub(' ', text.lower())
+    return text.strip()
+
+
+def header_signature(headers: Iterable) -> str:
+    """
+    Assinatura (hash) da tupla de cabeçalhos de um arquivo
+    """
+    return hashlib.sha1(repr(tuple(str(header) for header in headers)).encode('utf-8')).hexdigest()
+
+
+class ColumnResolver:
+    """
+    Resolve cabeçalhos de colunas para os campos de um mapeamento de aliases
+
+    O índice reverso (alias normalizado -> campos) é montado uma única vez na
+    criação. O resultado de cada resolução fica em cache pela assinatura dos
+    cabeçalhos, então uploads repetidos do mesmo layout não resolvem de novo.
+    """
+
+    def __init__(self, mapping: Dict[str, List[str]], cache_size: int = 256):
+        self.mapping = mapping
+        self.cache_size = cache_size
+        self.index = self._build_index(mapping)
+        self._cache: 'OrderedDict[str, Dict[str, str]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _build_index(mapping: Dict[str, List[str]]) -> Dict[str, List[Tuple[str, int]]]:
+        index: Dict[str, List[Tuple[str, int]]] = {}
+        for field_name, aliases in mapping.items():
+            for priority, alias in enumerate(aliases):
+                candidates = index.setdefault(normalize_header(alias), [])
+                # O mesmo alias pode aparecer normalizado duas vezes ("ipi" e "% ipi"):
+                # vale a primeira posição
+                if all(existing != field_name for existing, _ in candidates):
+                    candidates.append((field_name, priority))
+        return index
+
+    def resolve(self, headers: Iterable) -> Dict[str, str]:
+        """
+        Retorna {campo: cabeçalho original} para os cabeçalhos reconhecidos
+        """
+        headers = tuple(headers)
+        signature = header_signature(headers)
+
+        with self._lock:
+            cached = self._cache.get(signature)
+            if cached is not None:
+                self._cache.move_to_end(signature)
+                return dict(cached)
+
+        resolved = self._resolve(headers)
+
+        with self._lock:
+            self._cache[signature] = resolved
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return dict(resolved)
+
+    def _resolve(self, headers: Tuple) -> Dict[str, str]:
+        # Para cada campo vale o alias de menor posição no mapeamento;
+        # em caso de empate, a primeira coluna do arquivo
+        best: Dict[str, Tuple[int, int, str]] = {}
+        for position, header in enumerate(headers):
+            for field_name, priority in self.index.get(normalize_header(header), []):
+                current = best.get(field_name)
+                if current is None or (priority, position) < current[:2]:
+                    best[field_name] = (priority, position, header)
+
+        return {
+            field_name: best[field_name][2]
+            for field_name in self.mapping
+            if field_name in best
+        }
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
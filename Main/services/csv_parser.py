@@ -0,0 +1,183 @@
+import codecs
+import csv
+import logging
+import re
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List
+
+import pandas as pd
+from django.conf import settings
+
+from .excel_parser import ExcelParser
+from .metrics import StageTimer
+
+logger = logging.getLogger(__name__)
+
+ENCODING_ERRORS = 'csv_cp1252_fallback'
+
+
+def _cp1252_fallback(error):
+    """
+    Bytes inválidos na codificação detectada (ex: uma linha cp1252 num arquivo
+    UTF-8, depois da amostra) são lidos como cp1252, ou latin-1 em último caso
+    """
+    if not isinstance(error, UnicodeDecodeError):
+        raise error
+    invalid = error.object[error.start:error.end]
+    try:
+        return invalid.decode('cp1252'), error.end
+    except UnicodeDecodeError:
+        return invalid.decode('latin-1'), error.end
+
+
+codecs.register_error(ENCODING_ERRORS, _cp1252_fallback)
+
+
+class CSVParser(ExcelParser):
+    """
+    Parser de arquivos texto de fornecedores: CSV (delimitador detectado) ou
+    colunas de largura fixa
+
+    Reaproveita o mapeamento de colunas e a extração do ExcelParser, mas lê o
+    arquivo em blocos de `chunk_size` linhas, sem carregá-lo inteiro na memória.
+    Todas as colunas são lidas como texto (preserva zeros à esquerda).
+    """
+
+    DELIMITERS = ';,\t|'
+
+    # Tentadas em ordem sobre a amostra do início do arquivo; bytes inválidos
+    # depois da amostra passam por _cp1252_fallback
+    ENCODINGS = ['utf-8-sig', 'cp1252', 'latin-1']
+
+    SAMPLE_SIZE = 65536
+
+    # Duas ou mais colunas separadas por 2+ espaços: layout de largura fixa
+    _FIXED_WIDTH_HEADER = re.compile(r'\S+(?: \S+)*(?: {2,}\S+(?: \S+)*)+')
+
+    def __init__(self, file_path: str, timer: StageTimer = None, profile=None, chunk_size: int = None):
+        super().__init__(file_path, timer=timer, profile=profile)
+        self.chunk_size = chunk_size or getattr(settings, 'PARSE_CHUNK_SIZE', 5000)
+        self.encoding = None
+        self.delimiter = None
+
+    def parse(self) -> List[Dict[str, Any]]:
+        try:
+            products = []
+            for chunk in self.iter_chunks():
+                products.extend(chunk)
+            logger.info(f"Total de {len(products)} produtos extraídos do arquivo texto")
+            return products
+
+        except Exception as e:
+            logger.error(f"Erro ao analisar arquivo CSV: {str(e)}")
+            raise
+
+    def iter_chunks(self) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Produtos de cada bloco de linhas do arquivo
+        """
+        with self.timer.stage('detect'):
+            self._detect_format()
+
+        rows = 0
+        with self.timer.stage('stream'):
+            for chunk_index, self.df in enumerate(self._read_chunks()):
+                self._normalize_columns()
+                if chunk_index == 0:
+                    self._map_chunk_columns()
+
+                products = []
+                for idx, row in self.df.iterrows():
+                    try:
+                        product_data = self._extract_product_data(row)
+                    except Exception as e:
+                        logger.error(f"Erro ao processar linha {idx + self.header_row + 2}: {str(e)}")
+                        continue
+
+                    if product_data.get('product_code'):
+                        # If description is missing, use product_code as description
+                        if not product_data.get('description'):
+                            product_data['description'] = f"Produto {product_data['product_code']}"
+                        products.append(product_data)
+                    else:
+                        logger.warning(f"Linha {idx + self.header_row + 2} ignorada: falta código")
+
+                rows += len(self.df)
+                yield products
+
+        stream = self.timer.stages['stream']
+        stream['rows'] = rows
+        stream['rows_per_second'] = round(rows / stream['seconds'], 1) if stream['seconds'] > 0 else None
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def _detect_format(self):
+        with open(self.file_path, 'rb') as text_file:
+            sample_bytes = text_file.read(self.SAMPLE_SIZE)
+
+        for encoding in self.ENCODINGS:
+            try:
+                # final=False: a amostra pode terminar no meio de um caractere
+                sample = codecs.getincrementaldecoder(encoding)().decode(sample_bytes, final=False)
+                break
+            except UnicodeDecodeError:
+                continue
+        self.encoding = encoding
+
+        lines = [line for line in sample.splitlines() if line.strip()]
+        if len(lines) > 1:
+            # A última linha da amostra pode estar incompleta
+            lines = lines[:-1]
+        header_index = self.profile.header_row if self.profile else 0
+        header_line = lines[header_index] if len(lines) > header_index else ''
+
+        try:
+            self.delimiter = csv.Sniffer().sniff('\n'.join(lines), delimiters=self.DELIMITERS).delimiter
+        except csv.Error:
+            # Sem delimitador: colunas de largura fixa, ou uma única coluna (padrão ';' do Protheus)
+            self.delimiter = None if self._FIXED_WIDTH_HEADER.fullmatch(header_line.strip()) else ';'
+
+        logger.info(
+            f"Arquivo texto: codificação {self.encoding}, "
+            f"{'largura fixa' if self.delimiter is None else f'delimitador {self.delimiter!r}'}"
+        )
+
+    def _read_chunks(self) -> Iterator[pd.DataFrame]:
+        self.header_row = self.profile.header_row if self.profile else 0
+        options = {
+            'header': self.header_row,
+            'dtype': str,
+            'encoding': self.encoding,
+            'encoding_errors': ENCODING_ERRORS,
+            'chunksize': self.chunk_size,
+            'skip_blank_lines': True,
+        }
+        if self.delimiter is None:
+            reader = pd.read_fwf(self.file_path, colspecs='infer', **options)
+        else:
+            reader = pd.read_csv(self.file_path, sep=self.delimiter, **options)
+
+        with reader:
+            yield from reader
+
+    def _map_chunk_columns(self):
+        if self.profile and self.profile.column_mapping:
+            self._map_columns_from_profile()
+            if 'codigo' in self.column_map:
+                return
+            logger.warning(
+                f"Layout do perfil {self.profile.fornecedor_code} não corresponde ao arquivo; detectando colunas"
+            )
+        self._map_columns()
+
+    def get_layout(self) -> Dict[str, Any]:
+        # Todas as colunas já são lidas como texto
+        return {**super().get_layout(), 'dtypes': {}}
+
+    def _parse_decimal(self, value, default=None) -> Decimal:
+        # Formato brasileiro com separador de milhar: "1.234,56"
+        if isinstance(value, str) and ',' in value and '.' in value and value.rfind(',') > value.rfind('.'):
+            value = value.replace('.', '')
+        return super()._parse_decimal(value, default)
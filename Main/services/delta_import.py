@@ -0,0 +1,117 @@
+"""
+Importação delta: compara os produtos recebidos com o produto mais recente de
+cada par (fornecedor, código) e separa o que é novo, alterado ou inalterado
+
+A comparação usa o código como foi importado (Product.imported_code): a
+validação pode trocar o product_code pelo código encontrado no Protheus, e o
+produto validado não pode voltar como novo na importação seguinte.
+
+O fornecedor de um produto é o da linha (supplier_code) ou, sem ele, o do
+upload/lote: planilhas de fornecedores diferentes sem a coluna de fornecedor
+nunca se comparam entre si.
+"""
+import hashlib
+import json
+from decimal import Decimal
+from typing import Any, Dict, List, Set, Tuple
+
+from django.db.models.functions import Coalesce
+
+from Main.models import Product
+
+# Campos que não entram no hash (origem/controle, não conteúdo do produto)
+HASH_EXCLUDED_FIELDS = frozenset({'raw_data', 'source_code', 'source_sheet', 'imported_code'})
+
+LOOKUP_CHUNK_SIZE = 500
+
+
+def _hash_value(value):
+    if isinstance(value, Decimal):
+        # 66, 66.0 e 66.0000 (como vem do banco) são o mesmo valor
+        return format(value.normalize(), 'f')
+    if value is None:
+        return None
+    return str(value)
+
+
+def content_hash(product_data: Dict[str, Any]) -> str:
+    """
+    Hash dos campos do produto vindos do parse
+    """
+    values = sorted(
+        (key, _hash_value(value))
+        for key, value in product_data.items()
+        if key not in HASH_EXCLUDED_FIELDS
+    )
+    return hashlib.sha1(json.dumps(values, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def match_key(product_data: Dict[str, Any], default_supplier: str = None) -> Tuple[str, str]:
+    return product_data.get('supplier_code') or default_supplier, product_data.get('product_code')
+
+
+def latest_products(keys) -> Dict[Tuple[str, str], Product]:
+    """
+    Produto mais recente de cada (fornecedor, código importado), consultando
+    pelo código importado em blocos; o fornecedor é o do produto ou o do lote
+    """
+    by_supplier: Dict[str, List[str]] = {}
+    for supplier_code, product_code in keys:
+        by_supplier.setdefault(supplier_code, []).append(product_code)
+
+    latest: Dict[Tuple[str, str], Product] = {}
+    for supplier_code, product_codes in by_supplier.items():
+        for start in range(0, len(product_codes), LOOKUP_CHUNK_SIZE):
+            queryset = Product.objects.annotate(
+                match_supplier=Coalesce('supplier_code', 'batch__fornecedor_code')
+            ).filter(imported_code__in=product_codes[start:start + LOOKUP_CHUNK_SIZE])
+            if supplier_code is None:
+                queryset = queryset.filter(match_supplier__isnull=True)
+            else:
+                queryset = queryset.filter(match_supplier=supplier_code)
+
+            # Em ordem crescente: o último visto de cada chave é o mais recente
+            for product in queryset.order_by('created_at', 'id'):
+                latest[(product.match_supplier, product.imported_code)] = product
+    return latest
+
+
+def diff_products(products_data: List[Dict[str, Any]], matched: Set[Tuple[str, str]] = None,
+                  default_supplier: str = None):
+    """
+    Separa os produtos recebidos em novos, alterados e inalterados
+
+    `matched` (chaves já comparadas) é compartilhado entre os blocos de um mesmo
+    arquivo, para que linhas repetidas em blocos diferentes entrem como novas.
+    `default_supplier` é o fornecedor do upload, usado nas linhas sem fornecedor.
+
+    Returns:
+        (novos [dados], alterados [(produto existente, dados)], quantidade inalterada)
+    """
+    incoming = []
+    for product_data in products_data:
+        product_data = dict(product_data)
+        product_data['content_hash'] = content_hash(product_data)
+        incoming.append(product_data)
+
+    existing = latest_products({match_key(product_data, default_supplier) for product_data in incoming})
+
+    new, changed = [], []
+    unchanged = 0
+    if matched is None:
+        matched = set()
+    for product_data in incoming:
+        key = match_key(product_data, default_supplier)
+        product = existing.get(key)
+        if product is None or key in matched:
+            # Linhas repetidas no arquivo entram como novos produtos
+            new.append(product_data)
+            continue
+
+        matched.add(key)
+        if product.content_hash == product_data['content_hash']:
+            unchanged += 1
+        else:
+            changed.append((product, product_data))
+
+    return new, changed, unchanged
@@ -1,8 +1,12 @@
 import pandas as pd
 from decimal import Decimal
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
 import logging
 
+from .metrics import StageTimer
+from .column_resolver import ColumnResolver, header_signature
+from .normalization import apply_normalization_rule
+
 logger = logging.getLogger(__name__)
 
 
@@ -41,33 +45,58 @@ class ExcelParser:
         'observacoes': ['observacoes', 'obs', 'observations', 'observações', 'observacao', 'notas'],
     }
 
-    def __init__(self, file_path: str, sheet_name: str = None):
+    # Índice reverso dos aliases, montado uma vez na importação do módulo
+    COLUMN_RESOLVER = ColumnResolver(COLUMN_MAPPING)
+
+    # Campos lidos como texto quando um perfil é aprendido (preserva zeros à esquerda)
+    TEXT_FIELDS = ['codigo', 'ncm', 'codigo_barras', 'fornecedor_codigo', 'origem', 'armazem']
+
+    def __init__(self, file_path: str, sheet_name: str = None, timer: StageTimer = None, profile=None):
         self.file_path = file_path
         self.sheet_name = sheet_name
         self.df = None
         self.column_map = {}
+        self.timer = timer or StageTimer()
+        self.profile = profile
+        self.header_row = 0
+        self.original_columns = {}
+        self.sheet_results = {}
 
     def parse(self) -> List[Dict[str, Any]]:
         try:
-            if self.sheet_name:
-                self.df = pd.read_excel(self.file_path, sheet_name=self.sheet_name)
-            else:
-                self.df = pd.read_excel(self.file_path)
+            with self.timer.stage('read'):
+                use_profile = bool(self.profile and self.profile.column_mapping)
+                if use_profile:
+                    self._read_with_profile()
+                else:
+                    self._read()
 
-            # Check if first row contains headers (if columns are "Unnamed: X")
-            if all('unnamed' in str(col).lower() for col in self.df.columns):
-                # Use first row as headers
-                self.df.columns = self.df.iloc[0]
-                self.df = self.df[1:].reset_index(drop=True)
+            with self.timer.stage('map', rows=len(self.df)):
+                self._normalize_columns()
+                if use_profile:
+                    self._map_columns_from_profile()
 
-            self.df.columns = self.df.columns.str.strip().str.lower()
+                if not use_profile or 'codigo' not in self.column_map:
+                    if use_profile:
+                        logger.warning(
+                            f"Layout do perfil {self.profile.fornecedor_code} não corresponde ao arquivo; detectando colunas"
+                        )
+                        self._read()
+                        self._normalize_columns()
+                    self._map_columns()
 
-            self._map_columns()
+            extracted = []
+            with self.timer.stage('extract', rows=len(self.df)):
+                for idx, row in self.df.iterrows():
+                    try:
+                        extracted.append((idx, self._extract_product_data(row)))
+                    except Exception as e:
+                        logger.error(f"Erro ao processar linha {idx + 2}: {str(e)}")
+                        continue
 
             products = []
-            for idx, row in self.df.iterrows():
-                try:
-                    product_data = self._extract_product_data(row)
+            with self.timer.stage('validate', rows=len(extracted)):
+                for idx, product_data in extracted:
                     if product_data.get('product_code'):
                         # If description is missing, use product_code as description
                         if not product_data.get('description'):
@@ -75,9 +104,6 @@ class ExcelParser:
                         products.append(product_data)
                     else:
                         logger.warning(f"Linha {idx + 2} ignorada: falta código")
-                except Exception as e:
-                    logger.error(f"Erro ao processar linha {idx + 2}: {str(e)}")
-                    continue
 
             logger.info(f"Total de {len(products)} produtos extraídos do Excel")
             return products
@@ -86,27 +112,113 @@ class ExcelParser:
             logger.error(f"Erro ao analisar arquivo Excel: {str(e)}")
             raise
 
+    def _read(self):
+        self.header_row = 0
+        if self.sheet_name:
+            self.df = pd.read_excel(self.file_path, sheet_name=self.sheet_name)
+        else:
+            self.df = pd.read_excel(self.file_path)
+
+        # Check if first row contains headers (if columns are "Unnamed: X")
+        if all('unnamed' in str(col).lower() for col in self.df.columns):
+            # Use first row as headers
+            self.df.columns = self.df.iloc[0]
+            self.df = self.df[1:].reset_index(drop=True)
+            self.header_row = 1
+
+    def _read_with_profile(self):
+        """
+        Lê apenas as colunas do perfil, com a planilha, o cabeçalho e os dtypes
+        já conhecidos (sem detecção)
+        """
+        profile = self.profile
+        wanted = {str(col).strip().lower() for col in profile.column_mapping.values()}
+
+        with pd.ExcelFile(self.file_path) as excel_file:
+            sheet_name = self.sheet_name or profile.sheet_name or 0
+            if isinstance(sheet_name, str) and sheet_name not in excel_file.sheet_names:
+                logger.warning(f"Planilha '{sheet_name}' do perfil {profile.fornecedor_code} não encontrada; usando a primeira")
+                sheet_name = 0
+
+            self.df = excel_file.parse(
+                sheet_name=sheet_name,
+                header=profile.header_row,
+                usecols=lambda col: str(col).strip().lower() in wanted,
+                dtype=profile.dtypes or None,
+            )
+        self.header_row = profile.header_row
+
+    def _normalize_columns(self):
+        columns = [str(col).strip().lower() for col in self.df.columns]
+        # Cabeçalhos repetidos ou em branco: vale a primeira coluna com o nome
+        self.original_columns = {}
+        for column, original in zip(columns, self.df.columns):
+            self.original_columns.setdefault(column, original)
+        self.df.columns = columns
+
+    def _map_columns_from_profile(self):
+        self.column_map = {}
+        for field_name, column_name in self.profile.column_mapping.items():
+            column_name = str(column_name).strip().lower()
+            if column_name in self.original_columns:
+                self.column_map[field_name] = column_name
+
     def _map_columns(self):
-        df_columns = set(self.df.columns)
+        self.column_map = self.COLUMN_RESOLVER.resolve(self.df.columns)
+
+        for field_name, column_name in self.column_map.items():
+            logger.debug(f"Campo '{field_name}' mapeado para a coluna '{column_name}'")
+
+    def get_layout(self) -> Dict[str, Any]:
+        """
+        Layout detectado neste arquivo, usado para aprender um ImportProfile
+        """
+        column_mapping = {
+            field_name: str(self.original_columns.get(column_name, column_name))
+            for field_name, column_name in self.column_map.items()
+        }
+        return {
+            'sheet_name': self.sheet_name,
+            'header_row': self.header_row,
+            'column_mapping': column_mapping,
+            'dtypes': {
+                column_mapping[field_name]: 'str'
+                for field_name in self.TEXT_FIELDS if field_name in column_mapping
+            },
+        }
 
-        for field_name, possible_names in self.COLUMN_MAPPING.items():
-            for possible_name in possible_names:
-                if possible_name in df_columns:
-                    self.column_map[field_name] = possible_name
-                    break
+    def get_mapping_log(self) -> Dict[str, Any]:
+        """
+        Resumo do mapeamento de colunas (exibido no admin do upload)
+        """
+        columns = list(self.df.columns) if self.df is not None else []
+        mapped = set(self.column_map.values())
+        return {
+            'header_signature': header_signature(columns),
+            'columns': dict(self.column_map),
+            'unmapped': [col for col in columns if col not in mapped],
+        }
 
     def _get_column_value(self, row, field_name: str, default=None):
         if field_name in self.column_map:
             column_name = self.column_map[field_name]
             value = row.get(column_name, default)
+            if isinstance(value, pd.Series):
+                # Coluna com cabeçalho repetido: vale a primeira
+                value = value.iloc[0]
             if pd.isna(value):
                 return default
             return value
         return default
 
     def _extract_product_data(self, row) -> Dict[str, Any]:
+        product_code = str(self._get_column_value(row, 'codigo', '')).strip()
+        source_code = product_code
+        if self.profile and self.profile.normalization_rule and product_code:
+            product_code = apply_normalization_rule(product_code, self.profile.normalization_rule)
+
         product_data = {
-            'product_code': str(self._get_column_value(row, 'codigo', '')).strip(),
+            'product_code': product_code,
             'description': str(self._get_column_value(row, 'descricao', '')).strip(),
             'short_description': str(self._get_column_value(row, 'descricao_curta', '')).strip() or None,
             'product_type': str(self._get_column_value(row, 'tipo', '')).strip() or None,
@@ -152,6 +264,8 @@ class ExcelParser:
                 clean_raw_data[key] = value
 
         product_data['raw_data'] = clean_raw_data
+        if source_code != product_code:
+            product_data['source_code'] = source_code
 
         return product_data
 
@@ -188,6 +302,53 @@ class ExcelParser:
 
         return default
 
+    def parse_sheets(self, sheet_names: List[str] = None,
+                     executor=None) -> Tuple[List[Tuple[tuple, list]], Dict[str, str]]:
+        """
+        Lê todas as planilhas (ou as informadas) em paralelo, no pool de parse
+
+        Os produtos ficam nos blocos compactos de cada planilha, na ordem das
+        planilhas: os dicts só são montados bloco a bloco, na gravação.
+
+        Returns:
+            (blocos de todas as planilhas com 'source_sheet', {planilha: erro})
+        """
+        from .parse_executor import count_records, get_parse_executor, profile_snapshot
+
+        sheet_names = sheet_names or self.get_sheet_names()
+        if not sheet_names:
+            raise ValueError("Nenhuma planilha encontrada no arquivo")
+
+        executor = executor or get_parse_executor()
+        profile = profile_snapshot(self.profile)
+        futures = {
+            sheet_name: executor.submit('EXCEL', self.file_path, sheet_name=sheet_name, profile=profile)
+            for sheet_name in sheet_names
+        }
+
+        chunks = []
+        errors = {}
+        self.sheet_results = {}
+        for sheet_name, future in futures.items():
+            try:
+                result = executor.result(future)
+            except Exception as e:
+                logger.error(f"Erro ao processar planilha '{sheet_name}': {str(e)}")
+                errors[sheet_name] = str(e)
+                continue
+
+            if not result['count']:
+                errors[sheet_name] = "Nenhum produto encontrado na planilha"
+            chunks.extend(result['chunks'])
+            self.sheet_results[sheet_name] = {
+                'products': result['count'],
+                'column_mapping': result['column_mapping'],
+                'stage_metrics': result['stage_metrics'],
+            }
+
+        logger.info(f"Total de {count_records(chunks)} produtos extraídos de {len(sheet_names)} planilhas")
+        return chunks, errors
+
     def get_sheet_names(self) -> List[str]:
         try:
             excel_file = pd.ExcelFile(self.file_path)
@@ -195,3 +356,4 @@ class ExcelParser:
         except Exception as e:
             logger.error(f"Erro ao obter nomes das planilhas: {str(e)}")
             return []
+
@@ -0,0 +1,194 @@
+"""
+Exportação de produtos (um lote ou a listagem filtrada) para CSV e XLSX
+
+As linhas vêm de .values_list().iterator(chunk_size=EXPORT_CHUNK_SIZE): nenhum
+modelo é instanciado e só um bloco de linhas fica na memória por vez, qualquer
+que seja o tamanho do lote. O CSV é gerado em fluxo; o XLSX é gravado pelo
+openpyxl em modo write_only num arquivo temporário (o ZIP só pode ser fechado
+no fim) e enviado em blocos.
+"""
+import csv
+import io
+import tempfile
+from decimal import Decimal
+from typing import AsyncIterator, Iterator
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+from Main.models import Product
+
+# (campo do .values_list(), título da coluna)
+EXPORT_COLUMNS = [
+    ('batch__batch_code', 'Lote'),
+    ('product_code', 'Código do Produto'),
+    ('description', 'Descrição'),
+    ('supplier_code', 'Código do Fornecedor'),
+    ('supplier_name', 'Nome do Fornecedor'),
+    ('unit_of_measure', 'Unidade de Medida'),
+    ('ncm_code', 'NCM'),
+    ('barcode', 'Código de Barras'),
+    ('quantity', 'Quantidade'),
+    ('unit_value', 'Valor Unitário'),
+    ('discount', 'Desconto'),
+    ('sale_price', 'Preço de Venda'),
+    ('cost_price', 'Preço de Custo'),
+    ('icms_base', 'Base Cálculo ICMS'),
+    ('ipi_percentage', '% IPI'),
+    ('icms_percentage', '% ICMS'),
+    ('validation_status', 'Status de Validação'),
+    ('validation_error', 'Erro de Validação'),
+    ('synced_to_protheus', 'Sincronizado com Protheus'),
+]
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Texto iniciado por estes caracteres é interpretado como fórmula pelo Excel
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+FILE_BLOCK_SIZE = 64 * 1024
+
+STATUS_LABELS = dict(Product.VALIDATION_STATUS_CHOICES)
+
+
+def iter_product_rows(queryset) -> Iterator[list]:
+    """
+    Linhas da exportação (valores na ordem de EXPORT_COLUMNS), lidas em blocos
+    """
+    fields = [field for field, _ in EXPORT_COLUMNS]
+    status_index = fields.index('validation_status')
+    synced_index = fields.index('synced_to_protheus')
+
+    chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    for values in queryset.values_list(*fields).iterator(chunk_size=chunk_size):
+        row = list(values)
+        row[status_index] = STATUS_LABELS.get(row[status_index], row[status_index])
+        row[synced_index] = 'Sim' if row[synced_index] else 'Não'
+        yield row
+
+
+# ----------------------------------------------------------------------
+# CSV
+# ----------------------------------------------------------------------
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, Decimal):
+        # Formato brasileiro, como o Excel em pt-BR e o importador (CSVParser) esperam
+        return '{:f}'.format(value).replace('.', ',')
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(queryset) -> Iterator[bytes]:
+    """
+    CSV com ';' e BOM (acentos corretos no Excel), um bloco de bytes por EXPORT_CHUNK_SIZE linhas
+    """
+    chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+
+    buffer.write('\ufeff')
+    writer.writerow([title for _, title in EXPORT_COLUMNS])
+    for index, row in enumerate(iter_product_rows(queryset), 1):
+        writer.writerow([_csv_value(value) for value in row])
+        if index % chunk_size == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+# ----------------------------------------------------------------------
+# XLSX
+# ----------------------------------------------------------------------
+
+def write_xlsx(queryset, target):
+    """
+    Grava a planilha em `target` (caminho ou arquivo binário) com o openpyxl em
+    modo write_only: cada linha vai direto para o XML temporário da planilha
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+    from openpyxl.styles import Font
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Produtos')
+    sheet.freeze_panes = 'A2'
+
+    header_font = Font(bold=True)
+    header = []
+    for _, title in EXPORT_COLUMNS:
+        cell = WriteOnlyCell(sheet, title)
+        cell.font = header_font
+        header.append(cell)
+    sheet.append(header)
+
+    def xlsx_value(value):
+        if not isinstance(value, str):
+            return value
+        # Caracteres de controle são rejeitados pelo openpyxl
+        value = ILLEGAL_CHARACTERS_RE.sub('', value)
+        if value.startswith('='):
+            # Texto, não fórmula
+            cell = WriteOnlyCell(sheet, value)
+            cell.data_type = 's'
+            return cell
+        return value
+
+    for row in iter_product_rows(queryset):
+        sheet.append([xlsx_value(value) for value in row])
+
+    workbook.save(target)
+
+
+def iter_xlsx(queryset) -> Iterator[bytes]:
+    with tempfile.TemporaryFile() as target:
+        write_xlsx(queryset, target)
+        target.seek(0)
+        yield from iter(lambda: target.read(FILE_BLOCK_SIZE), b'')
+
+
+# ----------------------------------------------------------------------
+# Resposta
+# ----------------------------------------------------------------------
+
+async def _aiter_chunks(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Consome o gerador síncrono (banco, openpyxl) em thread, um bloco por vez
+    """
+    next_chunk = sync_to_async(next)
+    try:
+        while True:
+            chunk = await next_chunk(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
+
+
+def export_response(request, queryset, file_format: str, filename: str) -> StreamingHttpResponse:
+    """
+    Download em fluxo da exportação
+
+    O iterador segue o servidor: no ASGI (uvicorn) o Django leria um iterador
+    síncrono inteiro para a memória antes de enviar, e no WSGI faria o mesmo
+    com um assíncrono.
+    """
+    chunks = iter_csv(queryset) if file_format == 'csv' else iter_xlsx(queryset)
+    if isinstance(request, ASGIRequest):
+        chunks = _aiter_chunks(chunks)
+
+    response = StreamingHttpResponse(chunks, content_type=EXPORT_FORMATS[file_format])
+    response['Content-Disposition'] = content_disposition_header(True, f"{filename}.{file_format}")
+    return response
@@ -1,25 +1,53 @@
 import os
+import shutil
 import uuid
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
 import logging
 
+from django.conf import settings
+from django.core.files.storage import default_storage
 from django.db import transaction
 from django.core.files.uploadedfile import UploadedFile
+from django.utils import timezone
 
-from Main.models import FileUpload, ProductBatch, Product
-from .excel_parser import ExcelParser
-from .xml_parser import XMLParser
+from Main.models import FileUpload, ProductBatch, Product, ImportProfile
+from .code_validation import prevalidate_batch, supplier_codes_by_document
+from .delta_import import content_hash, diff_products
+from .metrics import StageTimer
+from .normalization import apply_normalization_rule, rule_for
+from .parse_executor import count_records, get_parse_executor, iter_record_chunks, profile_snapshot, set_field
+from .parsed_cache import NFE_SUPPLIER_DOCUMENT, SOURCE_CODE_FIELD, ParsedCacheWriter, read_parsed_cache
 
 logger = logging.getLogger(__name__)
 
+BULK_BATCH_SIZE = 1000
+
+# Produtos do parse em blocos compactos (campos, [tuplas]), como devolvidos pelo pool
+Chunks = List[Tuple[tuple, list]]
+
 
 class FileProcessor:
 
     def __init__(self, file_upload: FileUpload):
         self.file_upload = file_upload
-
-    def process(self) -> Dict[str, Any]:
+        self.profile = file_upload.import_profile
+        self.layout = None
+        self.sheet_errors = {}
+        self.file_errors = {}
+        # Pacotes (ZIP): situação de cada arquivo
+        self.file_report = None
+        self.timer = StageTimer(track_memory=getattr(settings, 'UPLOAD_TRACK_MEMORY', False))
+
+    def process(self, parse_result: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Processa o arquivo do upload; com `parse_result` (resultado do pool de
+        parse já obtido, ex: upload de vários arquivos) o arquivo não é lido de novo
+
+        Os produtos seguem nos blocos compactos do pool até a gravação, que
+        monta os dicts e grava um bloco por vez.
+        """
+        self.timer.start()
         try:
             self.file_upload.status = 'PROCESSING'
             self.file_upload.save()
@@ -27,26 +55,58 @@ class FileProcessor:
             file_path = self.file_upload.file.path
             file_type = self.file_upload.file_type
 
-            products_data = []
-
-            if file_type == 'EXCEL':
-                products_data = self._process_excel(file_path)
+            if parse_result is not None:
+                chunks = self._apply_parse_result(parse_result)
+            elif file_type == 'ZIP':
+                chunks = self._process_zip(file_path)
+            elif file_type == 'XML' and file_path.lower().endswith('.zip'):
+                # NF-e em lote: mesmo caminho dos pacotes, só com os XMLs
+                chunks = self._process_zip(file_path, file_types={'XML'})
+            elif file_type == 'EXCEL':
+                chunks = self._process_excel(file_path)
             elif file_type == 'XML':
-                products_data = self._process_xml(file_path)
+                chunks = self._process_xml(file_path)
+            elif file_type == 'CSV':
+                chunks = self._process_csv(file_path)
             else:
                 raise ValueError(f"Tipo de arquivo não suportado: {file_type}")
 
-            if not products_data:
+            total = count_records(chunks)
+            if not total:
                 raise ValueError("Nenhum produto encontrado no arquivo")
 
-            result = self._save_products(products_data)
+            with self.timer.stage('save', rows=total):
+                result = self._save_products(chunks, total)
+
+            if result['batch'] is not None and result['batch'].product_group:
+                with self.timer.stage('prevalidate'):
+                    prevalidate_batch(result['batch'])
+
+            if self.file_report is not None:
+                for entry in self.file_report:
+                    if entry['status'] == 'COMPLETED':
+                        entry['batch_code'] = result['batch_code']
+                self.file_upload.file_report = self.file_report
+
+            result['errors'] = [
+                f"Planilha {sheet_name}: {error}" for sheet_name, error in self.sheet_errors.items()
+            ] + [
+                f"Arquivo {file_name}: {error}" for file_name, error in self.file_errors.items()
+            ] + result['errors']
 
             self.file_upload.status = 'COMPLETED'
             self.file_upload.total_records = result['total']
             self.file_upload.processed_records = result['saved']
+            self._store_metrics(result['total'])
             self.file_upload.save()
 
-            logger.info(f"Processamento concluído: {result['saved']} de {result['total']} produtos salvos")
+            self._remember_profile()
+
+            logger.info(
+                f"Processamento concluído: {result['saved']} de {result['total']} produtos salvos "
+                f"em {self.file_upload.processing_time:.2f}s",
+                extra={'upload_id': self.file_upload.id, 'stage_metrics': self.file_upload.stage_metrics}
+            )
 
             return {
                 'success': True,
@@ -54,12 +114,16 @@ class FileProcessor:
                 'total': result['total'],
                 'saved': result['saved'],
                 'errors': result['errors'],
-                'batch_code': result['batch_code']
+                'batch_code': result['batch_code'],
+                'delta_summary': self.file_upload.delta_summary
             }
 
         except Exception as e:
             self.file_upload.status = 'FAILED'
             self.file_upload.error_message = str(e)
+            if self.file_report is not None:
+                self.file_upload.file_report = self.file_report
+            self._store_metrics(0)
             self.file_upload.save()
 
             logger.error(f"Erro ao processar arquivo: {str(e)}")
@@ -72,25 +136,175 @@ class FileProcessor:
                 'errors': [str(e)]
             }
 
-    def _process_excel(self, file_path: str) -> List[Dict[str, Any]]:
+    def _store_metrics(self, total_rows: int):
+        self.timer.stop()
+        self.file_upload.processing_time = self.timer.total_seconds
+        self.file_upload.rows_per_second = self.timer.rows_per_second(total_rows) if total_rows else None
+        self.file_upload.peak_memory_kb = self.timer.peak_memory_kb
+        self.file_upload.stage_metrics = self.timer.as_dict()
+
+    def _remember_profile(self):
+        """
+        Atualiza o uso do perfil aplicado ou aprende um novo perfil a partir do
+        layout detectado, quando o fornecedor foi informado no upload
+        """
+        if self.profile:
+            ImportProfile.objects.filter(pk=self.profile.pk).update(last_used_at=timezone.now())
+            return
+
+        fornecedor_code = self.file_upload.fornecedor_code
+        layout = self.layout
+        if not fornecedor_code or not layout:
+            return
+
+        if 'codigo' not in layout['column_mapping'] and 'product_code' not in layout['column_mapping']:
+            return
+
+        profile, created = ImportProfile.objects.get_or_create(
+            fornecedor_code=fornecedor_code,
+            file_type=self.file_upload.file_type,
+            defaults={**layout, 'last_used_at': timezone.now()}
+        )
+        if created:
+            logger.info(f"Perfil de importação criado para o fornecedor {fornecedor_code}")
+        self.file_upload.import_profile = profile
+        self.file_upload.save(update_fields=['import_profile'])
+
+    def _parse_file(self, kind: str, file_path: str) -> Chunks:
+        """
+        Faz o parse no pool de processos (ParseExecutor)
+        """
+        result = get_parse_executor().parse(
+            kind, file_path,
+            profile=profile_snapshot(self.profile),
+            track_memory=self.timer.track_memory
+        )
+        return self._apply_parse_result(result)
+
+    def _apply_parse_result(self, result: Dict[str, Any]) -> Chunks:
+        self.timer.stages.update(result['stage_metrics'])
+        self.layout = result['layout']
+        self.file_errors = result.get('file_errors') or {}
+        if result['column_mapping'] is not None:
+            self.file_upload.column_mapping = result['column_mapping']
+        return result['chunks']
+
+    def _resolve_suppliers(self, products_data: List[Dict[str, Any]]):
+        """
+        Itens de NF-e trazem o CNPJ/CPF do emitente, não o A2_COD: o código é
+        buscado no espelho do SA2 (sem correspondência, fica o do upload)
+        """
+        pending = [
+            product_data for product_data in products_data
+            if not product_data.get('supplier_code')
+            and (product_data.get('raw_data') or {}).get(NFE_SUPPLIER_DOCUMENT)
+        ]
+        if not pending:
+            return
+
+        codes = supplier_codes_by_document(
+            product_data['raw_data'][NFE_SUPPLIER_DOCUMENT] for product_data in pending
+        )
+        missing = set()
+        for product_data in pending:
+            document = product_data['raw_data'][NFE_SUPPLIER_DOCUMENT]
+            code = codes.get(document)
+            if code:
+                product_data['supplier_code'] = code
+            else:
+                missing.add(document)
+        for document in sorted(missing):
+            logger.warning(f"Emitente {document} sem fornecedor correspondente no cadastro")
+
+    def _process_excel(self, file_path: str) -> Chunks:
+        from .excel_parser import ExcelParser
+
         logger.info(f"Processando arquivo Excel: {file_path}")
-        parser = ExcelParser(file_path)
-        products = parser.parse()
-        return products
 
-    def _process_xml(self, file_path: str) -> List[Dict[str, Any]]:
+        if self.file_upload.multi_sheet:
+            parser = ExcelParser(file_path, profile=self.profile)
+            with self.timer.stage('parse_sheets'):
+                chunks, self.sheet_errors = parser.parse_sheets()
+            self.file_upload.column_mapping = {
+                sheet_name: result['column_mapping'] for sheet_name, result in parser.sheet_results.items()
+            }
+            self.timer.stages['sheets'] = {
+                sheet_name: result['stage_metrics'] for sheet_name, result in parser.sheet_results.items()
+            }
+            return chunks
+
+        return self._parse_file('EXCEL', file_path)
+
+    def _process_xml(self, file_path: str) -> Chunks:
         logger.info(f"Processando arquivo XML: {file_path}")
-        parser = XMLParser(file_path)
-        products = parser.parse()
-        return products
+        return self._parse_file('XML', file_path)
 
-    def _save_products(self, products_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _process_zip(self, file_path: str, file_types=None) -> Chunks:
+        """
+        Pacote de arquivos num único lote: extrai, faz o parse de todos em
+        paralelo no pool e junta os produtos ('source_sheet' = arquivo de origem)
+
+        `file_types`: tipos aceitos no pacote (padrão, todos os suportados)
+        """
+        from .multi_upload import extract_archive, extraction_dir, parse_members
+
+        logger.info(f"Processando pacote de arquivos: {file_path}")
+        destination = extraction_dir(self.file_upload)
+        self.file_report = []
+        try:
+            with self.timer.stage('extract_archive'):
+                members, skipped = extract_archive(file_path, destination, file_types)
+            self.file_report.extend(
+                {'file': name, 'status': 'SKIPPED', 'error': reason} for name, reason in skipped.items()
+            )
+            if not members:
+                raise ValueError("Nenhum arquivo suportado encontrado no pacote")
+
+            with self.timer.stage('parse_files'):
+                results = parse_members(members, self.file_upload.fornecedor_code,
+                                        track_memory=self.timer.track_memory)
+        finally:
+            # O pacote original continua guardado; os arquivos extraídos não são mais necessários
+            shutil.rmtree(default_storage.path(destination), ignore_errors=True)
+
+        chunks = []
+        files = {}
+        for member in members:
+            result = results[member.name]
+            if isinstance(result, Exception):
+                self.file_errors[member.name] = str(result)
+                self.file_report.append({'file': member.name, 'status': 'FAILED', 'error': str(result)})
+                continue
+
+            member_chunks = set_field(result['chunks'], 'source_sheet', member.name[:100])
+            member_total = count_records(member_chunks)
+            chunks.extend(member_chunks)
+
+            file_errors = result.get('file_errors') or {}
+            self.file_report.append({
+                'file': member.name,
+                'status': 'COMPLETED' if member_total else 'FAILED',
+                'total': member_total,
+                'error': '; '.join(f"{name}: {error}" for name, error in file_errors.items()) or (
+                    None if member_total else "Nenhum produto encontrado no arquivo"
+                ),
+            })
+            files[member.name] = result['stage_metrics']
+
+        self.timer.stages['files'] = files
+        return chunks
+
+    def _process_csv(self, file_path: str) -> Chunks:
+        logger.info(f"Processando arquivo CSV: {file_path}")
+        return self._parse_file('CSV', file_path)
+
+    def _save_products(self, chunks: Chunks, total: int) -> Dict[str, Any]:
         # Check if this file upload already has a batch
         try:
             existing_batch = ProductBatch.objects.get(file_upload=self.file_upload)
             logger.warning(f"FileUpload {self.file_upload.id} já possui um lote: {existing_batch.batch_code}")
             return {
-                'total': len(products_data),
+                'total': total,
                 'saved': 0,
                 'errors': ['Este arquivo já foi processado anteriormente'],
                 'batch_code': existing_batch.batch_code,
@@ -100,37 +314,106 @@ class FileProcessor:
             pass  # No existing batch, proceed normally
 
         batch_code = self._generate_batch_code()
+        batch_fields = {
+            'file_upload': self.file_upload,
+            'batch_code': batch_code,
+            'fornecedor_code': self.file_upload.fornecedor_code,
+            'product_group': self.profile.product_group if self.profile else None,
+        }
 
-        # Create ProductBatch first (outside of product-saving transaction)
-        # This ensures the batch exists even if product saving fails
-        batch = ProductBatch.objects.create(
-            file_upload=self.file_upload,
-            batch_code=batch_code
-        )
+        delta = self.file_upload.import_mode == 'DELTA'
+        if delta:
+            self.file_upload.delta_summary = {'inserted': 0, 'changed': 0, 'unchanged': 0}
+            # Delta: o lote só é criado quando há produtos novos ou alterados
+            batch = None
+        else:
+            # Create ProductBatch first (outside of product-saving transaction)
+            # This ensures the batch exists even if product saving fails
+            batch = ProductBatch.objects.create(**batch_fields)
+        matched = set()
 
+        saved_count = 0
+        errors = []
+        offset = 0
+        cache = ParsedCacheWriter(self.file_upload.file.name)
+        for products_data in iter_record_chunks(chunks):
+            self._resolve_suppliers(products_data)
+            cache.add(products_data)
+            if delta:
+                new, changed, unchanged = diff_products(products_data, matched, self.file_upload.fornecedor_code)
+                if batch is None and (new or changed):
+                    batch = ProductBatch.objects.create(**batch_fields)
+                chunk_saved, chunk_errors = self._save_products_delta(batch, new, changed, unchanged)
+            else:
+                chunk_saved, chunk_errors = self._create_products(batch, products_data, offset)
+            saved_count += chunk_saved
+            errors.extend(chunk_errors)
+            offset += len(products_data)
+
+        with self.timer.stage('cache', rows=total):
+            self.file_upload.parsed_cache = cache.close()
+
+        if delta:
+            summary = self.file_upload.delta_summary
+            logger.info(
+                f"Lote {batch_code} (delta): {summary['inserted']} novos, {summary['changed']} alterados, "
+                f"{summary['unchanged']} inalterados"
+            )
+        if batch is None:
+            logger.info("Importação delta sem produtos novos ou alterados: nenhum lote criado")
+            batch_code = None
+        else:
+            logger.info(f"Lote {batch_code}: {saved_count} produtos salvos de {total}")
+
+        return {
+            'total': total,
+            'saved': saved_count,
+            'errors': errors,
+            'batch_code': batch_code,
+            'batch': batch
+        }
+
+    def _create_products(self, batch: ProductBatch, products_data: List[Dict[str, Any]], offset: int = 0):
         saved_count = 0
         errors = []
 
-        # Save products within a transaction
+        # Save products in bulk, BULK_BATCH_SIZE at a time
         # If products fail to save, the batch still exists
+        for start in range(0, len(products_data), BULK_BATCH_SIZE):
+            chunk = products_data[start:start + BULK_BATCH_SIZE]
+            try:
+                with transaction.atomic():
+                    Product.objects.bulk_create(
+                        [self._build_product(batch, product_data) for product_data in chunk],
+                        batch_size=BULK_BATCH_SIZE
+                    )
+                saved_count += len(chunk)
+            except Exception as e:
+                # Um registro inválido derruba o bloco: grava um a um para identificar os erros
+                first = offset + start
+                logger.warning(f"Falha ao gravar o bloco {first + 1}-{first + len(chunk)} em lote: {str(e)}")
+                chunk_saved, chunk_errors = self._create_products_one_by_one(batch, chunk, first)
+                saved_count += chunk_saved
+                errors.extend(chunk_errors)
+
+        return saved_count, errors
+
+    def _create_products_one_by_one(self, batch: ProductBatch, products_data: List[Dict[str, Any]], offset: int = 0):
+        saved_count = 0
+        errors = []
+
         try:
             with transaction.atomic():
-                for idx, product_data in enumerate(products_data):
+                for idx, product_data in enumerate(products_data, start=offset):
                     try:
-                        # Make a copy to avoid modifying the original dict
-                        product_dict = product_data.copy()
-                        raw_data = product_dict.pop('raw_data', None)
-
-                        product = Product.objects.create(
-                            batch=batch,
-                            raw_data=raw_data,
-                            **product_dict
-                        )
+                        with transaction.atomic():
+                            product = self._build_product(batch, product_data)
+                            product.save(force_insert=True)
                         saved_count += 1
                         logger.debug(f"Produto salvo: {product.product_code}")
 
                     except Exception as e:
-                        error_msg = f"Erro ao salvar produto {idx + 1} ({product_dict.get('product_code', 'N/A')}): {str(e)}"
+                        error_msg = f"Erro ao salvar produto {idx + 1} ({product_data.get('product_code', 'N/A')}): {str(e)}"
                         logger.error(error_msg)
                         errors.append(error_msg)
                         # Continue processing other products even if one fails
@@ -138,13 +421,83 @@ class FileProcessor:
             logger.error(f"Erro crítico ao salvar produtos: {str(e)}")
             errors.append(f"Erro crítico: {str(e)}")
 
-        logger.info(f"Lote {batch_code}: {saved_count} produtos salvos de {len(products_data)}")
+        return saved_count, errors
+
+    def _save_products_delta(self, batch: ProductBatch, new: List[Dict[str, Any]],
+                             changed: List[Tuple[Product, Dict[str, Any]]], unchanged: int):
+        """
+        Importação delta (um bloco, já comparado por diff_products): o novo lote
+        recebe apenas os produtos novos e os alterados, como novas linhas com a
+        validação pendente. Os produtos anteriores (inclusive os já enviados ao
+        Protheus) ficam intactos nos seus lotes; inalterados não entram no novo lote.
+        """
+        errors = []
+
+        try:
+            with transaction.atomic():
+                Product.objects.bulk_create(
+                    [
+                        self._build_product(batch, product_data)
+                        for product_data in [*new, *(product_data for _, product_data in changed)]
+                    ],
+                    batch_size=BULK_BATCH_SIZE
+                )
+        except Exception as e:
+            logger.error(f"Erro crítico ao salvar produtos (delta): {str(e)}")
+            errors.append(f"Erro crítico: {str(e)}")
+            new, changed = [], []
+
+        summary = self.file_upload.delta_summary
+        summary['inserted'] += len(new)
+        summary['changed'] += len(changed)
+        summary['unchanged'] += unchanged
+        return len(new) + len(changed), errors
+
+    def _build_product(self, batch: ProductBatch, product_data: Dict[str, Any]) -> Product:
+        product_dict = product_data.copy()
+        product_dict.pop(SOURCE_CODE_FIELD, None)
+        product_dict.setdefault('content_hash', content_hash(product_dict))
+        product_dict.setdefault('imported_code', product_dict.get('product_code'))
+        return Product(batch=batch, **product_dict)
+
+    def rebuild_from_cache(self, batch: ProductBatch) -> Dict[str, Any]:
+        """
+        Recria os produtos do lote a partir do cache colunar do parse, sem reler
+        o arquivo original: os códigos voltam ao valor lido do arquivo e recebem
+        a regra de normalização do grupo/fornecedor atual do lote
+        """
+        cache_name = self.file_upload.parsed_cache
+        if not cache_name:
+            raise ValueError("Este upload não possui cache do parse")
+        if self.file_upload.import_mode == 'DELTA':
+            # O cache contém também os produtos inalterados, que ficaram em outros lotes
+            raise ValueError("Lotes de importação delta não podem ser reconstruídos do cache")
+        if batch.synced_to_protheus or batch.products.filter(synced_to_protheus=True).exists():
+            # Recriar os produtos perderia o estado de sincronização e permitiria reenviar o pedido
+            raise ValueError("Lotes já enviados ao Protheus não podem ser reconstruídos do cache")
+
+        with self.timer.stage('read_cache'):
+            products_data = read_parsed_cache(cache_name)
+
+        rule = rule_for(batch.product_group, batch.fornecedor_code)
+        for product in products_data:
+            product_code = product.pop(SOURCE_CODE_FIELD, None) or product['product_code']
+            product['product_code'] = apply_normalization_rule(product_code, rule) if product_code else product_code
+
+        with transaction.atomic():
+            batch.products.all().delete()
+            with self.timer.stage('save', rows=len(products_data)):
+                saved_count, errors = self._create_products(batch, products_data)
+
+        logger.info(f"Lote {batch.batch_code} reconstruído do cache: {saved_count} de {len(products_data)} produtos")
+
+        prevalidate_batch(batch)
 
         return {
             'total': len(products_data),
             'saved': saved_count,
             'errors': errors,
-            'batch_code': batch_code,
+            'batch_code': batch.batch_code,
             'batch': batch
         }
 
@@ -154,13 +507,31 @@ class FileProcessor:
         return f"BATCH-{timestamp}-{unique_id}"
 
 
-def process_uploaded_file(uploaded_file: UploadedFile, file_type: str, user=None) -> Dict[str, Any]:
+def process_uploaded_file(uploaded_file: UploadedFile, file_type: str, user=None,
+                          fornecedor_code: str = None, multi_sheet: bool = False,
+                          import_mode: str = 'FULL') -> Dict[str, Any]:
     try:
+        import_profile = None
+        if fornecedor_code:
+            import_profile = ImportProfile.objects.filter(
+                fornecedor_code=fornecedor_code, file_type=file_type
+            ).first()
+
+        # Arquivos recebidos pelo StreamingUploadHandler já estão no MEDIA_ROOT:
+        # basta referenciar o nome gravado, sem copiar os bytes de novo
+        stored_name = getattr(uploaded_file, 'stored_name', None)
+
         file_upload = FileUpload.objects.create(
-            file=uploaded_file,
+            file=stored_name or uploaded_file,
+            file_size=uploaded_file.size,
+            sha256=getattr(uploaded_file, 'sha256', None),
             file_type=file_type,
             uploaded_by=user,
-            status='PENDING'
+            status='PENDING',
+            fornecedor_code=fornecedor_code or None,
+            multi_sheet=multi_sheet and file_type == 'EXCEL',
+            import_mode=import_mode,
+            import_profile=import_profile
         )
 
         processor = FileProcessor(file_upload)
@@ -0,0 +1,293 @@
+"""
+Conferência fiscal dos produtos (NCM, IPI pela TIPI e alíquota de ICMS) com
+as tabelas de referência mantidas em memória
+"""
+import csv
+import json
+import logging
+import os
+import re
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, TextField, Value
+from django.db.models.functions import Concat
+
+from Main.models import FiscalTableLoad, NcmCode, TipiRate
+
+logger = logging.getLogger(__name__)
+
+LOAD_BATCH_SIZE = 2000
+
+# Cabeçalhos aceitos nos arquivos de carga (CSV ou JSON)
+NCM_CODE_KEYS = ('codigo', 'código', 'ncm', 'code')
+NCM_DESCRIPTION_KEYS = ('descricao', 'descrição', 'description')
+TIPI_RATE_KEYS = ('aliquota', 'alíquota', 'aliquota_ipi', 'ipi', 'rate')
+TIPI_EX_KEYS = ('ex', 'ex_tipi')
+
+# Número lido como float ("84322900.0")
+_NUMERIC_SUFFIX = re.compile(r'(\d+)\.0+')
+
+
+def normalize_ncm(value) -> Optional[str]:
+    """
+    NCM apenas com dígitos ("8432.29.00" -> "84322900"); células numéricas de
+    planilhas chegam como "84322900.0" e perdem o sufixo decimal
+    """
+    if value is None:
+        return None
+    text = str(value).strip()
+    match = _NUMERIC_SUFFIX.fullmatch(text)
+    if match:
+        text = match.group(1)
+    digits = ''.join(filter(str.isdigit, text))
+    return digits or None
+
+
+def _format_rate(value: Decimal) -> str:
+    return format(value.normalize(), 'f').replace('.', ',')
+
+
+def _parse_rate(value) -> Optional[Decimal]:
+    """
+    Alíquota da TIPI; "NT" (não tributado) ou vazio -> None
+    """
+    if value is None:
+        return None
+    text = str(value).strip().replace('%', '').replace(',', '.')
+    if not text or text.upper() == 'NT':
+        return None
+    try:
+        return Decimal(text)
+    except InvalidOperation:
+        return None
+
+
+def icms_rates() -> FrozenSet[Decimal]:
+    """
+    Alíquotas de ICMS aceitas (FISCAL_ICMS_RATES); vazio = sem conferência de ICMS
+    """
+    rates = getattr(settings, 'FISCAL_ICMS_RATES', '')
+    return frozenset(Decimal(rate.strip()) for rate in rates.split(',') if rate.strip())
+
+
+# ----------------------------------------------------------------------
+# Cache em memória
+# ----------------------------------------------------------------------
+
+class FiscalTables:
+    """
+    NCMs válidos e alíquotas de IPI da TIPI em memória
+
+    A versão é o id da carga mais recente de cada tabela (FiscalTableLoad),
+    conferida a cada FISCAL_TABLES_CHECK_INTERVAL segundos: uma nova carga,
+    mesmo feita em outro processo, faz o cache ser remontado.
+    """
+
+    def __init__(self, check_interval: float = None):
+        self.check_interval = (
+            check_interval if check_interval is not None
+            else getattr(settings, 'FISCAL_TABLES_CHECK_INTERVAL', 300)
+        )
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._version = None
+        # (NCMs, {NCM: alíquota ou None para NT})
+        self._state: Tuple[FrozenSet[str], Dict[str, Optional[Decimal]]] = (frozenset(), {})
+
+    @staticmethod
+    def _current_version() -> tuple:
+        return tuple(
+            FiscalTableLoad.objects.filter(table=table).order_by('-loaded_at', '-id')
+            .values_list('id', flat=True).first()
+            for table, _ in FiscalTableLoad.TABLE_CHOICES
+        )
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return
+            version = self._current_version()
+            if version != self._version:
+                ncm_codes = frozenset(NcmCode.objects.values_list('code', flat=True).iterator(chunk_size=5000))
+                tipi = dict(
+                    TipiRate.objects.filter(ex_tipi='').values_list('ncm_code', 'ipi_rate').iterator(chunk_size=5000)
+                )
+                self._state = (ncm_codes, tipi)
+                self._version = version
+                logger.info(f"Tabelas fiscais em memória: {len(ncm_codes)} NCMs, {len(tipi)} alíquotas TIPI")
+            self._checked_at = time.monotonic()
+
+    @property
+    def ncm_codes(self) -> FrozenSet[str]:
+        self._ensure_fresh()
+        return self._state[0]
+
+    @property
+    def tipi(self) -> Dict[str, Optional[Decimal]]:
+        self._ensure_fresh()
+        return self._state[1]
+
+    def invalidate(self):
+        with self._lock:
+            self._checked_at = None
+            self._version = None
+
+
+_tables = None
+_tables_lock = threading.Lock()
+
+
+def get_fiscal_tables() -> FiscalTables:
+    global _tables
+    with _tables_lock:
+        if _tables is None:
+            _tables = FiscalTables()
+        return _tables
+
+
+# ----------------------------------------------------------------------
+# Conferência em lote
+# ----------------------------------------------------------------------
+
+def fiscal_violations(queryset) -> List[Tuple[Q, Any]]:
+    """
+    Confere NCM, IPI e ICMS de um bloco de produtos numa única passada
+
+    Returns:
+        Pares (condição, mensagem) para o motor de regras (validation_rules)
+    """
+    tables = get_fiscal_tables()
+    ncm_codes, tipi = tables.ncm_codes, tables.tipi
+    allowed_icms = icms_rates()
+
+    unknown_ncm = []
+    ipi_mismatch: Dict[Tuple[Decimal, Optional[Decimal]], List[int]] = {}
+    invalid_icms: Dict[Decimal, List[int]] = {}
+
+    for product_id, ncm_code, ipi_percentage, icms_percentage in queryset.values_list(
+        'id', 'ncm_code', 'ipi_percentage', 'icms_percentage'
+    ):
+        ncm = normalize_ncm(ncm_code)
+        if ncm and ncm_codes and ncm not in ncm_codes:
+            unknown_ncm.append(product_id)
+
+        if ncm and ipi_percentage is not None and ncm in tipi:
+            expected = tipi[ncm]
+            # NT (não tributado) equivale a IPI zero
+            if (expected or Decimal(0)) != ipi_percentage:
+                ipi_mismatch.setdefault((ipi_percentage, expected), []).append(product_id)
+
+        if icms_percentage is not None and allowed_icms and icms_percentage not in allowed_icms:
+            invalid_icms.setdefault(icms_percentage, []).append(product_id)
+
+    violations = []
+    if unknown_ncm:
+        violations.append((
+            Q(pk__in=unknown_ncm),
+            Concat(Value('NCM '), F('ncm_code'), Value(' não encontrado na tabela NCM'), output_field=TextField()),
+        ))
+    for (actual, expected), product_ids in ipi_mismatch.items():
+        expected_text = 'NT' if expected is None else f"{_format_rate(expected)}%"
+        violations.append((
+            Q(pk__in=product_ids),
+            f"IPI {_format_rate(actual)}% difere da TIPI ({expected_text})",
+        ))
+    for actual, product_ids in invalid_icms.items():
+        violations.append((
+            Q(pk__in=product_ids),
+            f"ICMS {_format_rate(actual)}% não é uma alíquota válida",
+        ))
+    return violations
+
+
+# ----------------------------------------------------------------------
+# Carga das tabelas
+# ----------------------------------------------------------------------
+
+def _read_rows(file_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Lê um arquivo CSV (delimitador detectado) ou JSON; no JSON aceita uma lista
+    de objetos ou o formato do Siscomex ({"Nomenclaturas": [...]})
+    """
+    if file_path.lower().endswith('.json'):
+        with open(file_path, encoding='utf-8-sig') as json_file:
+            data = json.load(json_file)
+        if isinstance(data, dict):
+            data = data.get('Nomenclaturas') or next((value for value in data.values() if isinstance(value, list)), [])
+        for row in data:
+            yield {str(key).strip().lower(): value for key, value in row.items()}
+        return
+
+    with open(file_path, encoding='utf-8-sig', newline='') as csv_file:
+        sample = csv_file.read(4096)
+        csv_file.seek(0)
+        dialect = csv.Sniffer().sniff(sample, delimiters=';,\t|')
+        for row in csv.DictReader(csv_file, dialect=dialect):
+            yield {str(key).strip().lower(): value for key, value in row.items() if key}
+
+
+def _first(row: Dict[str, Any], keys: Iterable[str], default=None):
+    for key in keys:
+        if key in row and row[key] not in (None, ''):
+            return row[key]
+    return default
+
+
+def _record_load(table: str, file_path: str, records: int):
+    FiscalTableLoad.objects.create(table=table, source=os.path.basename(file_path), records=records)
+    get_fiscal_tables().invalidate()
+
+
+def load_ncm_table(file_path: str) -> int:
+    """
+    Substitui a tabela NCM pelo conteúdo do arquivo (apenas códigos de 8 dígitos)
+    """
+    codes = {}
+    for row in _read_rows(file_path):
+        code = normalize_ncm(_first(row, NCM_CODE_KEYS))
+        if code and len(code) == 8:
+            codes[code] = str(_first(row, NCM_DESCRIPTION_KEYS, '')).strip()
+
+    with transaction.atomic():
+        NcmCode.objects.all().delete()
+        NcmCode.objects.bulk_create(
+            [NcmCode(code=code, description=description) for code, description in codes.items()],
+            batch_size=LOAD_BATCH_SIZE
+        )
+        _record_load('NCM', file_path, len(codes))
+
+    logger.info(f"Tabela NCM carregada de {file_path}: {len(codes)} códigos")
+    return len(codes)
+
+
+def load_tipi_table(file_path: str) -> int:
+    """
+    Substitui a tabela TIPI (alíquotas de IPI por NCM e exceção) pelo conteúdo do arquivo
+    """
+    rates = {}
+    for row in _read_rows(file_path):
+        code = normalize_ncm(_first(row, NCM_CODE_KEYS))
+        if not code or len(code) != 8:
+            continue
+        ex_tipi = ''.join(filter(str.isdigit, str(_first(row, TIPI_EX_KEYS, ''))))
+        rates[(code, ex_tipi)] = _parse_rate(_first(row, TIPI_RATE_KEYS))
+
+    with transaction.atomic():
+        TipiRate.objects.all().delete()
+        TipiRate.objects.bulk_create(
+            [TipiRate(ncm_code=code, ex_tipi=ex_tipi, ipi_rate=rate) for (code, ex_tipi), rate in rates.items()],
+            batch_size=LOAD_BATCH_SIZE
+        )
+        _record_load('TIPI', file_path, len(rates))
+
+    logger.info(f"Tabela TIPI carregada de {file_path}: {len(rates)} alíquotas")
+    return len(rates)
@@ -0,0 +1,63 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+
+class StageTimer:
+    """
+    Mede tempo, linhas/segundo e pico de memória de cada etapa do processamento
+    (leitura, mapeamento, extração, validação, gravação)
+    """
+
+    def __init__(self, track_memory: bool = False):
+        self.track_memory = track_memory
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self._started_tracing = False
+        self._start = None
+        self.total_seconds = None
+        self.peak_memory_kb = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        if self._start is not None:
+            self.total_seconds = time.perf_counter() - self._start
+        if tracemalloc.is_tracing() and self.track_memory:
+            self.peak_memory_kb = max(
+                [s['peak_memory_kb'] for s in self.stages.values() if s.get('peak_memory_kb') is not None],
+                default=tracemalloc.get_traced_memory()[1] // 1024
+            )
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name: str, rows: Optional[int] = None):
+        tracing = self.track_memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            metrics = {'seconds': round(seconds, 4), 'rows': rows}
+            if rows is not None:
+                metrics['rows_per_second'] = round(rows / seconds, 1) if seconds > 0 else None
+            if tracing:
+                metrics['peak_memory_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+            self.stages[name] = metrics
+
+    def rows_per_second(self, rows: int) -> Optional[float]:
+        if not self.total_seconds:
+            return None
+        return round(rows / self.total_seconds, 1)
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        return dict(self.stages)
@@ -0,0 +1,373 @@
+"""
+Upload de vários arquivos (um ZIP ou uma seleção múltipla) num único envio
+
+Os arquivos são extraídos do pacote para o MEDIA_ROOT em fluxo, enviados ao
+pool de parse (ParseExecutor, limitado a PARSE_POOL_SIZE processos) e gravados
+num único lote ou num lote por arquivo, com um relatório combinado por arquivo
+(FileUpload.file_report do pacote). ZIPs de NF-e enviados pelo upload simples
+passam pelo mesmo caminho, só com os XMLs.
+"""
+import logging
+import os
+import shutil
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+
+from Main.models import FileUpload, ImportProfile
+from .parse_executor import ParseTimeLimitExceeded, get_parse_executor, profile_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Extensão -> tipo de arquivo do parse
+ARCHIVE_FILE_TYPES = {
+    'xlsx': 'EXCEL',
+    'xls': 'EXCEL',
+    'xml': 'XML',
+    'csv': 'CSV',
+    'txt': 'CSV',
+}
+
+BATCH_MODE_CHOICES = [
+    ('SINGLE', 'Um lote com todos os arquivos'),
+    ('PER_FILE', 'Um lote por arquivo'),
+]
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class ArchiveMember(NamedTuple):
+    name: str
+    file_type: str
+    stored_name: str
+    path: str
+    size: int
+
+
+def member_file_type(name: str) -> Optional[str]:
+    return ARCHIVE_FILE_TYPES.get(name.rsplit('.', 1)[-1].lower()) if '.' in name else None
+
+
+def _is_ignored(name: str) -> bool:
+    # Metadados do macOS e arquivos ocultos
+    base_name = os.path.basename(name)
+    return name.startswith('__MACOSX/') or base_name.startswith('.') or not base_name
+
+
+def extraction_dir(container: FileUpload) -> str:
+    """
+    Pasta (nome no storage) dos arquivos extraídos do pacote
+    """
+    return os.path.join('uploads', 'extracted', str(container.pk))
+
+
+def extract_archive(archive_path: str, destination: str,
+                    file_types: Iterable[str] = None) -> Tuple[List[ArchiveMember], Dict[str, str]]:
+    """
+    Extrai os arquivos suportados do ZIP em fluxo (sem carregar o membro na memória)
+
+    O tamanho declarado de cada membro (que também limita o que o zipfile
+    descompacta) conta para UPLOAD_MAX_SIZE por arquivo e para
+    MULTI_UPLOAD_MAX_TOTAL_SIZE no pacote.
+
+    Args:
+        file_types: tipos aceitos (ex: {'XML'} para um ZIP de NF-e); padrão, todos
+
+    Returns:
+        (arquivos extraídos, {arquivo ignorado: motivo})
+    """
+    max_files = getattr(settings, 'MULTI_UPLOAD_MAX_FILES', 200)
+    max_size = getattr(settings, 'UPLOAD_MAX_SIZE', 100 * 1024 * 1024)
+    max_total_size = getattr(settings, 'MULTI_UPLOAD_MAX_TOTAL_SIZE', 1024 * 1024 * 1024)
+    file_types = set(file_types or ARCHIVE_FILE_TYPES.values())
+
+    members = []
+    skipped = {}
+    total_size = 0
+    with zipfile.ZipFile(archive_path) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or _is_ignored(info.filename):
+                continue
+
+            file_type = member_file_type(info.filename)
+            if file_type not in file_types:
+                skipped[info.filename] = "Tipo de arquivo não suportado"
+                continue
+            if info.file_size > max_size:
+                skipped[info.filename] = f"Arquivo acima de {max_size // (1024 * 1024)}MB"
+                continue
+            if len(members) >= max_files:
+                skipped[info.filename] = f"Limite de {max_files} arquivos por pacote"
+                continue
+            if total_size + info.file_size > max_total_size:
+                skipped[info.filename] = f"Limite de {max_total_size // (1024 * 1024)}MB extraídos por pacote"
+                continue
+            total_size += info.file_size
+
+            stored_name = default_storage.get_available_name(
+                os.path.join(destination, os.path.basename(info.filename))
+            )
+            path = default_storage.path(stored_name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with archive.open(info) as source, open(path, 'wb') as target:
+                shutil.copyfileobj(source, target, COPY_BUFFER_SIZE)
+
+            members.append(ArchiveMember(info.filename, file_type, stored_name, path, info.file_size))
+
+    logger.info(f"{len(members)} arquivos extraídos de {archive_path} ({len(skipped)} ignorados)")
+    return members, skipped
+
+
+def iter_parsed_members(members: List[ArchiveMember], fornecedor_code: str = None,
+                        track_memory: bool = False, executor=None) -> Iterator[Tuple[ArchiveMember, Any]]:
+    """
+    Faz o parse dos arquivos no pool e devolve cada resultado assim que fica
+    pronto (em ordem de conclusão)
+
+    No máximo 2 x PARSE_POOL_SIZE arquivos ficam em andamento: resultados prontos
+    não se acumulam na memória enquanto o chamador grava os anteriores.
+
+    Yields:
+        (arquivo, resultado do run_parse_job ou a exceção do arquivo)
+    """
+    executor = executor or get_parse_executor()
+
+    profiles = {}
+    if fornecedor_code:
+        for profile in ImportProfile.objects.filter(fornecedor_code=fornecedor_code):
+            profiles[profile.file_type] = profile_snapshot(profile)
+
+    queue = iter(members)
+    in_flight = {}
+
+    def submit_next():
+        member = next(queue, None)
+        if member is not None:
+            future = executor.submit(
+                member.file_type, member.path,
+                profile=profiles.get(member.file_type),
+                track_memory=track_memory,
+            )
+            in_flight[future] = member
+
+    for _ in range(max(1, executor.max_workers * 2)):
+        submit_next()
+
+    while in_flight:
+        done, _ = wait(in_flight, timeout=executor.timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            # Nenhum arquivo terminou dentro do PARSE_TIMEOUT: desiste dos que estão em andamento
+            logger.error(f"Parse sem resultado após {executor.timeout}s")
+            for future, member in list(in_flight.items()):
+                future.cancel()
+                del in_flight[future]
+                submit_next()
+                yield member, ParseTimeLimitExceeded(
+                    f"Tempo limite de {executor.timeout}s excedido ao processar o arquivo"
+                )
+            continue
+
+        while done:
+            future = done.pop()
+            member = in_flight.pop(future)
+            try:
+                result = executor.result(future)
+            except Exception as e:
+                logger.error(f"Erro ao processar {member.name}: {str(e)}")
+                result = e
+            # O próximo arquivo entra no pool antes de o chamador gravar este
+            submit_next()
+            yield member, result
+            # Sem referências ao resultado já entregue enquanto espera os próximos
+            future = result = None
+
+
+def parse_members(members: List[ArchiveMember], fornecedor_code: str = None,
+                  track_memory: bool = False, executor=None) -> Dict[str, Any]:
+    """
+    Resultados de todos os arquivos (pacote gravado num único lote)
+
+    Returns:
+        {nome do arquivo: resultado do run_parse_job ou a exceção do arquivo}
+    """
+    return {
+        member.name: result
+        for member, result in iter_parsed_members(members, fornecedor_code, track_memory, executor)
+    }
+
+
+def build_archive(uploaded_files: List[UploadedFile]) -> str:
+    """
+    Reúne os arquivos de uma seleção múltipla num ZIP (sem compressão) no
+    storage e remove os originais já gravados pelo StreamingUploadHandler
+
+    Returns:
+        Nome do ZIP no storage
+    """
+    file_field = FileUpload._meta.get_field('file')
+    stored_name = default_storage.get_available_name(file_field.generate_filename(None, 'arquivos.zip'))
+    path = default_storage.path(stored_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    used_names = set()
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for uploaded_file in uploaded_files:
+            name = os.path.basename(uploaded_file.name)
+            base_name, extension = os.path.splitext(name)
+            suffix = 1
+            while name in used_names:
+                suffix += 1
+                name = f"{base_name}_{suffix}{extension}"
+            used_names.add(name)
+
+            uploaded_file.seek(0)
+            with archive.open(name, 'w', force_zip64=True) as target:
+                shutil.copyfileobj(uploaded_file, target, COPY_BUFFER_SIZE)
+
+            if hasattr(uploaded_file, 'discard'):
+                uploaded_file.discard()
+
+    return stored_name
+
+
+def process_multi_upload(uploaded_files: List[UploadedFile], user=None, fornecedor_code: str = None,
+                         batch_mode: str = 'SINGLE', import_mode: str = 'FULL') -> Dict[str, Any]:
+    """
+    Processa um ZIP ou vários arquivos enviados juntos
+
+    Returns:
+        {'success', 'message', 'upload_id', 'total', 'saved', 'batch_codes', 'report'}
+    """
+    from .file_processor import FileProcessor
+
+    if len(uploaded_files) == 1 and uploaded_files[0].name.lower().endswith('.zip'):
+        uploaded_file = uploaded_files[0]
+        file = getattr(uploaded_file, 'stored_name', None) or uploaded_file
+        file_size = uploaded_file.size
+        sha256 = getattr(uploaded_file, 'sha256', None)
+    else:
+        file = build_archive(uploaded_files)
+        file_size = default_storage.size(file)
+        sha256 = None
+
+    container = FileUpload.objects.create(
+        file=file,
+        file_size=file_size,
+        sha256=sha256,
+        file_type='ZIP',
+        uploaded_by=user,
+        status='PENDING',
+        fornecedor_code=fornecedor_code or None,
+        import_mode=import_mode,
+    )
+
+    if batch_mode == 'SINGLE':
+        result = FileProcessor(container).process()
+        container.refresh_from_db()
+        return {
+            'success': result['success'],
+            'message': result['message'],
+            'upload_id': container.pk,
+            'total': result['total'],
+            'saved': result['saved'],
+            'batch_codes': [result['batch_code']] if result.get('batch_code') else [],
+            'report': container.file_report or [],
+        }
+
+    return _process_per_file(container)
+
+
+def _process_per_file(container: FileUpload) -> Dict[str, Any]:
+    """
+    Um FileUpload e um lote por arquivo do pacote (membros do container)
+    """
+    from .file_processor import FileProcessor
+
+    container.status = 'PROCESSING'
+    container.save(update_fields=['status'])
+
+    report = []
+    batch_codes = []
+    total = saved = 0
+    try:
+        members, skipped = extract_archive(container.file.path, extraction_dir(container))
+        report.extend({'file': name, 'status': 'SKIPPED', 'error': reason} for name, reason in skipped.items())
+        if not members:
+            raise ValueError("Nenhum arquivo suportado encontrado no pacote")
+
+        # Cada arquivo é gravado assim que o seu parse termina e o resultado é descartado
+        parsed = iter_parsed_members(members, container.fornecedor_code,
+                                     track_memory=getattr(settings, 'UPLOAD_TRACK_MEMORY', False))
+        for member, parse_result in parsed:
+            profile = None
+            if container.fornecedor_code:
+                profile = ImportProfile.objects.filter(
+                    fornecedor_code=container.fornecedor_code, file_type=member.file_type
+                ).first()
+            file_upload = FileUpload.objects.create(
+                file=member.stored_name,
+                file_size=member.size,
+                file_type=member.file_type,
+                uploaded_by=container.uploaded_by,
+                status='PENDING',
+                fornecedor_code=container.fornecedor_code,
+                import_mode=container.import_mode,
+                import_profile=profile,
+                parent=container,
+            )
+
+            if isinstance(parse_result, Exception):
+                file_upload.status = 'FAILED'
+                file_upload.error_message = str(parse_result)
+                file_upload.save(update_fields=['status', 'error_message'])
+                report.append({'file': member.name, 'status': 'FAILED', 'error': str(parse_result)})
+                continue
+
+            result = FileProcessor(file_upload).process(parse_result=parse_result)
+            del parse_result
+            total += result['total']
+            saved += result['saved']
+            if result.get('batch_code'):
+                batch_codes.append(result['batch_code'])
+            report.append({
+                'file': member.name,
+                'status': 'COMPLETED' if result['success'] else 'FAILED',
+                'total': result['total'],
+                'saved': result['saved'],
+                'batch_code': result.get('batch_code'),
+                'error': '; '.join(result['errors'][:5]) or None,
+            })
+
+            container.processed_records = saved
+            container.save(update_fields=['processed_records'])
+
+        # Importações delta sem alterações terminam sem lote, mas não falham
+        completed = any(entry['status'] == 'COMPLETED' for entry in report)
+        container.status = 'COMPLETED' if completed else 'FAILED'
+        if not completed:
+            container.error_message = "Nenhum arquivo do pacote foi importado"
+
+    except Exception as e:
+        logger.error(f"Erro ao processar pacote {container.pk}: {str(e)}")
+        container.status = 'FAILED'
+        container.error_message = str(e)
+
+    container.total_records = total
+    container.processed_records = saved
+    container.file_report = report
+    container.save()
+
+    success = container.status == 'COMPLETED'
+    return {
+        'success': success,
+        'message': "Processamento concluído com sucesso" if success else f"Erro ao processar pacote: {container.error_message}",
+        'upload_id': container.pk,
+        'total': total,
+        'saved': saved,
+        'batch_codes': batch_codes,
+        'report': report,
+    }
@@ -0,0 +1,302 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ParseTimeLimitExceeded(Exception):
+    pass
+
+
+# ----------------------------------------------------------------------
+# Registros compactos: (campos, [tuplas]) por bloco em vez de uma lista de dicts
+# ----------------------------------------------------------------------
+
+def pack_records(products: List[Dict[str, Any]], chunk_size: int) -> List[Tuple[tuple, list]]:
+    chunks = []
+    for start in range(0, len(products), chunk_size):
+        block = products[start:start + chunk_size]
+        fields = tuple(block[0])
+        if all(tuple(product) == fields for product in block):
+            chunks.append((fields, [tuple(product.values()) for product in block]))
+        else:
+            # Registros com campos diferentes seguem como dicts
+            chunks.append((None, block))
+    return chunks
+
+
+def iter_records(chunks: Iterable[Tuple[tuple, list]]) -> Iterator[Dict[str, Any]]:
+    for fields, rows in chunks:
+        if fields is None:
+            yield from rows
+        else:
+            for row in rows:
+                yield dict(zip(fields, row))
+
+
+def iter_record_chunks(chunks: Iterable[Tuple[tuple, list]]) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Os registros bloco a bloco: só os dicts do bloco atual ficam na memória
+    """
+    for fields, rows in chunks:
+        if fields is None:
+            yield rows
+        else:
+            yield [dict(zip(fields, row)) for row in rows]
+
+
+def count_records(chunks: Iterable[Tuple[tuple, list]]) -> int:
+    return sum(len(rows) for _, rows in chunks)
+
+
+def set_field(chunks: List[Tuple[tuple, list]], name: str, value) -> List[Tuple[tuple, list]]:
+    """
+    Blocos com `name` = `value` em todos os registros, sem montar os dicts
+    """
+    result = []
+    for fields, rows in chunks:
+        if fields is None:
+            for row in rows:
+                row[name] = value
+            result.append((fields, rows))
+        elif name in fields:
+            index = fields.index(name)
+            result.append((fields, [row[:index] + (value,) + row[index + 1:] for row in rows]))
+        else:
+            result.append((fields + (name,), [row + (value,) for row in rows]))
+    return result
+
+
+# ----------------------------------------------------------------------
+# Execução no processo do pool
+# ----------------------------------------------------------------------
+
+def profile_snapshot(profile):
+    """
+    Cópia simples (picklável, sem ORM) dos campos do perfil usados no parse
+    """
+    if profile is None:
+        return None
+    return SimpleNamespace(
+        fornecedor_code=profile.fornecedor_code,
+        sheet_name=profile.sheet_name,
+        header_row=profile.header_row,
+        column_mapping=dict(profile.column_mapping or {}),
+        dtypes=dict(profile.dtypes or {}),
+        normalization_rule=profile.normalization_rule,
+    )
+
+
+def _raise_time_limit(signum, frame):
+    raise ParseTimeLimitExceeded("Tempo de CPU excedido ao processar o arquivo")
+
+
+def _apply_cpu_limit(seconds: int):
+    """
+    Limita o tempo de CPU deste processo a `seconds` a partir de agora.
+    Retorna o limite anterior para ser restaurado ao fim do job.
+    """
+    try:
+        import resource
+        import signal
+    except ImportError:
+        return None
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    new_soft = int(usage.ru_utime + usage.ru_stime) + seconds
+    if hard != resource.RLIM_INFINITY:
+        new_soft = min(new_soft, hard)
+
+    signal.signal(signal.SIGXCPU, _raise_time_limit)
+    resource.setrlimit(resource.RLIMIT_CPU, (new_soft, hard))
+    return soft, hard
+
+
+def _restore_cpu_limit(previous):
+    import resource
+    resource.setrlimit(resource.RLIMIT_CPU, previous)
+
+
+def run_parse_job(kind: str, file_path: str, sheet_name: str = None, profile=None,
+                  cpu_time_limit: int = None, chunk_size: int = 5000,
+                  track_memory: bool = False) -> Dict[str, Any]:
+    """
+    Executa o parse de um arquivo (ou de uma planilha) e devolve os produtos
+    em blocos compactos, junto com métricas e o layout detectado
+    """
+    from .csv_parser import CSVParser
+    from .excel_parser import ExcelParser
+    from .xml_parser import XMLParser
+    from .metrics import StageTimer
+
+    previous_limit = _apply_cpu_limit(cpu_time_limit) if cpu_time_limit else None
+
+    try:
+        timer = StageTimer(track_memory=track_memory)
+        timer.start()
+        if kind == 'EXCEL':
+            parser = ExcelParser(file_path, sheet_name=sheet_name, timer=timer, profile=profile)
+        elif kind == 'XML':
+            parser = XMLParser(file_path, timer=timer, profile=profile)
+        elif kind == 'CSV':
+            parser = CSVParser(file_path, timer=timer, profile=profile, chunk_size=chunk_size)
+        else:
+            raise ValueError(f"Tipo de arquivo não suportado: {kind}")
+
+        if kind == 'CSV':
+            # Lido em blocos: cada bloco é compactado assim que extraído, sem a lista inteira de dicts
+            chunks = []
+            count = 0
+            for products in parser.iter_chunks():
+                chunks.extend(pack_records(products, chunk_size))
+                count += len(products)
+            logger.info(f"Total de {count} produtos extraídos do arquivo texto")
+        else:
+            products = parser.parse()
+            if sheet_name:
+                for product in products:
+                    product['source_sheet'] = sheet_name
+            chunks = pack_records(products, chunk_size)
+            count = len(products)
+        timer.stop()
+
+        return {
+            'count': count,
+            'chunks': chunks,
+            'column_mapping': parser.get_mapping_log() if kind in ('EXCEL', 'CSV') else None,
+            'layout': parser.get_layout(),
+            'file_errors': getattr(parser, 'file_errors', {}),
+            'stage_metrics': timer.as_dict(),
+            'peak_memory_kb': timer.peak_memory_kb,
+        }
+    finally:
+        if previous_limit is not None:
+            _restore_cpu_limit(previous_limit)
+
+
+def _init_worker():
+    # Processos criados por spawn/forkserver precisam carregar o Django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portalweb.settings')
+    import django
+    django.setup()
+
+
+# ----------------------------------------------------------------------
+# Executor
+# ----------------------------------------------------------------------
+
+class _InlineExecutor:
+    """
+    Executa no próprio processo (desenvolvimento/testes)
+    """
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class ParseExecutor:
+    """
+    Envia o parse dos arquivos para um pool de processos limitado, fora do
+    processo do gunicorn que atende a requisição
+
+    Configuração (settings):
+        PARSE_EXECUTOR_BACKEND: 'process' (padrão) ou 'inline'
+        PARSE_POOL_SIZE: número máximo de processos do pool
+        PARSE_CPU_TIME_LIMIT: limite de CPU (segundos) por arquivo/planilha
+        PARSE_CHUNK_SIZE: registros por bloco devolvido pelo pool
+        PARSE_POOL_START_METHOD: 'forkserver' (padrão), 'spawn' ou 'fork'
+        PARSE_TIMEOUT: espera máxima (segundos) pelo resultado de um arquivo
+    """
+
+    def __init__(self, backend: str = None, max_workers: int = None,
+                 cpu_time_limit: int = None, chunk_size: int = None, timeout: int = None):
+        self.backend = backend or getattr(settings, 'PARSE_EXECUTOR_BACKEND', 'process')
+        self.max_workers = max_workers or getattr(settings, 'PARSE_POOL_SIZE', 2)
+        self.cpu_time_limit = cpu_time_limit or getattr(settings, 'PARSE_CPU_TIME_LIMIT', None)
+        self.chunk_size = chunk_size or getattr(settings, 'PARSE_CHUNK_SIZE', 5000)
+        self.timeout = timeout or getattr(settings, 'PARSE_TIMEOUT', 600)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                if self.backend == 'inline':
+                    self._pool = _InlineExecutor()
+                else:
+                    start_method = getattr(settings, 'PARSE_POOL_START_METHOD', 'forkserver')
+                    if start_method not in multiprocessing.get_all_start_methods():
+                        # forkserver não existe no Windows
+                        start_method = 'spawn'
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context(start_method),
+                        initializer=_init_worker if start_method in ('spawn', 'forkserver') else None,
+                    )
+            return self._pool
+
+    def _reset_pool(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+
+    def submit(self, kind: str, file_path: str, sheet_name: str = None, profile=None,
+               track_memory: bool = False) -> Future:
+        return self._get_pool().submit(
+            run_parse_job, kind, file_path,
+            sheet_name=sheet_name,
+            profile=profile,
+            cpu_time_limit=self.cpu_time_limit if self.backend != 'inline' else None,
+            chunk_size=self.chunk_size,
+            track_memory=track_memory,
+        )
+
+    def result(self, future: Future) -> Dict[str, Any]:
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Ainda na fila: sai dela; já em execução: o limite de CPU encerra o job
+            future.cancel()
+            logger.error(f"Parse sem resultado após {self.timeout}s")
+            raise ParseTimeLimitExceeded(f"Tempo limite de {self.timeout}s excedido ao processar o arquivo")
+        except BrokenProcessPool:
+            # Um processo morreu (ex: limite rígido de CPU); o pool precisa ser recriado
+            logger.error("Pool de parse quebrado; recriando")
+            self._reset_pool()
+            raise ParseTimeLimitExceeded("O processamento do arquivo foi interrompido")
+
+    def parse(self, kind: str, file_path: str, **kwargs) -> Dict[str, Any]:
+        return self.result(self.submit(kind, file_path, **kwargs))
+
+    def shutdown(self):
+        self._reset_pool()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_parse_executor() -> ParseExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ParseExecutor()
+        return _executor
@@ -0,0 +1,173 @@
+"""
+Cache colunar (Arrow IPC / Feather v2) da saída normalizada do parse de cada upload
+
+O arquivo fica ao lado do upload ("<arquivo>.parsed.arrow") e é lido com
+memory-map, permitindo reprocessar, renormalizar ou montar novos lotes sem
+reler a planilha/XML original. Sem o pyarrow instalado o cache fica desativado.
+
+O pyarrow só é importado no primeiro uso (ao processar um upload).
+"""
+import json
+import logging
+import os
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+CACHE_SUFFIX = '.parsed.arrow'
+
+# Código lido do arquivo antes da regra de normalização do perfil
+SOURCE_CODE_FIELD = 'source_code'
+
+# Chave do raw_data dos itens de NF-e com o CNPJ/CPF do emitente
+NFE_SUPPLIER_DOCUMENT = 'emit_CNPJ'
+
+
+@lru_cache(maxsize=None)
+def _pyarrow():
+    """
+    Módulo pyarrow (com pyarrow.feather carregado), ou None se não estiver instalado
+    """
+    try:
+        import pyarrow
+        import pyarrow.feather  # noqa: F401
+    except ImportError:  # pragma: no cover - dependência opcional
+        return None
+    return pyarrow
+
+
+def cache_available() -> bool:
+    return getattr(settings, 'PARSED_CACHE_ENABLED', True) and _pyarrow() is not None
+
+
+def cache_name_for(file_name: str) -> str:
+    """
+    Nome (no storage) do cache correspondente a um arquivo enviado
+    """
+    return f"{file_name}{CACHE_SUFFIX}"
+
+
+def _decimal_fields() -> frozenset:
+    from Main.models import Product
+    return frozenset(
+        field.name for field in Product._meta.concrete_fields
+        if field.get_internal_type() == 'DecimalField'
+    )
+
+
+def _encode(products: List[Dict[str, Any]]):
+    columns: Dict[str, list] = {}
+    for product in products:
+        for key in product:
+            columns.setdefault(key, [])
+
+    for product in products:
+        for key, values in columns.items():
+            value = product.get(key)
+            if key == 'raw_data':
+                value = json.dumps(value, ensure_ascii=False, default=str) if value is not None else None
+            elif isinstance(value, Decimal):
+                # Texto preserva a escala exata do Decimal
+                value = str(value)
+            values.append(value)
+
+    pa = _pyarrow()
+    return pa.table({key: pa.array(values) for key, values in columns.items()})
+
+
+class ParsedCacheWriter:
+    """
+    Monta o cache bloco a bloco durante a gravação dos produtos: cada bloco
+    vira uma tabela Arrow (colunar, bem menor que os dicts do bloco) e o
+    arquivo é escrito no close()
+    """
+
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        self.enabled = cache_available()
+        self.tables = []
+        self.rows = 0
+
+    def add(self, products: List[Dict[str, Any]]):
+        if not self.enabled or not products:
+            return
+        try:
+            self.tables.append(_encode(products))
+            self.rows += len(products)
+        except Exception as e:
+            logger.warning(f"Não foi possível montar o cache do parse de {self.file_name}: {str(e)}")
+            self.enabled = False
+            self.tables = []
+
+    def close(self) -> Optional[str]:
+        """
+        Returns:
+            Nome do cache no storage, ou None se o cache estiver indisponível
+        """
+        if not self.enabled or not self.tables:
+            return None
+
+        cache_name = cache_name_for(self.file_name)
+        path = default_storage.path(cache_name)
+        tmp_path = f"{path}.tmp"
+        try:
+            # Blocos com colunas ausentes ou só nulas são unificados
+            table = _pyarrow().concat_tables(self.tables, promote_options='permissive')
+            self.tables = []
+            # Sem compressão: o arquivo pode ser mapeado em memória na leitura
+            _pyarrow().feather.write_feather(table, tmp_path, compression='uncompressed')
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Não foi possível gravar o cache do parse {cache_name}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+
+        logger.info(f"Cache do parse gravado: {cache_name} ({self.rows} produtos)")
+        return cache_name
+
+
+def write_parsed_cache(file_name: str, products: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Grava os produtos do parse em formato colunar ao lado do upload
+
+    Returns:
+        Nome do cache no storage, ou None se o cache estiver indisponível
+    """
+    writer = ParsedCacheWriter(file_name)
+    writer.add(products)
+    return writer.close()
+
+
+def read_parsed_cache(cache_name: str) -> List[Dict[str, Any]]:
+    """
+    Lê o cache (memory-map) e devolve os produtos no mesmo formato do parser
+    """
+    pa = _pyarrow()
+    if pa is None:
+        raise RuntimeError("pyarrow não está instalado")
+
+    with pa.memory_map(default_storage.path(cache_name), 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+
+    decimal_fields = _decimal_fields()
+    products = table.to_pylist()
+    for product in products:
+        for key, value in product.items():
+            if value is None:
+                continue
+            if key == 'raw_data':
+                product[key] = json.loads(value)
+            elif key in decimal_fields:
+                product[key] = Decimal(value)
+    return products
+
+
+def delete_parsed_cache(cache_name: str):
+    if cache_name and default_storage.exists(cache_name):
+        default_storage.delete(cache_name)
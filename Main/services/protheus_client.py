@@ -0,0 +1,260 @@
+"""
+Cliente da API REST PRODCHECK do Protheus (API/valida_produtos.prw)
+
+Uma única requests.Session com pool de conexões é reaproveitada por todo o
+processo; a consulta de produtos usa o endpoint em lote seekProdutos, dividido
+em requisições de no máximo PROTHEUS_SEEK_CHUNK_SIZE códigos.
+
+As views assíncronas usam o AsyncProtheusClient (httpx) via async_protheus_client():
+sob uvicorn, um cliente por event loop (um pool de conexões por worker); sob
+gunicorn WSGI, um cliente por requisição, fechado ao final.
+"""
+import asyncio
+import logging
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, List, NamedTuple
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+
+logger = logging.getLogger(__name__)
+
+
+class SeekResult(NamedTuple):
+    found: bool
+    description: str
+
+
+def _unique_codes(codes: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(str(code).strip() for code in codes if code))
+
+
+def _chunked(codes: List[str], chunk_size: int) -> List[List[str]]:
+    return [codes[start:start + chunk_size] for start in range(0, len(codes), chunk_size)]
+
+
+def _seek_results(payload: Dict[str, Any]) -> Dict[str, SeekResult]:
+    results = {}
+    for item in payload.get('results', []):
+        code = str(item.get('code') or '').strip()
+        results[code] = SeekResult(bool(item.get('found')), str(item.get('desc') or '').strip())
+    return results
+
+
+def _complete_results(unique_codes: List[str], results: Dict[str, SeekResult], request_count: int) -> Dict[str, SeekResult]:
+    missing = SeekResult(False, '')
+    logger.info(
+        f"seekProdutos: {len(unique_codes)} códigos em {request_count} requisições, "
+        f"{sum(1 for code in unique_codes if results.get(code, missing).found)} encontrados"
+    )
+    return {code: results.get(code, missing) for code in unique_codes}
+
+
+class ProtheusClient:
+    """
+    Cliente HTTP do Protheus
+
+    Args:
+        base_url: URL do servidor REST (padrão: settings.PROTHEUS_API_URL)
+        chunk_size: máximo de códigos por chamada do seekProdutos
+        concurrency: chamadas do seekProdutos em paralelo (limitado ao pool)
+        timeout: timeout de cada requisição, em segundos
+    """
+
+    def __init__(self, base_url: str = None, chunk_size: int = None, concurrency: int = None,
+                 timeout: int = None):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.base_url = (base_url or getattr(settings, 'PROTHEUS_API_URL', 'http://localhost:8080')).rstrip('/')
+        self.seek_path = getattr(settings, 'PROTHEUS_SEEK_PATH', '/rest/PRODCHECK/api/seekProdutos')
+        self.chunk_size = chunk_size or getattr(settings, 'PROTHEUS_SEEK_CHUNK_SIZE', 500)
+        self.concurrency = max(1, concurrency or getattr(settings, 'PROTHEUS_SEEK_CONCURRENCY', 2))
+        self.timeout = timeout or getattr(settings, 'PROTHEUS_TIMEOUT', 30)
+
+        # seekProdutos é uma consulta: pode ser repetida em falhas de conexão ou 502/503/504
+        retry = Retry(
+            total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({'GET', 'POST'}), raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Content-Type': 'application/json'})
+
+    def _seek_chunk(self, codes: List[str]) -> Dict[str, SeekResult]:
+        response = self.session.post(
+            f"{self.base_url}{self.seek_path}", json={'codes': codes}, timeout=self.timeout
+        )
+        response.raise_for_status()
+        return _seek_results(response.json())
+
+    def seek_products(self, codes: Iterable[str]) -> Dict[str, SeekResult]:
+        """
+        Consulta a existência dos códigos no SB1
+
+        Returns:
+            {código: SeekResult}; códigos ausentes da resposta são tratados como
+            não encontrados
+        """
+        unique_codes = _unique_codes(codes)
+        chunks = _chunked(unique_codes, self.chunk_size)
+
+        results: Dict[str, SeekResult] = {}
+        if len(chunks) > 1 and self.concurrency > 1:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(chunks))) as executor:
+                for chunk_results in executor.map(self._seek_chunk, chunks):
+                    results.update(chunk_results)
+        else:
+            for chunk in chunks:
+                results.update(self._seek_chunk(chunk))
+
+        return _complete_results(unique_codes, results, len(chunks))
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_protheus_client() -> ProtheusClient:
+    """
+    Cliente compartilhado pelo processo (recriado se PROTHEUS_API_URL mudar)
+    """
+    global _client
+    base_url = getattr(settings, 'PROTHEUS_API_URL', 'http://localhost:8080').rstrip('/')
+    with _client_lock:
+        if _client is None or _client.base_url != base_url:
+            if _client is not None:
+                _client.close()
+            _client = ProtheusClient(base_url=base_url)
+        return _client
+
+
+class AsyncProtheusClient:
+    """
+    Cliente HTTP assíncrono do Protheus, para as views async
+
+    Mesmos argumentos do ProtheusClient. O httpx.AsyncClient fica preso ao event
+    loop em que foi criado: obtenha-o com get_async_protheus_client() dentro do loop.
+    """
+
+    ORDER_PATH = '/rest/PRODCHECK/createPedidoCompra'
+
+    RETRIES = 2
+    RETRY_STATUSES = (502, 503, 504)
+    BACKOFF_FACTOR = 0.5
+
+    def __init__(self, base_url: str = None, chunk_size: int = None, concurrency: int = None,
+                 timeout: int = None):
+        import httpx
+
+        self.base_url = (base_url or getattr(settings, 'PROTHEUS_API_URL', 'http://localhost:8080')).rstrip('/')
+        self.seek_path = getattr(settings, 'PROTHEUS_SEEK_PATH', '/rest/PRODCHECK/api/seekProdutos')
+        self.chunk_size = chunk_size or getattr(settings, 'PROTHEUS_SEEK_CHUNK_SIZE', 500)
+        self.concurrency = max(1, concurrency or getattr(settings, 'PROTHEUS_SEEK_CONCURRENCY', 2))
+        self.timeout = timeout or getattr(settings, 'PROTHEUS_TIMEOUT', 30)
+
+        # O pool é compartilhado por todas as requisições em andamento no worker;
+        # o transporte só repete falhas de conexão (a requisição não chegou a sair)
+        max_connections = getattr(settings, 'PROTHEUS_MAX_CONNECTIONS', 20)
+        transport = httpx.AsyncHTTPTransport(
+            retries=self.RETRIES,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            transport=transport,
+            headers={'Content-Type': 'application/json'},
+        )
+
+    async def _post_idempotent(self, path: str, payload: Dict[str, Any]):
+        # seekProdutos é uma consulta: repetida em 502/503/504, como no ProtheusClient
+        for attempt in range(self.RETRIES + 1):
+            response = await self.client.post(path, json=payload)
+            if response.status_code not in self.RETRY_STATUSES or attempt == self.RETRIES:
+                return response
+            await asyncio.sleep(self.BACKOFF_FACTOR * 2 ** attempt)
+
+    async def _seek_chunk(self, codes: List[str], semaphore: asyncio.Semaphore) -> Dict[str, SeekResult]:
+        async with semaphore:
+            response = await self._post_idempotent(self.seek_path, {'codes': codes})
+        response.raise_for_status()
+        return _seek_results(response.json())
+
+    async def seek_products(self, codes: Iterable[str]) -> Dict[str, SeekResult]:
+        """
+        Consulta a existência dos códigos no SB1 (ver ProtheusClient.seek_products)
+        """
+        unique_codes = _unique_codes(codes)
+        chunks = _chunked(unique_codes, self.chunk_size)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results: Dict[str, SeekResult] = {}
+        for chunk_results in await asyncio.gather(*(self._seek_chunk(chunk, semaphore) for chunk in chunks)):
+            results.update(chunk_results)
+
+        return _complete_results(unique_codes, results, len(chunks))
+
+    async def create_purchase_order(self, payload: Dict[str, Any], filial: str):
+        """
+        Cria um Pedido de Compra (MATA120) na filial informada (header TENANTID)
+
+        Não é repetido em erro HTTP ou timeout: o pedido pode ter sido gravado
+        mesmo sem resposta.
+
+        Returns:
+            httpx.Response
+        """
+        return await self.client.post(self.ORDER_PATH, json=payload, headers={'tenantid': filial})
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+# Um cliente por event loop (o loop é a chave; some junto com ele)
+_async_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncProtheusClient]' = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_protheus_client() -> AsyncProtheusClient:
+    """
+    Cliente assíncrono do event loop corrente (recriado se PROTHEUS_API_URL mudar)
+    """
+    loop = asyncio.get_running_loop()
+    base_url = getattr(settings, 'PROTHEUS_API_URL', 'http://localhost:8080').rstrip('/')
+    client = _async_clients.get(loop)
+    if client is None or client.base_url != base_url:
+        if client is not None:
+            loop.create_task(client.aclose())
+        client = _async_clients[loop] = AsyncProtheusClient(base_url=base_url)
+    return client
+
+
+@asynccontextmanager
+async def async_protheus_client(request) -> AsyncIterator[AsyncProtheusClient]:
+    """
+    Cliente assíncrono para uma view async
+
+    Sob ASGI o loop é o do worker e o cliente dele é reaproveitado. Sob WSGI o
+    Django executa a view async num event loop criado só para a requisição: o
+    cliente (e o seu pool de conexões) é da requisição e fechado ao final.
+    """
+    if isinstance(request, ASGIRequest):
+        yield get_async_protheus_client()
+        return
+
+    client = AsyncProtheusClient()
+    try:
+        yield client
+    finally:
+        await client.aclose()
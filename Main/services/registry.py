@@ -0,0 +1,362 @@
+"""
+Espelho local dos cadastros do Protheus (SB1 produtos, SA2 fornecedores)
+
+As origens (REST, ODBC ou stub) devolvem linhas no formato das colunas do
+Protheus; `sync_registry` importa apenas o que mudou desde a marca d'água da
+última sincronização (RegistrySyncState).
+"""
+import json
+import logging
+import zoneinfo
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterator, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from Main.models import ProtheusProduct, ProtheusSupplier, RegistrySyncState, ValidationResult
+from .registry_index import get_registry_index
+
+logger = logging.getLogger(__name__)
+
+SYNC_CHUNK_SIZE = 1000
+
+# Coluna do Protheus -> campo do espelho
+REGISTRIES = {
+    'products': {
+        'table': 'SB1',
+        'model': ProtheusProduct,
+        'key': ('code',),
+        'columns': {
+            'B1_COD': 'code',
+            'B1_DESC': 'description',
+            'B1_GRUPO': 'product_group',
+            'B1_POSIPI': 'ncm_code',
+            'B1_IPI': 'ipi_percentage',
+            'B1_MSBLQL': 'blocked',
+        },
+    },
+    'suppliers': {
+        'table': 'SA2',
+        'model': ProtheusSupplier,
+        'key': ('code', 'store'),
+        'columns': {
+            'A2_COD': 'code',
+            'A2_LOJA': 'store',
+            'A2_NOME': 'name',
+            'A2_CGC': 'cnpj',
+            'A2_MSBLQL': 'blocked',
+        },
+    },
+}
+
+# Colunas de controle do DBAccess
+STAMP_COLUMN = 'S_T_A_M_P_'
+DELETED_COLUMN = 'D_E_L_E_T_'
+
+
+# ----------------------------------------------------------------------
+# Origens
+# ----------------------------------------------------------------------
+
+class RegistrySource:
+    """
+    Origem dos registros: `fetch` devolve as linhas (dicts com as colunas do
+    Protheus mais S_T_A_M_P_ e D_E_L_E_T_) alteradas depois de `since`
+    """
+    name = ''
+
+    def fetch(self, registry: str, since: Optional[datetime]) -> Iterator[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class RestRegistrySource(RegistrySource):
+    """
+    Endpoint REST paginado do Protheus: GET <path>?since=...&page=N&pageSize=M
+    respondendo {"items": [...], "hasNext": bool}
+    """
+    name = 'rest'
+
+    def __init__(self, base_url: str = None, page_size: int = None, timeout: int = 60):
+        import requests
+
+        self.base_url = base_url or getattr(settings, 'PROTHEUS_API_URL', 'http://localhost:8080')
+        self.page_size = page_size or getattr(settings, 'REGISTRY_PAGE_SIZE', 1000)
+        self.timeout = timeout
+        self.paths = getattr(settings, 'REGISTRY_REST_PATHS', {})
+        self.session = requests.Session()
+        self.session.headers.update({'Content-Type': 'application/json'})
+
+    def fetch(self, registry: str, since: Optional[datetime]) -> Iterator[Dict[str, Any]]:
+        url = f"{self.base_url}{self.paths[registry]}"
+        page = 1
+        while True:
+            params = {'page': page, 'pageSize': self.page_size}
+            if since:
+                params['since'] = since.isoformat()
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+            yield from data.get('items', [])
+            if not data.get('hasNext'):
+                break
+            page += 1
+
+    def close(self):
+        self.session.close()
+
+
+class OdbcRegistrySource(RegistrySource):
+    """
+    Leitura direta das tabelas do Protheus pelo driver ODBC (msodbcsql)
+
+    Requer a coluna S_T_A_M_P_ habilitada no DBAccess para a leitura incremental.
+    """
+    name = 'odbc'
+
+    def __init__(self, connection_string: str = None, table_suffix: str = None):
+        import pyodbc
+
+        connection_string = connection_string or getattr(settings, 'PROTHEUS_ODBC_CONNECTION', '')
+        if not connection_string:
+            raise ValueError("PROTHEUS_ODBC_CONNECTION não configurado")
+        self.table_suffix = table_suffix or getattr(settings, 'PROTHEUS_TABLE_SUFFIX', '010')
+        self.connection = pyodbc.connect(connection_string, readonly=True)
+
+    def fetch(self, registry: str, since: Optional[datetime]) -> Iterator[Dict[str, Any]]:
+        definition = REGISTRIES[registry]
+        columns = [*definition['columns'], STAMP_COLUMN, DELETED_COLUMN]
+        sql = f"SELECT {', '.join(columns)} FROM {definition['table']}{self.table_suffix}"
+        params = []
+        if since:
+            # >=: linhas alteradas no mesmo segundo da marca d'água podem não ter sido lidas;
+            # as já importadas são descartadas em _apply_chunk
+            sql += f" WHERE {STAMP_COLUMN} >= ?"
+            params.append(timezone.make_naive(since, protheus_timezone()))
+        sql += f" ORDER BY {STAMP_COLUMN}"
+
+        cursor = self.connection.cursor()
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(SYNC_CHUNK_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(zip(columns, row))
+        cursor.close()
+
+    def close(self):
+        self.connection.close()
+
+
+class StubRegistrySource(RegistrySource):
+    """
+    Origem em memória (testes, benchmarks e desenvolvimento sem Protheus)
+
+    Args:
+        records: {'products': [linhas], 'suppliers': [linhas]} no formato das
+                 colunas do Protheus
+    """
+    name = 'stub'
+
+    def __init__(self, records: Dict[str, List[Dict[str, Any]]] = None, file_path: str = None):
+        if file_path:
+            with open(file_path, encoding='utf-8') as stub_file:
+                records = json.load(stub_file)
+        self.records = records or {}
+
+    def fetch(self, registry: str, since: Optional[datetime]) -> Iterator[Dict[str, Any]]:
+        for row in self.records.get(registry, []):
+            modified_at = _parse_stamp(row.get(STAMP_COLUMN))
+            if since is None or modified_at is None or modified_at >= since:
+                yield row
+
+
+REGISTRY_SOURCES = {
+    'rest': RestRegistrySource,
+    'odbc': OdbcRegistrySource,
+    'stub': StubRegistrySource,
+}
+
+
+def get_registry_source(name: str = None, **kwargs) -> RegistrySource:
+    name = name or getattr(settings, 'REGISTRY_SOURCE', 'rest')
+    if name not in REGISTRY_SOURCES:
+        raise ValueError(f"Origem de cadastro desconhecida: {name}")
+    return REGISTRY_SOURCES[name](**kwargs)
+
+
+# ----------------------------------------------------------------------
+# Conversão das linhas
+# ----------------------------------------------------------------------
+
+def protheus_timezone() -> zoneinfo.ZoneInfo:
+    """
+    Fuso do servidor do Protheus (S_T_A_M_P_ é gravado em hora local, sem fuso)
+    """
+    return zoneinfo.ZoneInfo(getattr(settings, 'PROTHEUS_TIME_ZONE', settings.TIME_ZONE))
+
+
+def _parse_stamp(value) -> Optional[datetime]:
+    if value in (None, ''):
+        return None
+    if not isinstance(value, datetime):
+        value = parse_datetime(str(value))
+        if value is None:
+            return None
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, protheus_timezone())
+    return value
+
+
+def _convert(field_name: str, value):
+    if isinstance(value, str):
+        # Campos do Protheus vêm completados com espaços
+        value = value.strip()
+    if field_name == 'blocked':
+        return str(value or '').strip() == '1'
+    if field_name == 'ipi_percentage':
+        if value in (None, ''):
+            return None
+        try:
+            return Decimal(str(value))
+        except InvalidOperation:
+            return None
+    if field_name in ('ncm_code', 'cnpj'):
+        return value or None
+    return value if value is not None else ''
+
+
+def _to_record(registry: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    columns = REGISTRIES[registry]['columns']
+    # REST pode devolver as colunas em minúsculas
+    row = {str(key).upper(): value for key, value in row.items()}
+    record = {field_name: _convert(field_name, row.get(column)) for column, field_name in columns.items()}
+    record['source_modified_at'] = _parse_stamp(row.get(STAMP_COLUMN))
+    record['deleted'] = str(row.get(DELETED_COLUMN) or '').strip() == '*'
+    return record
+
+
+# ----------------------------------------------------------------------
+# Sincronização
+# ----------------------------------------------------------------------
+
+def sync_registry(source: RegistrySource, registry: str, full: bool = False) -> Dict[str, int]:
+    """
+    Importa no espelho local os registros alterados desde a última marca d'água
+
+    Returns:
+        {'created': n, 'updated': n, 'deleted': n}
+    """
+    state, _ = RegistrySyncState.objects.get_or_create(registry=registry)
+    since = None if full else state.watermark
+    logger.info(f"Sincronizando cadastro {registry} ({source.name}) desde {since or 'o início'}")
+
+    counts = {'created': 0, 'updated': 0, 'deleted': 0}
+    watermark = state.watermark
+    chunk = []
+    for row in source.fetch(registry, since):
+        record = _to_record(registry, row)
+        if record['source_modified_at'] and (watermark is None or record['source_modified_at'] > watermark):
+            watermark = record['source_modified_at']
+        chunk.append(record)
+        if len(chunk) >= SYNC_CHUNK_SIZE:
+            _apply_chunk(registry, chunk, counts)
+            chunk = []
+    if chunk:
+        _apply_chunk(registry, chunk, counts)
+
+    state.watermark = watermark
+    state.last_synced_at = timezone.now()
+    state.last_source = source.name
+    state.records_synced = sum(counts.values())
+    if state.records_synced:
+        # Nova versão do espelho: os índices em memória (RegistryIndex) são remontados
+        state.version += 1
+    state.save()
+    _synced_registries.add(registry)
+    get_registry_index().invalidate()
+
+    logger.info(
+        f"Cadastro {registry}: {counts['created']} novos, {counts['updated']} alterados, "
+        f"{counts['deleted']} removidos"
+    )
+    return counts
+
+
+def _apply_chunk(registry: str, records: List[Dict[str, Any]], counts: Dict[str, int]):
+    definition = REGISTRIES[registry]
+    model = definition['model']
+    key_fields = definition['key']
+    fields = [*definition['columns'].values(), 'source_modified_at']
+    update_fields = [field_name for field_name in fields if field_name not in key_fields] + ['synced_at']
+
+    def key_of(item):
+        if isinstance(item, dict):
+            return tuple(item[field_name] for field_name in key_fields)
+        return tuple(getattr(item, field_name) for field_name in key_fields)
+
+    # A última linha de cada chave prevalece (ordem de alteração)
+    latest = {key_of(record): record for record in records}
+
+    existing = {
+        key_of(instance): instance
+        for instance in model.objects.filter(code__in={key[0] for key in latest})
+    }
+
+    now = timezone.now()
+    to_create, to_update, to_delete = [], [], []
+    for key, record in latest.items():
+        instance = existing.get(key)
+        if record['deleted']:
+            if instance is not None:
+                to_delete.append(instance.pk)
+            continue
+        values = {field_name: record[field_name] for field_name in fields}
+        if instance is None:
+            to_create.append(model(synced_at=now, **values))
+        elif all(getattr(instance, field_name) == value for field_name, value in values.items()):
+            # Já importado (relido pelo >= da marca d'água)
+            continue
+        else:
+            for field_name, value in values.items():
+                setattr(instance, field_name, value)
+            instance.synced_at = now
+            to_update.append(instance)
+
+    with transaction.atomic():
+        model.objects.filter(pk__in=to_delete).delete()
+        model.objects.bulk_create(to_create, batch_size=SYNC_CHUNK_SIZE)
+        model.objects.bulk_update(to_update, update_fields, batch_size=SYNC_CHUNK_SIZE)
+
+        if registry == 'products':
+            # Resultados de validação em cache ficam desatualizados para os códigos alterados
+            codes = [key[0] for key in latest]
+            ValidationResult.objects.filter(Q(normalized_code__in=codes) | Q(validated_code__in=codes)).delete()
+
+    counts['created'] += len(to_create)
+    counts['updated'] += len(to_update)
+    counts['deleted'] += len(to_delete)
+
+
+# Cadastros já sincronizados neste processo (a resposta positiva não muda)
+_synced_registries = set()
+
+
+def registry_synced(registry: str) -> bool:
+    """
+    Indica se o espelho do cadastro já foi carregado alguma vez
+    """
+    if registry in _synced_registries:
+        return True
+    if RegistrySyncState.objects.filter(registry=registry, last_synced_at__isnull=False).exists():
+        _synced_registries.add(registry)
+        return True
+    return False
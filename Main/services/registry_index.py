@@ -0,0 +1,112 @@
+"""
+Índice em memória do espelho dos cadastros do Protheus, para testes de
+existência de códigos sem consultar o banco
+"""
+import logging
+import threading
+import time
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from django.conf import settings
+
+from Main.models import ProtheusProduct, ProtheusSupplier, RegistrySyncState
+
+logger = logging.getLogger(__name__)
+
+
+class RegistryIndex:
+    """
+    Conjuntos imutáveis (frozenset) dos códigos ativos do SB1 por grupo e do SA2
+
+    Os conjuntos são exatos para a versão do espelho em que foram montados, então
+    a resposta não precisa ser confirmada no banco. A versão é a de cada cadastro
+    (RegistrySyncState.version, incrementada quando uma sincronização altera o
+    espelho): a cada REGISTRY_INDEX_CHECK_INTERVAL segundos ela é comparada e, se
+    mudou (inclusive por um sync_protheus_registry rodando em outro processo), o
+    índice é remontado.
+
+    Leitores nunca bloqueiam: o estado é trocado por uma única atribuição.
+    """
+
+    def __init__(self, check_interval: float = None):
+        self.check_interval = (
+            check_interval if check_interval is not None
+            else getattr(settings, 'REGISTRY_INDEX_CHECK_INTERVAL', 30)
+        )
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._version = None
+        # (códigos por grupo, todos os códigos, fornecedores)
+        self._state: Tuple[Dict[str, FrozenSet[str]], FrozenSet[str], FrozenSet[str]] = ({}, frozenset(), frozenset())
+
+    @staticmethod
+    def _current_version() -> tuple:
+        return tuple(RegistrySyncState.objects.order_by('registry').values_list('registry', 'version'))
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return
+            version = self._current_version()
+            if version != self._version:
+                self._state = self._build()
+                self._version = version
+            self._checked_at = time.monotonic()
+
+    @staticmethod
+    def _build():
+        start = time.perf_counter()
+        by_group: Dict[str, set] = {}
+        for product_group, code in (
+            ProtheusProduct.objects.filter(blocked=False)
+            .values_list('product_group', 'code')
+            .iterator(chunk_size=5000)
+        ):
+            by_group.setdefault(product_group, set()).add(code)
+
+        products = {group: frozenset(codes) for group, codes in by_group.items()}
+        all_codes = frozenset().union(*products.values())
+        suppliers = frozenset(
+            ProtheusSupplier.objects.filter(blocked=False).values_list('code', flat=True).iterator(chunk_size=5000)
+        )
+
+        logger.info(
+            f"Índice do cadastro montado: {len(all_codes)} produtos em {len(products)} grupos, "
+            f"{len(suppliers)} fornecedores em {time.perf_counter() - start:.2f}s"
+        )
+        return products, all_codes, suppliers
+
+    def has_product(self, code: str, product_group: Optional[str] = None) -> bool:
+        self._ensure_fresh()
+        products, all_codes, _ = self._state
+        if product_group:
+            return code in products.get(product_group, ())
+        return code in all_codes
+
+    def has_supplier(self, code: str) -> bool:
+        self._ensure_fresh()
+        return code in self._state[2]
+
+    def invalidate(self):
+        """
+        Força a remontagem no próximo acesso (após uma sincronização neste processo)
+        """
+        with self._lock:
+            self._checked_at = None
+            self._version = None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_registry_index() -> RegistryIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = RegistryIndex()
+        return _index
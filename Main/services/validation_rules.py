@@ -0,0 +1,144 @@
+"""
+Regras de negócio da validação de produtos, avaliadas em conjunto sobre o lote
+
+Cada regra é uma condição do ORM (Q) que identifica os produtos em violação e
+uma mensagem; o motor aplica cada regra com um único UPDATE por bloco de
+produtos, então novas regras não multiplicam o custo por linha.
+"""
+import logging
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple, Union
+
+from django.db import transaction
+from django.db.models import Case, F, Q, TextField, Value, When
+from django.db.models.expressions import Combinable
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from Main.models import Product
+from .fiscal import fiscal_violations
+
+logger = logging.getLogger(__name__)
+
+RULE_CHUNK_SIZE = 5000
+
+ERROR_SEPARATOR = '; '
+
+
+class ValidationRule:
+    """
+    Regra de validação
+
+    Args:
+        name: identificador da regra
+        condition: Q que seleciona os produtos que violam a regra
+        message: texto do erro, ou expressão do ORM (ex: Concat com F('product_code'))
+        file_types: tipos de arquivo aos quais a regra se aplica (None = todos)
+        check: função (queryset do bloco) -> [(condição, mensagem)], para regras
+               calculadas fora do banco (ex: tabelas fiscais em memória)
+    """
+
+    def __init__(self, name: str, condition: Optional[Q] = None, message: Union[str, Combinable] = '',
+                 file_types: Optional[Iterable[str]] = None,
+                 check: Optional[Callable[[Any], Iterable[Tuple[Q, Any]]]] = None):
+        self.name = name
+        self.condition = condition
+        self.message = message
+        self.file_types = frozenset(file_types) if file_types else None
+        self.check = check
+
+    def applies_to(self, file_type: str) -> bool:
+        return self.file_types is None or file_type in self.file_types
+
+    def message_expression(self):
+        return _as_expression(self.message)
+
+    def violations(self, queryset) -> Iterable[Tuple[Q, Combinable]]:
+        """
+        Pares (condição, mensagem) a aplicar sobre o bloco de produtos
+        """
+        if self.check is not None:
+            return [(condition, _as_expression(message)) for condition, message in self.check(queryset)]
+        return [(self.condition, self.message_expression())]
+
+    def __repr__(self):
+        return f"ValidationRule({self.name!r})"
+
+
+RULES: List[ValidationRule] = [
+    # Rule 1: Check if product registration exists
+    ValidationRule(
+        'product_not_found',
+        Q(product_code_validated=False),
+        Concat(Value('Produto '), F('product_code'), Value(' não encontrado no cadastro'),
+               output_field=TextField()),
+    ),
+    # Rule 2: ICMS 4% validation (XML only)
+    ValidationRule(
+        'icms_4_requires_origin_2',
+        Q(icms_percentage=4) & ~Q(origin='2'),
+        'ICMS 4% requer Origem = 2',
+        file_types=['XML'],
+    ),
+    # Rule 3: NCM, IPI (TIPI) and ICMS rate cross-checks against the fiscal reference tables (XML only)
+    ValidationRule('fiscal_tables', check=fiscal_violations, file_types=['XML']),
+]
+
+
+def register_rule(rule: ValidationRule):
+    """
+    Acrescenta uma regra ao final da lista (a ordem define a ordem das mensagens)
+    """
+    RULES.append(rule)
+
+
+def _as_expression(message):
+    if isinstance(message, str):
+        return Value(message, output_field=TextField())
+    return message
+
+
+def _append_error(message):
+    return Case(
+        When(validation_error__isnull=True, then=message),
+        default=Concat(F('validation_error'), Value(ERROR_SEPARATOR), message, output_field=TextField()),
+        output_field=TextField(),
+    )
+
+
+def apply_rules(product_ids: Sequence[int], file_type: str, rules: Sequence[ValidationRule] = None) -> dict:
+    """
+    Avalia as regras sobre os produtos e grava validation_error e
+    validation_status em lote
+
+    Os produtos já devem ter product_code_validated e supplier_code_validated
+    preenchidos. Status: INVALID se alguma regra falhou; VALID se produto e
+    fornecedor foram validados; PENDING caso contrário.
+
+    Returns:
+        {nome da regra: produtos em violação}
+    """
+    rules = [rule for rule in (RULES if rules is None else rules) if rule.applies_to(file_type)]
+    violations = {rule.name: 0 for rule in rules}
+    now = timezone.now()
+
+    with transaction.atomic():
+        for start in range(0, len(product_ids), RULE_CHUNK_SIZE):
+            queryset = Product.objects.filter(pk__in=product_ids[start:start + RULE_CHUNK_SIZE])
+
+            queryset.update(validation_error=None, updated_at=now)
+            for rule in rules:
+                for condition, message in rule.violations(queryset):
+                    violations[rule.name] += queryset.filter(condition).update(
+                        validation_error=_append_error(message)
+                    )
+
+            queryset.filter(validation_error__isnull=False).update(validation_status='INVALID')
+            queryset.filter(
+                validation_error__isnull=True, product_code_validated=True, supplier_code_validated=True
+            ).update(validation_status='VALID')
+            queryset.filter(validation_error__isnull=True).filter(
+                Q(product_code_validated=False) | Q(supplier_code_validated=False)
+            ).update(validation_status='PENDING')
+
+    logger.info(f"Regras aplicadas a {len(product_ids)} produtos: {violations}")
+    return violations
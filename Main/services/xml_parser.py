@@ -1,10 +1,69 @@
 import xml.etree.ElementTree as ET
 from decimal import Decimal
-from typing import Dict, List, Any
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Dict, List, Any, Optional
 import logging
 
+from lxml import etree
+
+from .metrics import StageTimer
+from .normalization import apply_normalization_rule
+from .parsed_cache import NFE_SUPPLIER_DOCUMENT
+
 logger = logging.getLogger(__name__)
 
+NFE_NAMESPACE = 'http://www.portalfiscal.inf.br/nfe'
+
+# Raízes de documentos NF-e (nota autorizada, nota avulsa, lote de envio)
+NFE_ROOTS = ('nfeProc', 'NFe', 'enviNFe')
+
+
+@lru_cache(maxsize=None)
+def _nfe_xpaths(namespace: Optional[str]) -> SimpleNamespace:
+    """
+    Expressões XPath pré-compiladas da NF-e para o namespace do documento
+    (o do portal fiscal ou nenhum)
+    """
+    namespaces = {'n': namespace} if namespace else None
+
+    def compile_path(path: str):
+        return etree.XPath(path if namespace else path.replace('n:', ''), namespaces=namespaces)
+
+    return SimpleNamespace(
+        inf_nfe=compile_path('.//n:infNFe'),
+        emit=compile_path('n:emit'),
+        det=compile_path('n:det'),
+        prod=compile_path('n:prod'),
+        icms=compile_path('n:imposto/n:ICMS/*'),
+        ipi=compile_path('n:imposto/n:IPI/n:IPITrib/n:pIPI/text()'),
+    )
+
+
+def _local_name(tag: str) -> str:
+    return tag.rpartition('}')[2]
+
+
+def _children_text(element) -> Dict[str, str]:
+    """
+    {tag sem namespace: texto} dos filhos diretos (comentários ignorados)
+    """
+    if element is None:
+        return {}
+    return {
+        _local_name(child.tag): (child.text or '').strip()
+        for child in element if isinstance(child.tag, str)
+    }
+
+
+def _root_tag(source) -> str:
+    """
+    Tag da raiz do documento, lendo apenas o início do arquivo
+    """
+    for _, element in etree.iterparse(source, events=('start',), resolve_entities=False, no_network=True):
+        return element.tag
+    return ''
+
 
 class XMLParser:
 
@@ -41,29 +100,73 @@ class XMLParser:
         'observations': ['observacoes', 'obs', 'observations', 'notas'],
     }
 
-    def __init__(self, file_path: str):
+    # Tags da NF-e usadas pelo caminho nativo (det/prod e det/imposto)
+    NFE_TAG_MAPPING = {
+        'product_code': 'cProd',
+        'description': 'xProd',
+        'unit_of_measure': 'uCom',
+        'ncm_code': 'NCM',
+        'quantity': 'qCom',
+        'unit_value': 'vUnCom',
+        'discount': 'vDesc',
+        'barcode': 'cEAN',
+        'origin': 'orig',
+        'icms_percentage': 'pICMS',
+        'icms_base': 'vBC',
+        'ipi_percentage': 'pIPI',
+    }
+
+    def __init__(self, file_path: str, timer: StageTimer = None, profile=None):
         self.file_path = file_path
         self.root = None
+        self.timer = timer or StageTimer()
+        self.profile = profile
+        self.product_elements = []
+        # Tags conhecidas do perfil (campo -> tag): dispensa a busca por aliases
+        self.tag_map = dict(profile.column_mapping) if profile and profile.column_mapping else None
+        self.is_nfe = False
 
     def parse(self) -> List[Dict[str, Any]]:
+        """
+        Documento NF-e vai pelo caminho nativo (lxml + XPath); os demais pela
+        busca genérica de tags. ZIPs de XMLs são extraídos antes, pelo
+        FileProcessor (multi_upload.extract_archive)
+        """
+        if _local_name(_root_tag(self.file_path)) in NFE_ROOTS:
+            return self._parse_nfe(self.file_path)
+        return self._parse_generic(self.file_path)
+
+    def _parse_generic(self, source) -> List[Dict[str, Any]]:
         try:
-            tree = ET.parse(self.file_path)
-            self.root = tree.getroot()
+            with self.timer.stage('read'):
+                tree = ET.parse(source)
+                self.root = tree.getroot()
 
-            products = []
+            with self.timer.stage('map'):
+                product_elements = self._find_product_elements()
+                self.product_elements = product_elements
+                if self.tag_map is not None and product_elements and not self._profile_matches(product_elements[0]):
+                    logger.warning(
+                        f"Layout do perfil {self.profile.fornecedor_code} não corresponde ao arquivo; detectando tags"
+                    )
+                    self.tag_map = None
 
-            product_elements = self._find_product_elements()
+            extracted = []
+            with self.timer.stage('extract', rows=len(product_elements)):
+                for product_elem in product_elements:
+                    try:
+                        extracted.append(self._extract_product_data(product_elem))
+                    except Exception as e:
+                        logger.error(f"Erro ao processar elemento de produto: {str(e)}")
+                        continue
 
-            for product_elem in product_elements:
-                try:
-                    product_data = self._extract_product_data(product_elem)
+            products = []
+            with self.timer.stage('validate', rows=len(extracted)):
+                for product_data in extracted:
                     if product_data.get('product_code') and product_data.get('description'):
                         products.append(product_data)
                     else:
                         logger.warning(f"Produto ignorado: falta código ou descrição")
-                except Exception as e:
-                    logger.error(f"Erro ao processar elemento de produto: {str(e)}")
-                    continue
 
             logger.info(f"Total de {len(products)} produtos extraídos do XML")
             return products
@@ -72,6 +175,112 @@ class XMLParser:
             logger.error(f"Erro ao analisar arquivo XML: {str(e)}")
             raise
 
+    def _parse_nfe(self, source) -> List[Dict[str, Any]]:
+        """
+        Extrai os itens (det) de uma NF-e: det/prod e det/imposto por XPath
+        pré-compilado, fornecedor do emit uma vez por nota
+        """
+        self.is_nfe = True
+        try:
+            with self.timer.stage('read'):
+                parser = etree.XMLParser(resolve_entities=False, no_network=True, remove_comments=True)
+                root = etree.parse(source, parser).getroot()
+                xpaths = _nfe_xpaths(etree.QName(root).namespace)
+
+            items = []
+            with self.timer.stage('map'):
+                for inf_nfe in xpaths.inf_nfe(root):
+                    emit = xpaths.emit(inf_nfe)
+                    emit = _children_text(emit[0]) if emit else {}
+                    supplier = (emit.get('CNPJ') or emit.get('CPF') or None, emit.get('xNome') or None)
+                    items.extend((det, supplier) for det in xpaths.det(inf_nfe))
+
+            extracted = []
+            with self.timer.stage('extract', rows=len(items)):
+                for det, supplier in items:
+                    try:
+                        extracted.append(self._extract_nfe_item(det, supplier, xpaths))
+                    except Exception as e:
+                        logger.error(f"Erro ao processar item {det.get('nItem')} da NF-e: {str(e)}")
+                        continue
+
+            products = []
+            with self.timer.stage('validate', rows=len(extracted)):
+                for product_data in extracted:
+                    if product_data.get('product_code') and product_data.get('description'):
+                        products.append(product_data)
+                    else:
+                        logger.warning("Item da NF-e ignorado: falta código ou descrição")
+
+            logger.info(f"Total de {len(products)} produtos extraídos da NF-e")
+            return products
+
+        except Exception as e:
+            logger.error(f"Erro ao analisar NF-e: {str(e)}")
+            raise
+
+    def _extract_nfe_item(self, det, supplier, xpaths) -> Dict[str, Any]:
+        prod_element = xpaths.prod(det)
+        prod = _children_text(prod_element[0] if prod_element else None)
+        icms_group = xpaths.icms(det)
+        icms = _children_text(icms_group[0] if icms_group else None)
+        ipi = xpaths.ipi(det)
+        ipi_percentage = ipi[0].strip() if ipi else None
+
+        product_code = prod.get('cProd', '')
+        source_code = product_code
+        if self.profile and self.profile.normalization_rule and product_code:
+            product_code = apply_normalization_rule(product_code, self.profile.normalization_rule)
+
+        barcode = prod.get('cEAN')
+        # CNPJ/CPF do emitente não é o A2_COD: vai no raw_data e o código do
+        # fornecedor é resolvido pelo cadastro (SA2) ao gravar
+        supplier_document, supplier_name = supplier
+
+        product_data = {
+            'product_code': product_code,
+            'description': prod.get('xProd', ''),
+            'short_description': None,
+            'product_type': None,
+            'product_group': None,
+            'product_category': None,
+            'unit_of_measure': prod.get('uCom') or None,
+            'second_unit': None,
+            'conversion_factor': None,
+            'sale_price': None,
+            'cost_price': None,
+            'currency': 'BRL',
+            'current_stock': Decimal('0'),
+            'minimum_stock': None,
+            'warehouse_code': None,
+            'ncm_code': prod.get('NCM') or None,
+            'ipi_percentage': self._parse_decimal(ipi_percentage),
+            'icms_percentage': self._parse_decimal(icms.get('pICMS')),
+            'icms_base': self._parse_decimal(icms.get('vBC')),
+            'origin': icms.get('orig') or None,
+            'quantity': self._parse_decimal(prod.get('qCom')),
+            'unit_value': self._parse_decimal(prod.get('vUnCom')),
+            'discount': self._parse_decimal(prod.get('vDesc')),
+            'supplier_code': None,
+            'supplier_name': supplier_name,
+            'barcode': barcode if barcode and barcode != 'SEM GTIN' else None,
+            'weight': None,
+            'weight_unit': 'KG',
+            'active': True,
+            'observations': None,
+        }
+
+        raw_data = {'nItem': det.get('nItem'), **prod, **icms}
+        if ipi_percentage is not None:
+            raw_data['pIPI'] = ipi_percentage
+        if supplier_document:
+            raw_data[NFE_SUPPLIER_DOCUMENT] = supplier_document
+        product_data['raw_data'] = raw_data
+        if source_code != product_code:
+            product_data['source_code'] = source_code
+
+        return product_data
+
     def _find_product_elements(self) -> List[ET.Element]:
         possible_tags = ['product', 'produto', 'item', 'Product', 'Produto', 'Item']
 
@@ -86,6 +295,9 @@ class XMLParser:
         return []
 
     def _find_element_value(self, element: ET.Element, field_name: str, default=None) -> Any:
+        if self.tag_map is not None:
+            return self._find_profile_value(element, field_name, default)
+
         if field_name not in self.TAG_MAPPING:
             return default
 
@@ -110,9 +322,64 @@ class XMLParser:
 
         return default
 
+    def _profile_matches(self, element: ET.Element) -> bool:
+        """
+        O perfil serve ao documento se a tag do código do produto existe no
+        elemento (ex: perfil aprendido de uma NF-e aplicado a um catálogo não serve)
+        """
+        tag = self.tag_map.get('product_code')
+        if not tag:
+            return False
+        return element.find(tag) is not None or tag in element.attrib
+
+    def _find_profile_value(self, element: ET.Element, field_name: str, default=None) -> Any:
+        tag = self.tag_map.get(field_name)
+        if not tag:
+            return default
+
+        child = element.find(tag)
+        if child is not None and child.text:
+            return child.text.strip()
+
+        if tag in element.attrib:
+            return element.attrib[tag].strip()
+
+        return default
+
+    def get_layout(self) -> Dict[str, Any]:
+        """
+        Tags usadas no primeiro produto, para aprender um ImportProfile
+        """
+        column_mapping = {}
+        if self.is_nfe:
+            column_mapping = dict(self.NFE_TAG_MAPPING)
+        elif self.product_elements:
+            element = self.product_elements[0]
+            child_tags = {child.tag.lower(): child.tag for child in element}
+            for field_name, possible_tags in self.TAG_MAPPING.items():
+                for tag in possible_tags:
+                    if tag in element.attrib:
+                        column_mapping[field_name] = tag
+                        break
+                    if tag.lower() in child_tags:
+                        column_mapping[field_name] = child_tags[tag.lower()]
+                        break
+
+        return {
+            'sheet_name': None,
+            'header_row': 0,
+            'column_mapping': column_mapping,
+            'dtypes': {},
+        }
+
     def _extract_product_data(self, element: ET.Element) -> Dict[str, Any]:
+        product_code = self._find_element_value(element, 'product_code', '')
+        source_code = product_code
+        if self.profile and self.profile.normalization_rule and product_code:
+            product_code = apply_normalization_rule(product_code, self.profile.normalization_rule)
+
         product_data = {
-            'product_code': self._find_element_value(element, 'product_code', ''),
+            'product_code': product_code,
             'description': self._find_element_value(element, 'description', ''),
             'short_description': self._find_element_value(element, 'short_description') or None,
             'product_type': self._find_element_value(element, 'product_type') or None,
@@ -148,6 +415,8 @@ class XMLParser:
         for child in element:
             raw_data[child.tag] = child.text
         product_data['raw_data'] = raw_data
+        if source_code != product_code:
+            product_data['source_code'] = source_code
 
         return product_data
 
@@ -0,0 +1,14 @@
+"""
+Limpeza de arquivos derivados quando registros são removidos
+"""
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import FileUpload
+from .services.parsed_cache import delete_parsed_cache
+
+
+@receiver(post_delete, sender=FileUpload)
+def delete_upload_parsed_cache(sender, instance, **kwargs):
+    # O cache do parse (.parsed.arrow) não é referenciado por mais nada
+    delete_parsed_cache(instance.parsed_cache)
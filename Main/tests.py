@@ -1,3 +1,811 @@
-from django.test import TestCase
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+
+# Bibliotecas que só devem ser carregadas quando um upload é processado
+HEAVY_MODULES = ('pandas', 'numpy', 'openpyxl', 'lxml', 'pyarrow')
+
+# Sobe o Django e carrega o URLconf (todas as views) num processo novo, como um worker
+STARTUP_SCRIPT = """
+import json, resource, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+import portalweb.asgi, portalweb.wsgi, portalweb.urls
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'seconds': elapsed,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': sorted(sys.modules),
+}))
+"""
+
+
+def _importtime_parents(stderr: str, module: str) -> list:
+    """
+    Cadeia de imports (de dentro para fora) que levou ao módulo, pela saída do -X importtime
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        name = line.rsplit('|', 1)[1]
+        entries.append((len(name) - len(name.lstrip()), name.strip()))
+
+    # Cada módulo aparece depois dos que importou, com um nível a menos de indentação
+    for index, (depth, name) in enumerate(entries):
+        if name == module:
+            chain = [name]
+            for parent_depth, parent in entries[index + 1:]:
+                if parent_depth < depth:
+                    chain.append(parent)
+                    depth = parent_depth
+            return chain
+    return []
+
+
+class StartupImportTest(SimpleTestCase):
+    """
+    O URLconf (views, API, formulários) não pode importar a pilha de parse
+    """
+
+    def test_views_do_not_import_heavy_libraries(self):
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'portalweb.settings',
+            'SECRET_KEY': settings.SECRET_KEY,
+        }
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=120,
+        )
+        self.assertEqual(process.returncode, 0, process.stderr[-2000:])
+
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        loaded = set(result['modules'])
+        eager = {
+            module: ' <- '.join(_importtime_parents(process.stderr, module))
+            for module in HEAVY_MODULES if module in loaded
+        }
+        self.assertEqual(
+            eager, {},
+            f"Importados na inicialização ({result['seconds']:.2f}s, "
+            f"RSS {result['max_rss_kb'] / 1024:.0f}MB): {eager}"
+        )
+
+
+class ParserColumnsTest(SimpleTestCase):
+    """
+    Cabeçalhos repetidos ou em branco não podem derrubar o upload
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_excel_with_duplicate_and_blank_headers(self):
+        from openpyxl import Workbook
+        from Main.services.excel_parser import ExcelParser
+
+        workbook = Workbook()
+        sheet = workbook.active
+        # Primeira linha vazia: o cabeçalho vem da linha seguinte, com células em branco
+        sheet.append([None, None, None, None, None])
+        sheet.append(['Código', 'Descrição', None, 'CÓDIGO ', None])
+        sheet.append(['A1', 'Produto A', 'x', 'B1', 'y'])
+        sheet.append(['A2', 'Produto B', 'x', 'B2', 'y'])
+        path = os.path.join(self.tmp.name, 'produtos.xlsx')
+        workbook.save(path)
+
+        parser = ExcelParser(path)
+        products = parser.parse()
+
+        self.assertEqual([p['product_code'] for p in products], ['A1', 'A2'])
+        self.assertEqual([p['description'] for p in products], ['Produto A', 'Produto B'])
+        self.assertEqual(parser.original_columns['código'], 'Código')
+
+    def test_csv_with_duplicate_and_blank_headers(self):
+        from Main.services.csv_parser import CSVParser
+
+        path = os.path.join(self.tmp.name, 'produtos.csv')
+        with open(path, 'w', encoding='utf-8') as csv_file:
+            csv_file.write('Codigo;Descricao;;codigo ;\nA1;Produto A;x;B1;y\nA2;Produto B;x;B2;y\n')
+
+        products = CSVParser(path).parse()
+
+        self.assertEqual([p['product_code'] for p in products], ['A1', 'A2'])
+
+
+@override_settings(PARSED_CACHE_ENABLED=False)
+class DeltaImportTest(TestCase):
+    """
+    Importação delta: só produtos novos ou alterados do mesmo fornecedor entram no lote
+    """
+
+    def _product(self, code, price='10.00', supplier_code=None):
+        return {
+            'product_code': code,
+            'description': f'Produto {code}',
+            'sale_price': Decimal(price),
+            'supplier_code': supplier_code,
+            'raw_data': {'codigo': code},
+        }
+
+    def _import(self, products, fornecedor_code, import_mode='DELTA'):
+        from Main.models import FileUpload
+        from Main.services.file_processor import FileProcessor
+        from Main.services.parse_executor import pack_records
+
+        upload = FileUpload.objects.create(
+            file='uploads/delta.xlsx', file_type='EXCEL', status='PROCESSING',
+            fornecedor_code=fornecedor_code, import_mode=import_mode,
+        )
+        # Blocos de 2 produtos: a comparação é feita bloco a bloco
+        result = FileProcessor(upload)._save_products(pack_records(products, 2), len(products))
+        return upload, result
+
+    def test_new_changed_and_unchanged_products(self):
+        self._import([self._product('A1'), self._product('A2'), self._product('A3')], 'JF', 'FULL')
+
+        upload, result = self._import(
+            [self._product('A1'), self._product('A2', price='12.50'), self._product('A4')], 'JF'
+        )
+
+        self.assertEqual(upload.delta_summary, {'inserted': 1, 'changed': 1, 'unchanged': 1})
+        self.assertEqual(result['saved'], 2)
+        self.assertEqual(
+            sorted(result['batch'].products.values_list('product_code', flat=True)), ['A2', 'A4']
+        )
+
+    def test_unchanged_import_creates_no_batch(self):
+        from Main.models import ProductBatch
+
+        self._import([self._product('A1'), self._product('A2')], 'JF', 'FULL')
+
+        upload, result = self._import([self._product('A1'), self._product('A2')], 'JF')
+
+        self.assertEqual(upload.delta_summary, {'inserted': 0, 'changed': 0, 'unchanged': 2})
+        self.assertIsNone(result['batch'])
+        self.assertIsNone(result['batch_code'])
+        self.assertFalse(ProductBatch.objects.filter(file_upload=upload).exists())
+
+    def test_rows_without_supplier_match_only_the_upload_supplier(self):
+        self._import([self._product('A1'), self._product('A2')], 'JF', 'FULL')
+
+        # Mesmos códigos e conteúdo, mas de outro fornecedor: tudo é novo
+        upload, result = self._import([self._product('A1'), self._product('A2')], 'TATU')
+
+        self.assertEqual(upload.delta_summary, {'inserted': 2, 'changed': 0, 'unchanged': 0})
+        self.assertEqual(result['saved'], 2)
+
+    def test_row_supplier_takes_precedence_over_upload_supplier(self):
+        self._import([self._product('A1', supplier_code='000123')], None, 'FULL')
+
+        upload, result = self._import([self._product('A1', supplier_code='000123')], 'JF')
+
+        self.assertEqual(upload.delta_summary, {'inserted': 0, 'changed': 0, 'unchanged': 1})
+
+
+class ValidationResultStoreTest(TestCase):
+
+    def test_store_results_replaces_existing_key(self):
+        from Main.models import ValidationResult
+        from Main.services.code_validation import store_results
+
+        key = ('ABC123', '0001', 'JF')
+        store_results({key: (False, 'ABC123')})
+        # Outra validação do mesmo código (ex: requisição simultânea) grava por cima
+        store_results({key: (True, 'ABC.123')})
+
+        result = ValidationResult.objects.get()
+        self.assertTrue(result.is_valid)
+        self.assertEqual(result.validated_code, 'ABC.123')
+
+
+class RegistrySyncTest(TestCase):
+    """
+    Sincronização incremental do espelho do SB1 a partir da origem stub
+    """
+
+    def setUp(self):
+        from Main.services import registry
+        from Main.services.registry_index import get_registry_index
+
+        # O estado "já sincronizado" e o índice são do processo: não vazam para outros testes
+        self.addCleanup(registry._synced_registries.clear)
+        self.addCleanup(get_registry_index().invalidate)
+
+    def _row(self, code, stamp, description='Produto', deleted=''):
+        return {
+            'B1_COD': code, 'B1_DESC': description, 'B1_GRUPO': '0001', 'B1_POSIPI': '84329000',
+            'B1_IPI': '5.00', 'B1_MSBLQL': '2', 'S_T_A_M_P_': stamp, 'D_E_L_E_T_': deleted,
+        }
+
+    def _sync(self, *rows):
+        from Main.services.registry import StubRegistrySource, sync_registry
+
+        return sync_registry(StubRegistrySource({'products': list(rows)}), 'products')
+
+    def _state(self):
+        from Main.models import RegistrySyncState
+
+        return RegistrySyncState.objects.get(registry='products')
+
+    def test_incremental_sync_rereads_watermark_second_once(self):
+        from Main.models import ProtheusProduct
+
+        first = [self._row('A1', '2026-01-10T10:00:00'), self._row('A2', '2026-01-10T11:00:00')]
+        self.assertEqual(self._sync(*first), {'created': 2, 'updated': 0, 'deleted': 0})
+        watermark = self._state().watermark
+
+        # A1 fica antes da marca d'água; A2 é relida pelo >= sem ser reaplicada;
+        # A3, alterada no mesmo instante da marca d'água, não pode se perder
+        counts = self._sync(*first, self._row('A3', '2026-01-10T11:00:00'))
+
+        self.assertEqual(counts, {'created': 1, 'updated': 0, 'deleted': 0})
+        self.assertEqual(self._state().watermark, watermark)
+        self.assertEqual(
+            sorted(ProtheusProduct.objects.values_list('code', flat=True)), ['A1', 'A2', 'A3']
+        )
+
+    def test_deleted_codes_are_removed(self):
+        from Main.models import ProtheusProduct
+
+        self._sync(self._row('A1', '2026-01-10T10:00:00'), self._row('A2', '2026-01-10T10:00:00'))
+
+        counts = self._sync(self._row('A1', '2026-01-11T10:00:00', deleted='*'))
+
+        self.assertEqual(counts, {'created': 0, 'updated': 0, 'deleted': 1})
+        self.assertEqual(list(ProtheusProduct.objects.values_list('code', flat=True)), ['A2'])
+
+    def test_changed_codes_invalidate_validation_results(self):
+        from Main.models import ValidationResult
+        from Main.services.code_validation import store_results
+
+        self._sync(self._row('A1', '2026-01-10T10:00:00'), self._row('A2', '2026-01-10T10:00:00'))
+        store_results({('A1', '0001', 'JF'): (True, 'A1'), ('A2', '0001', 'JF'): (True, 'A2')})
+
+        counts = self._sync(self._row('A1', '2026-01-11T10:00:00', description='Produto alterado'))
+
+        self.assertEqual(counts, {'created': 0, 'updated': 1, 'deleted': 0})
+        self.assertEqual(list(ValidationResult.objects.values_list('normalized_code', flat=True)), ['A2'])
+
+    def test_version_bump_rebuilds_registry_index(self):
+        from Main.services.registry_index import RegistryIndex
+
+        index = RegistryIndex(check_interval=0)
+        self._sync(self._row('A1', '2026-01-10T10:00:00'))
+        self.assertEqual(self._state().version, 1)
+        self.assertTrue(index.has_product('A1', '0001'))
+        self.assertFalse(index.has_product('A2', '0001'))
+
+        # Sem alterações a versão (e o índice) não muda
+        self._sync(self._row('A1', '2026-01-10T10:00:00'))
+        self.assertEqual(self._state().version, 1)
+
+        self._sync(self._row('A2', '2026-01-11T10:00:00'))
+        self.assertEqual(self._state().version, 2)
+        self.assertTrue(index.has_product('A2', '0001'))
+
+
+class FiscalChecksTest(SimpleTestCase):
+
+    def test_normalize_ncm_drops_float_suffix(self):
+        from Main.services.fiscal import normalize_ncm
+
+        self.assertEqual(normalize_ncm('84322900.0'), '84322900')
+        self.assertEqual(normalize_ncm(84322900.0), '84322900')
+        self.assertEqual(normalize_ncm('8432.29.00'), '84322900')
+        self.assertIsNone(normalize_ncm(''))
+
+    def test_fiscal_rule_only_applies_to_xml(self):
+        from Main.services.validation_rules import RULES
+
+        rule = next(rule for rule in RULES if rule.name == 'fiscal_tables')
+        self.assertTrue(rule.applies_to('XML'))
+        self.assertFalse(rule.applies_to('EXCEL'))
+        self.assertFalse(rule.applies_to('CSV'))
+
+    @override_settings(FISCAL_ICMS_RATES='')
+    def test_empty_icms_whitelist_disables_check(self):
+        from Main.services.fiscal import icms_rates
+
+        self.assertEqual(icms_rates(), frozenset())
+
+    @override_settings(FISCAL_ICMS_RATES='4, 12,22.5')
+    def test_icms_whitelist(self):
+        from Main.services.fiscal import icms_rates
+
+        self.assertEqual(icms_rates(), {Decimal('4'), Decimal('12'), Decimal('22.5')})
+
+
+class FakeSeekServer:
+    """
+    seekProdutos em memória: responde como o Protheus e registra os códigos de cada chamada
+    """
+
+    def __init__(self, found=()):
+        self.found = set(found)
+        self.calls = []
+
+    def _payload(self, codes):
+        self.calls.append(list(codes))
+        return {'results': [{'code': code, 'found': code in self.found, 'desc': ''} for code in codes]}
+
+    def post(self, url, json=None, timeout=None):
+        # Substitui requests.Session.post do ProtheusClient
+        response = mock.Mock()
+        response.json.return_value = self._payload(json['codes'])
+        return response
+
+    def transport(self):
+        import httpx
+
+        def handler(request):
+            return httpx.Response(200, json=self._payload(json.loads(request.content)['codes']))
+        return httpx.MockTransport(handler)
+
+
+@override_settings(PRODUCT_VALIDATION_SOURCE='seek', PROTHEUS_API_URL='http://protheus.test')
+class SeekProductsTest(TestCase):
+    """
+    Validação de códigos pelo seekProdutos: blocos, segunda rodada do 0007 (TATU)
+    e o TTL curto dos "não encontrado"
+    """
+
+    def _client(self, server, chunk_size=2):
+        from Main.services.protheus_client import ProtheusClient
+
+        client = ProtheusClient(chunk_size=chunk_size, concurrency=1)
+        client.session.post = server.post
+        return client
+
+    def _async_client(self, server, chunk_size=2):
+        import httpx
+        from Main.services.protheus_client import AsyncProtheusClient
+
+        client = AsyncProtheusClient(chunk_size=chunk_size)
+        client.client = httpx.AsyncClient(base_url=client.base_url, transport=server.transport())
+        return client
+
+    def test_seek_products_is_split_into_chunks(self):
+        server = FakeSeekServer(found={'A1', 'A4'})
+
+        results = self._client(server).seek_products(['A1', 'A2', 'A3', 'A1', 'A4', 'A5'])
+
+        self.assertEqual(server.calls, [['A1', 'A2'], ['A3', 'A4'], ['A5']])
+        self.assertEqual({code for code, result in results.items() if result.found}, {'A1', 'A4'})
+        self.assertEqual(len(results), 5)
+
+    def test_tatu_second_round_only_sends_missing_codes_with_dots(self):
+        from Main.services.code_validation import check_product_codes
+
+        server = FakeSeekServer(found={'1111111111', '222.2222.222'})
+        with mock.patch('Main.services.code_validation.get_protheus_client', return_value=self._client(server)):
+            results = check_product_codes(['1111111111', '2222222222', '3333333333'], '0007', 'TATU')
+
+        self.assertEqual(server.calls, [
+            ['1111111111', '2222222222'], ['3333333333'],
+            ['222.2222.222', '333.3333.333'],
+        ])
+        self.assertEqual(results, {
+            '1111111111': (True, '1111111111'),
+            '2222222222': (True, '222.2222.222'),
+            '3333333333': (False, '333.3333.333'),
+        })
+
+    def test_async_check_matches_sync_check(self):
+        from asgiref.sync import async_to_sync
+        from Main.services.code_validation import acheck_product_codes
+
+        server = FakeSeekServer(found={'1111111111', '222.2222.222'})
+
+        async def check():
+            client = self._async_client(server)
+            try:
+                return await acheck_product_codes(['1111111111', '2222222222', '3333333333'],
+                                                  '0007', 'TATU', client)
+            finally:
+                await client.aclose()
+
+        results = async_to_sync(check)()
+
+        self.assertEqual(sorted(map(sorted, server.calls)), [
+            ['1111111111', '2222222222'], ['222.2222.222', '333.3333.333'], ['3333333333'],
+        ])
+        self.assertEqual(results['2222222222'], (True, '222.2222.222'))
+        self.assertEqual(results['3333333333'], (False, '333.3333.333'))
+
+    def _batch(self, *codes):
+        from Main.models import FileUpload, Product, ProductBatch
+
+        upload = FileUpload.objects.create(file='uploads/seek.xlsx', file_type='EXCEL', status='COMPLETED')
+        batch = ProductBatch.objects.create(file_upload=upload, batch_code='BATCH-SEEK', product_group='0001')
+        for code in codes:
+            Product.objects.create(batch=batch, product_code=code, imported_code=code, description=code)
+        return batch
+
+    def _validate(self, batch, server, remote=True):
+        from Main.services.code_validation import validate_products
+
+        with mock.patch('Main.services.code_validation.get_protheus_client', return_value=self._client(server)):
+            return validate_products(batch.products.all(), '0001', None, 'EXCEL', remote=remote)
+
+    @override_settings(VALIDATION_CACHE_TTL=86400, VALIDATION_NEGATIVE_CACHE_TTL=300)
+    def test_not_found_results_are_rechecked(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from Main.models import ValidationResult
+        from Main.services.code_validation import lookup_cached
+
+        batch = self._batch('A1', 'A2')
+        server = FakeSeekServer(found={'A1'})
+        self.assertEqual(self._validate(batch, server), 2)
+        self.assertEqual([sorted(codes) for codes in server.calls], [['A1', 'A2']])
+
+        # Só pelo cache (pré-validação): o "não encontrado" recente ainda vale
+        self.assertEqual(self._validate(batch, server, remote=False), 2)
+        self.assertEqual(len(server.calls), 1)
+
+        # Validação explícita: o código não encontrado é consultado de novo, o encontrado não
+        server.found.add('A2')
+        self._validate(batch, server)
+        self.assertEqual(server.calls[1:], [['A2']])
+        self.assertTrue(batch.products.get(product_code='A2').product_code_validated)
+
+        # Passado o TTL curto, um "não encontrado" expira; o encontrado continua no cache
+        ValidationResult.objects.filter(normalized_code='A2').update(is_valid=False)
+        ValidationResult.objects.update(checked_at=timezone.now() - timedelta(seconds=301))
+        self.assertEqual(
+            set(lookup_cached([('A1', '0001', ''), ('A2', '0001', '')])), {('A1', '0001', '')}
+        )
+
+
+class ArchiveUploadTest(TestCase):
+    """
+    ZIPs (pacotes e NF-e em lote do upload simples) passam por extract_archive e pelo pool
+    """
+
+    XML = '<produtos><produto><codigo>{code}</codigo><descricao>Produto {code}</descricao></produto></produtos>'
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.media_root = tmp.name
+        media = override_settings(MEDIA_ROOT=tmp.name, PARSED_CACHE_ENABLED=False)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        from Main.services.parse_executor import ParseExecutor
+        patcher = mock.patch('Main.services.multi_upload.get_parse_executor',
+                             return_value=ParseExecutor(backend='inline'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _zip(self, name, members):
+        import zipfile
+
+        path = os.path.join(self.media_root, 'uploads', name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with zipfile.ZipFile(path, 'w') as archive:
+            for member_name, content in members.items():
+                archive.writestr(member_name, content)
+        return path
+
+    def test_extract_archive_filters_types_and_limits_total_size(self):
+        from Main.services.multi_upload import extract_archive
+
+        path = self._zip('pacote.zip', {
+            'a.xml': self.XML.format(code='A1'),
+            'b.xml': self.XML.format(code='B1'),
+            'c.csv': 'codigo;descricao\nC1;Produto C1\n',
+            '__MACOSX/._a.xml': '',
+        })
+
+        members, skipped = extract_archive(path, 'uploads/extracted/1', file_types={'XML'})
+        self.assertEqual([member.name for member in members], ['a.xml', 'b.xml'])
+        self.assertEqual(skipped, {'c.csv': 'Tipo de arquivo não suportado'})
+
+        size = len(self.XML.format(code='A1'))
+        with override_settings(MULTI_UPLOAD_MAX_TOTAL_SIZE=size + 1):
+            members, skipped = extract_archive(path, 'uploads/extracted/2')
+        self.assertEqual([member.name for member in members], ['a.xml'])
+        self.assertEqual(set(skipped), {'b.xml', 'c.csv'})
+
+    def test_xml_zip_upload_uses_the_archive_path(self):
+        from Main.models import FileUpload
+        from Main.services.file_processor import FileProcessor
+
+        self._zip('notas.zip', {'a.xml': self.XML.format(code='A1'), 'b.xml': self.XML.format(code='B1')})
+        upload = FileUpload.objects.create(file='uploads/notas.zip', file_type='XML', status='PENDING')
+
+        result = FileProcessor(upload).process()
+
+        self.assertTrue(result['success'], result['errors'])
+        self.assertEqual(
+            list(upload.batch.products.order_by('product_code').values_list('product_code', 'source_sheet')),
+            [('A1', 'a.xml'), ('B1', 'b.xml')],
+        )
+        self.assertEqual([entry['status'] for entry in upload.file_report], ['COMPLETED', 'COMPLETED'])
+
+    def test_parsed_members_are_yielded_as_they_complete(self):
+        from concurrent.futures import Future
+        from Main.services.multi_upload import ArchiveMember, iter_parsed_members
+
+        class Executor:
+            max_workers = 1
+            timeout = 5
+            submitted = 0
+
+            def submit(self, kind, path, **kwargs):
+                self.submitted += 1
+                future = Future()
+                future.set_result({'path': path})
+                return future
+
+            def result(self, future):
+                return future.result()
+
+        executor = Executor()
+        members = [ArchiveMember(f'{index}.xml', 'XML', f'{index}.xml', f'/tmp/{index}.xml', 1) for index in range(6)]
+
+        submitted_at_yield = []
+        for member, result in iter_parsed_members(members, executor=executor):
+            self.assertEqual(result, {'path': member.path})
+            submitted_at_yield.append(executor.submitted)
+
+        # Nunca mais que 2 x max_workers arquivos à frente do que já foi entregue
+        self.assertEqual(len(submitted_at_yield), 6)
+        self.assertTrue(all(submitted - index <= 3 for index, submitted in enumerate(submitted_at_yield)),
+                        submitted_at_yield)
+
+
+class ColumnResolverTest(SimpleTestCase):
+
+    def test_normalize_header_removes_accents_and_punctuation(self):
+        from Main.services.column_resolver import normalize_header
+
+        self.assertEqual(normalize_header('  Código  do Produto '), 'codigo do produto')
+        self.assertEqual(normalize_header('% IPI'), 'ipi')
+        self.assertEqual(normalize_header('Preço_Venda'), 'preco venda')
+        self.assertEqual(normalize_header('COD "BRUTO"'), 'cod bruto')
+
+    def test_resolve_accented_headers_and_alias_priority(self):
+        from Main.services.column_resolver import ColumnResolver
+
+        resolver = ColumnResolver({
+            'codigo': ['codigo', 'cod'],
+            'descricao': ['descricao', 'produto'],
+            'ipi': ['ipi', '% ipi'],
+        })
+        headers = ['Cód.', 'PRODUTO', 'Descrição', '% IPI', 'Outra']
+
+        resolved = resolver.resolve(headers)
+
+        # Devolve o cabeçalho original; o alias de menor posição vence ('descricao' antes de 'produto')
+        self.assertEqual(resolved, {'codigo': 'Cód.', 'descricao': 'Descrição', 'ipi': '% IPI'})
+        # Resultado em cache pela assinatura dos cabeçalhos, devolvido como cópia
+        resolved['codigo'] = 'alterado'
+        self.assertEqual(resolver.resolve(headers)['codigo'], 'Cód.')
+
+
+class StreamingUploadTest(SimpleTestCase):
+
+    def test_sniff_file_type(self):
+        from Main.uploadhandlers import sniff_file_type
+
+        self.assertEqual(sniff_file_type(b'PK\x03\x04\x14\x00'), 'zip')
+        self.assertEqual(sniff_file_type(b'\xd0\xcf\x11\xe0\xa1\xb1'), 'ole')
+        self.assertEqual(sniff_file_type(b'\xef\xbb\xbf  <?xml version="1.0"?>'), 'xml')
+        self.assertEqual(sniff_file_type('codigo;descrição\n'.encode('cp1252')), 'text')
+        self.assertEqual(sniff_file_type(b'\x00\x01\x02'), 'unknown')
+        self.assertEqual(sniff_file_type(b''), 'unknown')
+
+    def _receive(self, *chunks):
+        from django.core.files.uploadhandler import StopFutureHandlers
+        from Main.uploadhandlers import StreamingUploadHandler
+
+        handler = StreamingUploadHandler()
+        with self.assertRaises(StopFutureHandlers):
+            handler.new_file('file', 'produtos.csv', 'text/csv', None)
+        for chunk in chunks:
+            handler.receive_data_chunk(chunk, 0)
+        return handler, handler.file_complete(sum(map(len, chunks)))
+
+    def test_upload_is_written_and_hashed_in_one_pass(self):
+        import hashlib
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            handler, stored = self._receive(b'codigo;descricao\n', b'A1;Produto A1\n')
+            self.addCleanup(stored.close)
+
+            self.assertFalse(stored.too_large)
+            self.assertEqual(stored.detected_type, 'text')
+            self.assertEqual(stored.size, 31)
+            self.assertEqual(stored.sha256, hashlib.sha256(b'codigo;descricao\nA1;Produto A1\n').hexdigest())
+            with open(stored.path, 'rb') as stored_file:
+                self.assertEqual(stored_file.read(), b'codigo;descricao\nA1;Produto A1\n')
+
+    @override_settings(UPLOAD_MAX_SIZE=20)
+    def test_too_large_upload_is_discarded(self):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            handler, stored = self._receive(b'codigo;descricao\n', b'A1;Produto A1\n', b'A2;Produto A2\n')
+
+            self.assertTrue(stored.too_large)
+            self.assertIsNone(stored.path)
+            self.assertFalse(os.path.exists(handler.path))
+
+
+class ValidationRulesTest(TestCase):
+
+    def setUp(self):
+        from Main.models import FileUpload, Product, ProductBatch
+
+        upload = FileUpload.objects.create(file='uploads/rules.xml', file_type='XML', status='COMPLETED')
+        batch = ProductBatch.objects.create(file_upload=upload, batch_code='BATCH-RULES')
+        self.products = {
+            code: Product.objects.create(
+                batch=batch, product_code=code, imported_code=code, description=code,
+                icms_percentage=icms, origin=origin, product_code_validated=validated,
+                supplier_code_validated=True, validation_error='Erro antigo',
+            )
+            for code, icms, origin, validated in [
+                ('A1', Decimal('4'), '0', True),
+                ('A2', Decimal('18'), '0', True),
+                ('A3', Decimal('4'), '2', False),
+            ]
+        }
+
+    def _rules(self):
+        from django.db.models import F, Q, TextField, Value
+        from django.db.models.functions import Concat
+        from Main.services.validation_rules import ValidationRule
+
+        return [
+            ValidationRule('icms_4', Q(icms_percentage=4) & ~Q(origin='2'), 'ICMS 4% requer Origem = 2',
+                           file_types=['XML']),
+            ValidationRule('origem_0', Q(origin='0'),
+                           Concat(Value('Origem 0 em '), F('product_code'), output_field=TextField())),
+        ]
+
+    def _apply(self, file_type):
+        from Main.services.validation_rules import apply_rules
+
+        violations = apply_rules([product.pk for product in self.products.values()], file_type, self._rules())
+        results = {}
+        for code, product in self.products.items():
+            product.refresh_from_db()
+            results[code] = (product.validation_error, product.validation_status)
+        return violations, results
+
+    def test_messages_are_appended_in_rule_order(self):
+        violations, results = self._apply('XML')
+
+        self.assertEqual(violations, {'icms_4': 1, 'origem_0': 2})
+        self.assertEqual(results, {
+            'A1': ('ICMS 4% requer Origem = 2; Origem 0 em A1', 'INVALID'),
+            'A2': ('Origem 0 em A2', 'INVALID'),
+            'A3': (None, 'PENDING'),
+        })
+
+    def test_rules_are_filtered_by_file_type(self):
+        violations, results = self._apply('EXCEL')
+
+        self.assertEqual(violations, {'origem_0': 2})
+        self.assertEqual(results['A1'], ('Origem 0 em A1', 'INVALID'))
+
+
+class ConditionalListTest(TestCase):
+    """GET condicional das listagens da API"""
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        from Main.models import FileUpload, Product, ProductBatch
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client.force_login(User.objects.create_user('integrador', password='x'))
+        upload = FileUpload.objects.create(file='uploads/api.xlsx', file_type='EXCEL', status='COMPLETED')
+        batch = ProductBatch.objects.create(file_upload=upload, batch_code='BATCH-API')
+        self.product = Product.objects.create(batch=batch, product_code='P1', imported_code='P1', description='Parafuso')
+
+    def _get(self, **headers):
+        return self.client.get('/api/products/', HTTP_ACCEPT='application/json', **headers)
+
+    def test_second_request_with_etag_returns_304(self):
+        first = self._get()
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('ETag', first)
+
+        second = self._get(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.content, b'')
+
+    def test_write_invalidates_etag(self):
+        first = self._get()
+
+        self.product.description = 'Parafuso sextavado'
+        self.product.save()
+
+        second = self._get(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.json()['results'][0]['description'], 'Parafuso sextavado')
+
+
+class ExportTest(TestCase):
+    """Exportação de lote para CSV e XLSX"""
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from Main.models import FileUpload, Product, ProductBatch
+
+        self.client.force_login(User.objects.create_user('exportador', password='x'))
+        upload = FileUpload.objects.create(file='uploads/export.xlsx', file_type='EXCEL', status='COMPLETED')
+        batch = ProductBatch.objects.create(file_upload=upload, batch_code='BATCH-EXP')
+        Product.objects.create(
+            batch=batch, product_code='E1', imported_code='E1', description='=HYPERLINK("x")',
+            supplier_name='+55 11', barcode='-123', unit_of_measure='@UN',
+            quantity=Decimal('2.5000'), unit_value=Decimal('10.50'), validation_status='VALID',
+        )
+
+    def _export(self, file_format):
+        from django.urls import reverse
+
+        response = self.client.get(reverse('Main:export_batch', args=['BATCH-EXP']), {'format': file_format})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'BATCH-EXP.{file_format}', response['Content-Disposition'])
+        return b''.join(response.streaming_content)
+
+    def _row(self, row):
+        from Main.services.export import EXPORT_COLUMNS
+
+        return dict(zip([title for _, title in EXPORT_COLUMNS], row))
+
+    def test_csv(self):
+        import csv
+        from Main.services.export import EXPORT_COLUMNS
+
+        content = self._export('csv').decode('utf-8')
+        self.assertTrue(content.startswith('\ufeff'))
+        header, line = list(csv.reader(content[1:].splitlines(), delimiter=';'))
+        self.assertEqual(header, [title for _, title in EXPORT_COLUMNS])
+
+        row = self._row(line)
+        self.assertEqual(row['Descrição'], '\'=HYPERLINK("x")')
+        self.assertEqual(row['Nome do Fornecedor'], "'+55 11")
+        self.assertEqual(row['Código de Barras'], "'-123")
+        self.assertEqual(row['Unidade de Medida'], "'@UN")
+        self.assertEqual(row['Quantidade'], '2,5000')
+        self.assertEqual(row['Valor Unitário'], '10,50')
+        self.assertEqual(row['Desconto'], '')
+        self.assertEqual(row['Status de Validação'], 'Válido')
+        self.assertEqual(row['Sincronizado com Protheus'], 'Não')
+
+    def test_xlsx(self):
+        import io
+        from openpyxl import load_workbook
+        from Main.services.export import EXPORT_COLUMNS
+
+        sheet = load_workbook(io.BytesIO(self._export('xlsx')))['Produtos']
+        header, line = list(sheet.iter_rows(max_row=2))
+        self.assertEqual([cell.value for cell in header], [title for _, title in EXPORT_COLUMNS])
+        self.assertTrue(header[0].font.bold)
+
+        cells = self._row(line)
+        self.assertEqual(cells['Descrição'].value, '=HYPERLINK("x")')
+        self.assertEqual(cells['Descrição'].data_type, 's')
+        self.assertEqual(cells['Nome do Fornecedor'].value, '+55 11')
+        self.assertEqual(cells['Quantidade'].value, 2.5)
+        self.assertEqual(cells['Quantidade'].data_type, 'n')
+        self.assertEqual(cells['Valor Unitário'].value, 10.5)
+        self.assertIsNone(cells['Desconto'].value)
@@ -0,0 +1,157 @@
+import hashlib
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+
+logger = logging.getLogger(__name__)
+
+
+def sniff_file_type(head: bytes) -> str:
+    """
+    Identifica o formato pelos primeiros bytes do arquivo
+
+    Returns:
+        'zip' (xlsx/zip), 'ole' (xls), 'xml', 'text' (csv/txt) ou 'unknown'
+    """
+    if head.startswith(b'PK\x03\x04'):
+        return 'zip'
+    if head.startswith(b'\xd0\xcf\x11\xe0'):
+        return 'ole'
+
+    text = head.lstrip(b'\xef\xbb\xbf').lstrip()
+    if text.startswith(b'<'):
+        return 'xml'
+    if text and b'\x00' not in text:
+        return 'text'
+    return 'unknown'
+
+
+class StoredUploadedFile(UploadedFile):
+    """
+    Arquivo já gravado no storage durante o recebimento da requisição
+
+    O FileUpload pode referenciar `stored_name` diretamente, sem copiar os bytes,
+    e o parser lê o arquivo do caminho final.
+    """
+
+    def __init__(self, stored_name, path, name, content_type, size, charset, sha256, detected_type,
+                 too_large=False):
+        super().__init__(None, name, content_type, size, charset)
+        self.stored_name = stored_name
+        self.path = path
+        self.sha256 = sha256
+        self.detected_type = detected_type
+        self.too_large = too_large
+
+    def open(self, mode='rb'):
+        if self.file is None or self.file.closed:
+            self.file = open(self.path, mode)
+        else:
+            self.file.seek(0)
+        return self
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+    def temporary_file_path(self):
+        return self.path
+
+    def discard(self):
+        """
+        Remove o arquivo gravado (upload rejeitado pelo formulário)
+        """
+        self.close()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class StreamingUploadHandler(FileUploadHandler):
+    """
+    Grava cada bloco recebido direto no destino final do MEDIA_ROOT, calculando
+    ao mesmo tempo o SHA-256, o tamanho e o tipo do arquivo (uma única passada)
+
+    Arquivos acima de UPLOAD_MAX_SIZE deixam de ser gravados e são marcados
+    como `too_large` para o formulário recusar.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_size = getattr(settings, 'UPLOAD_MAX_SIZE', 100 * 1024 * 1024)
+        self.storage = default_storage
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        super().new_file(field_name, file_name, *args, **kwargs)
+
+        from Main.models import FileUpload
+        file_field = FileUpload._meta.get_field('file')
+
+        self.size = 0
+        self.head = b''
+        self.hasher = hashlib.sha256()
+        self.too_large = False
+        self.destination = None
+
+        while self.destination is None:
+            self.stored_name = self.storage.get_available_name(file_field.generate_filename(None, file_name))
+            self.path = self.storage.path(self.stored_name)
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            try:
+                self.destination = open(self.path, 'xb')
+            except FileExistsError:
+                continue
+
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.too_large:
+            return None
+
+        if len(self.head) < 64:
+            self.head += raw_data[:64 - len(self.head)]
+
+        self.size += len(raw_data)
+        if self.size > self.max_size:
+            logger.warning(f"Upload {self.file_name} acima do limite de {self.max_size} bytes; descartando")
+            self.too_large = True
+            self._remove_partial()
+            return None
+
+        self.hasher.update(raw_data)
+        self.destination.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if not self.too_large:
+            self.destination.close()
+            mode = getattr(self.storage, 'file_permissions_mode', None)
+            if mode is not None:
+                os.chmod(self.path, mode)
+
+        stored = StoredUploadedFile(
+            stored_name=self.stored_name,
+            path=None if self.too_large else self.path,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=self.size,
+            charset=self.charset,
+            sha256=self.hasher.hexdigest(),
+            detected_type=sniff_file_type(self.head),
+            too_large=self.too_large,
+        )
+        if not self.too_large:
+            stored.open()
+        return stored
+
+    def upload_interrupted(self):
+        if getattr(self, 'destination', None) is not None:
+            self._remove_partial()
+
+    def _remove_partial(self):
+        self.destination.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -10,11 +10,14 @@ urlpatterns = [
 
     # File upload and processing
     path('upload/', views.upload_file, name='upload_file'),
+    path('upload/multiple/', views.upload_multiple, name='upload_multiple'),
+    path('uploads/<int:pk>/report/', views.upload_report, name='upload_report'),
     path('uploads/', views.upload_history, name='upload_history'),
 
     # Products
     path('products/', views.product_list, name='product_list'),
     path('products/<int:pk>/', views.product_detail, name='product_detail'),
+    path('products/export/', views.export_products, name='export_products'),
 
     # Purchase order validation workflow
     path('filter/<str:batch_code>/', views.filter_selection, name='filter_selection'),
@@ -22,4 +25,5 @@ urlpatterns = [
     path('validate-codes/', views.validate_codes, name='validate_codes'),
     path('reprocess/<str:batch_code>/', views.reprocess_batch, name='reprocess_batch'),
     path('submit/<str:batch_code>/', views.submit_to_protheus, name='submit_to_protheus'),
+    path('export/<str:batch_code>/', views.export_batch, name='export_batch'),
 ]
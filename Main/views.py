@@ -1,15 +1,26 @@
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth import authenticate, login as auth_login, logout as auth_logout
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.db.models import Q
-from django.http import JsonResponse
-import requests
+from django.http import Http404, JsonResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+import logging
 
-from .models import FileUpload, ProductBatch, Product
-from .forms import FileUploadForm
-from .services.file_processor import process_uploaded_file
+from .models import FileUpload, ProductBatch, Product, ImportProfile
+from .forms import FileUploadForm, MultiFileUploadForm, FORNECEDOR_CHOICES, PRODUCT_GROUP_CHOICES
+from .services.file_processor import FileProcessor, process_uploaded_file
+from .services.multi_upload import process_multi_upload
+from .services.export import EXPORT_FORMATS, export_response
+from .services.code_validation import avalidate_products, prevalidate_batch
+from .services.normalization import rule_for
+from .services.protheus_client import async_protheus_client
+from .uploadhandlers import StreamingUploadHandler
+
+logger = logging.getLogger(__name__)
 
 
 def login_view(request):
@@ -49,25 +60,52 @@ def logout_view(request):
 
 
 @login_required
+@csrf_exempt
 def upload_file(request):
     """
-    View para upload de arquivos Excel/XML
+    View para upload de arquivos Excel/XML/CSV
     """
+    # O handler precisa ser trocado antes do CSRF ler request.POST,
+    # por isso a verificação de CSRF é feita em _upload_file
+    request.upload_handlers = [StreamingUploadHandler(request)]
+    return _upload_file(request)
+
+
+@csrf_protect
+def _upload_file(request):
     if request.method == 'POST':
         form = FileUploadForm(request.POST, request.FILES)
         if form.is_valid():
             file = request.FILES['file']
             file_type = form.cleaned_data['file_type']
+            fornecedor_code = form.cleaned_data.get('fornecedor_code') or None
 
             user = request.user if request.user.is_authenticated else None
 
-            result = process_uploaded_file(file, file_type, user)
+            result = process_uploaded_file(
+                file, file_type, user,
+                fornecedor_code=fornecedor_code,
+                multi_sheet=form.cleaned_data.get('multi_sheet', False),
+                import_mode=form.cleaned_data.get('import_mode') or 'FULL'
+            )
 
             if result['success']:
                 messages.success(
                     request,
                     f"Arquivo processado com sucesso! {result['saved']} de {result['total']} produtos salvos."
                 )
+                delta_summary = result.get('delta_summary')
+                if delta_summary:
+                    messages.info(
+                        request,
+                        f"Importação delta: {delta_summary['inserted']} novos, {delta_summary['changed']} alterados, "
+                        f"{delta_summary['unchanged']} inalterados."
+                    )
+                for error in result['errors'][:10]:
+                    messages.warning(request, error)
+                if not result['batch_code']:
+                    # Importação delta sem produtos novos ou alterados: nenhum lote foi criado
+                    return redirect('Main:upload_history')
                 # Redirect to filter selection page
                 return redirect('Main:filter_selection', batch_code=result['batch_code'])
             else:
@@ -75,15 +113,85 @@ def upload_file(request):
                     request,
                     f"Erro ao processar arquivo: {result['message']}"
                 )
+        else:
+            # Arquivo recusado: remove o que o StreamingUploadHandler já gravou
+            for uploaded in request.FILES.values():
+                if hasattr(uploaded, 'discard'):
+                    uploaded.discard()
     else:
         form = FileUploadForm()
 
     context = {
         'form': form,
+        'max_upload_mb': settings.UPLOAD_MAX_SIZE // (1024 * 1024),
     }
     return render(request, 'Main/upload_file.html', context)
 
 
+@login_required
+@csrf_exempt
+def upload_multiple(request):
+    """
+    View para upload de vários arquivos (ZIP ou seleção múltipla)
+    """
+    request.upload_handlers = [StreamingUploadHandler(request)]
+    return _upload_multiple(request)
+
+
+@csrf_protect
+def _upload_multiple(request):
+    if request.method == 'POST':
+        form = MultiFileUploadForm(request.POST, request.FILES)
+        if form.is_valid():
+            user = request.user if request.user.is_authenticated else None
+
+            result = process_multi_upload(
+                form.cleaned_data['files'], user,
+                fornecedor_code=form.cleaned_data.get('fornecedor_code') or None,
+                batch_mode=form.cleaned_data['batch_mode'],
+                import_mode=form.cleaned_data.get('import_mode') or 'FULL'
+            )
+
+            if result['success']:
+                messages.success(
+                    request,
+                    f"Pacote processado! {result['saved']} de {result['total']} produtos salvos "
+                    f"em {len(result['batch_codes'])} lote(s)."
+                )
+            else:
+                messages.error(request, result['message'])
+            return redirect('Main:upload_report', pk=result['upload_id'])
+        else:
+            for uploaded in request.FILES.getlist('files'):
+                if hasattr(uploaded, 'discard'):
+                    uploaded.discard()
+    else:
+        form = MultiFileUploadForm()
+
+    context = {
+        'form': form,
+        'max_upload_mb': settings.UPLOAD_MAX_SIZE // (1024 * 1024),
+        'max_files': settings.MULTI_UPLOAD_MAX_FILES,
+    }
+    return render(request, 'Main/upload_multiple.html', context)
+
+
+@login_required
+def upload_report(request, pk):
+    """
+    Relatório combinado de um upload de vários arquivos
+    """
+    upload = get_object_or_404(FileUpload, pk=pk, file_type='ZIP')
+    batch = ProductBatch.objects.filter(file_upload=upload).first()
+
+    context = {
+        'upload': upload,
+        'batch': batch,
+        'report': upload.file_report or [],
+    }
+    return render(request, 'Main/upload_report.html', context)
+
+
 @login_required
 def product_list(request):
     """
@@ -93,6 +201,32 @@ def product_list(request):
     batch_filter = request.GET.get('batch', '')
     sync_filter = request.GET.get('sync', '')
 
+    products = _filter_products(request)
+
+    paginator = Paginator(products, 25)
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
+
+    batches = ProductBatch.objects.all().order_by('-created_at')
+
+    context = {
+        'page_obj': page_obj,
+        'search_query': search_query,
+        'batch_filter': batch_filter,
+        'sync_filter': sync_filter,
+        'batches': batches,
+    }
+    return render(request, 'Main/product_list.html', context)
+
+
+def _filter_products(request):
+    """
+    Produtos com os filtros da listagem (busca, lote, sincronização)
+    """
+    search_query = request.GET.get('search', '')
+    batch_filter = request.GET.get('batch', '')
+    sync_filter = request.GET.get('sync', '')
+
     products = Product.objects.select_related('batch').all()
 
     if search_query:
@@ -111,22 +245,34 @@ def product_list(request):
     elif sync_filter == 'pending':
         products = products.filter(synced_to_protheus=False)
 
-    products = products.order_by('-created_at')
+    return products.order_by('-created_at')
 
-    paginator = Paginator(products, 25)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
 
-    batches = ProductBatch.objects.all().order_by('-created_at')
+def _export_format(request) -> str:
+    file_format = request.GET.get('format', 'xlsx').lower()
+    if file_format not in EXPORT_FORMATS:
+        raise Http404(f"Formato de exportação inválido: {file_format}")
+    return file_format
 
-    context = {
-        'page_obj': page_obj,
-        'search_query': search_query,
-        'batch_filter': batch_filter,
-        'sync_filter': sync_filter,
-        'batches': batches,
-    }
-    return render(request, 'Main/product_list.html', context)
+
+@login_required
+def export_products(request):
+    """
+    Exporta a listagem de produtos, com os filtros da página, para XLSX ou CSV (?format=)
+    """
+    file_format = _export_format(request)
+    filename = f"produtos_{timezone.localdate().strftime('%Y%m%d')}"
+    return export_response(request, _filter_products(request), file_format, filename)
+
+
+@login_required
+def export_batch(request, batch_code):
+    """
+    Exporta um lote (na ordem do arquivo importado) para XLSX ou CSV (?format=)
+    """
+    batch = get_object_or_404(ProductBatch, batch_code=batch_code)
+    file_format = _export_format(request)
+    return export_response(request, batch.products.order_by('pk'), file_format, batch.batch_code)
 
 
 @login_required
@@ -179,11 +325,26 @@ def filter_selection(request, batch_code):
 
         batch.save()
 
+        # Remember group and normalization rule on the supplier's import profile
+        if batch.fornecedor_code and batch.product_group:
+            ImportProfile.objects.filter(
+                fornecedor_code=batch.fornecedor_code,
+                file_type=batch.file_upload.file_type
+            ).update(
+                product_group=batch.product_group,
+                normalization_rule=rule_for(batch.product_group, batch.fornecedor_code)
+            )
+
+        # Reuse cached validation results for codes already seen in earlier batches
+        prevalidate_batch(batch)
+
         # Redirect to validation table
         return redirect('Main:validation_table', batch_code=batch_code)
 
     context = {
         'batch': batch,
+        'fornecedor_choices': FORNECEDOR_CHOICES,
+        'product_group_choices': PRODUCT_GROUP_CHOICES,
     }
     return render(request, 'Main/filter_selection.html', context)
 
@@ -217,297 +378,68 @@ def validation_table(request, batch_code):
 
 
 @login_required
-def validate_codes(request):
+async def validate_codes(request):
     """
     API endpoint para validar códigos de produto e fornecedor
-    Aplica normalização antes da validação
+    Aplica normalização antes da validação; códigos já validados (dentro do TTL)
+    vêm do cache de resultados, sem nova consulta ao cadastro
+
+    Assíncrona: sob ASGI a espera pelo Protheus não ocupa um worker
     """
     if request.method == 'POST':
         product_ids = request.POST.getlist('product_ids[]')
 
-        for product_id in product_ids:
-            product = Product.objects.get(pk=product_id)
+        products = Product.objects.filter(pk__in=product_ids).select_related('batch__file_upload').defer('raw_data')
 
-            # Get batch-level product_group and fornecedor for normalization
-            batch = product.batch
-            product_group = batch.product_group
-            fornecedor = batch.fornecedor_code
+        # Get batch-level product_group and fornecedor for normalization
+        products_by_batch = {}
+        async for product in products:
+            products_by_batch.setdefault(product.batch, []).append(product)
 
-            # Store original code for reference
-            original_code = product.product_code
-
-            # Normalize product code based on GRUPO and FORNECEDOR
-            normalized_code = normalize_product_code(original_code, product_group, fornecedor)
-
-            # Update product code with normalized value
-            product.product_code = normalized_code
-
-            # Special handling for GRUPO 0007 (TATU): try without dots first, then with dots
-            if product_group == "0007" and fornecedor == "TATU":
-                # First attempt: validate without dots
-                product_valid = validate_product_code(normalized_code, product_group)
-
-                # If validation fails, try with dots
-                if not product_valid:
-                    code_with_dots = normalize_product_code_with_dots_0007(normalized_code)
-                    product.product_code = code_with_dots
-                    product_valid = validate_product_code(code_with_dots, product_group)
-            else:
-                # Standard validation for other groups
-                product_valid = validate_product_code(normalized_code, product_group)
-
-            product.product_code_validated = product_valid
-
-            # Validate supplier code
-            supplier_valid = validate_supplier_code(product.supplier_code)
-            product.supplier_code_validated = supplier_valid
-
-            # Apply validation rules
-            validation_errors = []
-
-            # Rule 1: Check if product registration exists
-            if not product_valid:
-                validation_errors.append(f"Produto {product.product_code} não encontrado no cadastro")
-
-            # Rule 2: ICMS 4% validation (XML only)
-            if hasattr(product.batch.file_upload, 'file_type') and product.batch.file_upload.file_type == 'XML':
-                if product.icms_percentage == 4 and product.origin != '2':
-                    validation_errors.append("ICMS 4% requer Origem = 2")
-
-            # Rule 3: IPI validation (XML only)
-            if hasattr(product.batch.file_upload, 'file_type') and product.batch.file_upload.file_type == 'XML':
-                if product.ipi_percentage:
-                    # Here you would check against registered IPI percentage
-                    # For now, we'll skip this check
-                    pass
-
-            # Set validation status
-            if validation_errors:
-                product.validation_status = 'INVALID'
-                product.validation_error = '; '.join(validation_errors)
-            elif product_valid and supplier_valid:
-                product.validation_status = 'VALID'
-                product.validation_error = None
-            else:
-                product.validation_status = 'PENDING'
-
-            product.save()
+        async with async_protheus_client(request) as client:
+            for batch, batch_products in products_by_batch.items():
+                await avalidate_products(
+                    batch_products, batch.product_group, batch.fornecedor_code, batch.file_upload.file_type,
+                    client=client
+                )
 
         return JsonResponse({'success': True})
 
     return JsonResponse({'success': False}, status=400)
 
 
-def normalize_product_code(product_code, product_group, fornecedor):
-    """
-    Normaliza o código do produto baseado no grupo e fornecedor
-
-    Args:
-        product_code (str): Código original do produto
-        product_group (str): Grupo de produtos selecionado
-        fornecedor (str): Fornecedor selecionado
-
-    Returns:
-        str: Código normalizado (ou original se não houver regra)
-    """
-    if not product_code:
-        return product_code
-
-    # Remove espaços em branco
-    code = str(product_code).strip()
-
-    # GRUPO 0052 (JF)
-    if product_group == "0052" and fornecedor == "JF":
-        # Remove letras e mantém apenas números
-        numbers_only = ''.join(filter(str.isdigit, code))
-        # Garante 8 números (pad com zeros à direita se necessário)
-        numbers_only = numbers_only.ljust(8, '0')[:8]
-        # Adiciona ponto após os primeiros 2 números
-        if len(numbers_only) >= 2:
-            return f"{numbers_only[:2]}.{numbers_only[2:]}"
-        return numbers_only
-
-    # GRUPO 0009 (VENCE TUDO) - Sem mudanças
-    elif product_group == "0009":
-        return code
-
-    # GRUPO 0008 (JAN)
-    elif product_group == "0008" and fornecedor == "JAN":
-        # Remove tudo que não é número
-        numbers_only = ''.join(filter(str.isdigit, code))
-        # Deve ter 18 números, remove os primeiros 10
-        if len(numbers_only) >= 18:
-            last_8 = numbers_only[10:18]
-        else:
-            # Se não tem 18, usa os últimos 8 disponíveis
-            last_8 = numbers_only[-8:] if len(numbers_only) >= 8 else numbers_only.zfill(8)
-
-        # Formata: XXX.XX.XXX
-        if len(last_8) >= 8:
-            return f"{last_8[:3]}.{last_8[3:5]}.{last_8[5:]}"
-        return last_8
-
-    # GRUPO 0007 (TATU) - Retorna código sem formatação (validação dual será feita depois)
-    elif product_group == "0007" and fornecedor == "TATU":
-        # Remove tudo que não é número
-        numbers_only = ''.join(filter(str.isdigit, code))
-        return numbers_only
-
-    # GRUPO 0005 (MACDON)
-    elif product_group == "0005" and fornecedor == "MACDON":
-        # Remove zero inicial se existir
-        while code.startswith('0') and len(code) > 1:
-            code = code[1:]
-        return code
-
-    # GRUPO 0004 (JUMIL)
-    elif product_group == "0004" and fornecedor == "JUMIL":
-        # Remove tudo que não é número
-        numbers_only = ''.join(filter(str.isdigit, code))
-        # Pad com zeros à esquerda se necessário para ter 7 dígitos
-        numbers_only = numbers_only.zfill(7)
-        # Formata: XX.XX.XXX
-        if len(numbers_only) >= 7:
-            return f"{numbers_only[:2]}.{numbers_only[2:4]}.{numbers_only[4:7]}"
-        return numbers_only
-
-    # GRUPO 0003 (JACTO)
-    elif product_group == "0003" and fornecedor == "JACTO":
-        # Remove tudo que não é número
-        numbers_only = ''.join(filter(str.isdigit, code))
-
-        if len(numbers_only) == 4:
-            # 4 dígitos: 001.164 (preenche com zeros na frente)
-            return f"00{numbers_only[0]}.{numbers_only[1:]}"
-        elif len(numbers_only) == 7:
-            # 7 dígitos: 125.5351
-            return f"{numbers_only[:3]}.{numbers_only[3:]}"
-        else:
-            # Tenta detectar o padrão baseado no tamanho
-            if len(numbers_only) <= 4:
-                padded = numbers_only.zfill(4)
-                return f"00{padded[0]}.{padded[1:]}"
-            else:
-                # Assume formato de 7 dígitos
-                return f"{numbers_only[:3]}.{numbers_only[3:]}"
-
-    # GRUPO 0002 (KUHN) - Sem mudanças
-    elif product_group == "0002" and fornecedor == "KUHN":
-        return code
-
-    # GRUPO 0001 (HORSH) - Sem mudanças
-    elif product_group == "0001" and fornecedor == "HORSH":
-        return code
-
-    # OUTROS - Sem mudanças
-    elif product_group == "OUTROS" or fornecedor == "OUTROS":
-        return code
-
-    # Se não houver regra específica, retorna código original
-    return code
-
-
-def normalize_product_code_with_dots_0007(product_code):
-    """
-    Normaliza código do GRUPO 0007 (TATU) com pontos: XXX.XXXX.XXX
-
-    Args:
-        product_code (str): Código do produto (apenas números)
-
-    Returns:
-        str: Código formatado com pontos
-    """
-    # Remove tudo que não é número
-    numbers_only = ''.join(filter(str.isdigit, str(product_code)))
-
-    # Formata: XXX.XXXX.XXX
-    if len(numbers_only) >= 10:
-        return f"{numbers_only[:3]}.{numbers_only[3:7]}.{numbers_only[7:10]}"
-    elif len(numbers_only) >= 7:
-        # Se tiver menos de 10, tenta adaptar
-        return f"{numbers_only[:3]}.{numbers_only[3:7]}.{numbers_only[7:]}"
-
-    return numbers_only
-
-
-def validate_product_code(product_code, product_group):
-    """
-    Valida se o código do produto existe no cadastro do Protheus
-
-    IMPORTANTE: Esta função é um PLACEHOLDER que sempre retorna True
-    VOCÊ PRECISA IMPLEMENTAR A CHAMADA PARA SUA API PROTHEUS AQUI
-
-    Args:
-        product_code (str): Código do produto a validar
-        product_group (str): Grupo do produto para filtrar busca
-
-    Returns:
-        bool: True se código existe no Protheus, False caso contrário
-
-    Exemplo de implementação:
-        try:
-            response = requests.get(
-                'https://sua-api-protheus.com/produtos',
-                params={
-                    'codigo': product_code,
-                    'grupo': product_group
-                },
-                headers={'Authorization': f'Bearer {seu_token}'},
-                timeout=10
-            )
-            return response.status_code == 200 and response.json().get('exists', False)
-        except Exception as e:
-            print(f'Erro ao validar produto: {e}')
-            return False
-    """
-    # TODO: REMOVA ESTA LINHA e adicione sua chamada de API acima
-    return True
-
-
-def validate_supplier_code(supplier_code):
-    """
-    Valida se o código do fornecedor existe no cadastro do Protheus
-
-    IMPORTANTE: Esta função é um PLACEHOLDER que sempre retorna True
-    VOCÊ PRECISA IMPLEMENTAR A CHAMADA PARA SUA API PROTHEUS AQUI
-
-    Args:
-        supplier_code (str): Código do fornecedor a validar
-
-    Returns:
-        bool: True se código existe no Protheus, False caso contrário
-
-    Exemplo de implementação:
-        try:
-            response = requests.get(
-                'https://sua-api-protheus.com/fornecedores',
-                params={'codigo': supplier_code},
-                headers={'Authorization': f'Bearer {seu_token}'},
-                timeout=10
-            )
-            return response.status_code == 200 and response.json().get('exists', False)
-        except Exception as e:
-            print(f'Erro ao validar fornecedor: {e}')
-            return False
-    """
-    # TODO: REMOVA ESTA LINHA e adicione sua chamada de API acima
-    return True
-
-
 @login_required
 def reprocess_batch(request, batch_code):
     """
     Reprocessa validação de um lote
     """
     batch = get_object_or_404(ProductBatch, batch_code=batch_code)
+    synced = batch.synced_to_protheus or batch.products.filter(synced_to_protheus=True).exists()
+
+    # With the parsed cache, rebuild products from the original codes (memory-mapped,
+    # without re-reading the uploaded file) using the batch's current normalization.
+    # Batches already sent to Protheus keep their products (and sync state)
+    if batch.file_upload.parsed_cache and batch.file_upload.import_mode == 'FULL' and not synced:
+        try:
+            result = FileProcessor(batch.file_upload).rebuild_from_cache(batch)
+            messages.info(
+                request,
+                f"Lote reconstruído a partir do arquivo original: {result['saved']} de {result['total']} produtos. "
+                f"Valide novamente os códigos."
+            )
+            return redirect('Main:product_list')
+        except Exception as e:
+            logger.error(f"Erro ao reconstruir lote {batch_code} do cache: {str(e)}")
 
     # Reset validation status for all products in batch
     Product.objects.filter(batch=batch).update(
         validation_status='PENDING',
         product_code_validated=False,
         supplier_code_validated=False,
-        validation_error=None
+        validation_error=None,
+        updated_at=timezone.now()
     )
+    prevalidate_batch(batch)
 
     messages.info(request, "Lote marcado para reprocessamento. Valide novamente os códigos.")
 
@@ -515,16 +447,20 @@ def reprocess_batch(request, batch_code):
 
 
 @login_required
-def submit_to_protheus(request, batch_code):
+async def submit_to_protheus(request, batch_code):
     """
     Submete apenas produtos VALIDADOS para Protheus via API REST
     Cria um Pedido de Compra no Protheus usando MATA120
+
+    Assíncrona: sob ASGI a espera pelo Protheus não ocupa um worker
     """
-    import requests
+    import httpx
     from datetime import datetime
-    from django.conf import settings
 
-    batch = get_object_or_404(ProductBatch, batch_code=batch_code)
+    try:
+        batch = await ProductBatch.objects.aget(batch_code=batch_code)
+    except ProductBatch.DoesNotExist:
+        raise Http404(f"Lote {batch_code} não encontrado")
 
     # Apenas POST é permitido
     if request.method != 'POST':
@@ -553,12 +489,15 @@ def submit_to_protheus(request, batch_code):
     # Filtra apenas produtos com status VALID
     valid_products = Product.objects.filter(batch=batch, validation_status='VALID')
 
-    if valid_products.count() == 0:
+    products = [
+        product async for product in valid_products.only('pk', 'product_code', 'supplier_code', 'quantity', 'unit_value')
+    ]
+    if not products:
         messages.warning(request, "Nenhum produto válido para submeter ao Protheus.")
         return redirect('Main:validation_table', batch_code=batch_code)
 
     # Pega o fornecedor do primeiro produto válido
-    fornecedor = valid_products.first().supplier_code
+    fornecedor = products[0].supplier_code
     if not fornecedor:
         messages.error(request, "Código do fornecedor não encontrado nos produtos.")
         return redirect('Main:validation_table', batch_code=batch_code)
@@ -570,13 +509,13 @@ def submit_to_protheus(request, batch_code):
             data_obj = datetime.strptime(data_emissao, '%Y-%m-%d')
             data_emissao_formatada = data_obj.strftime('%d/%m/%Y')
         except ValueError:
-            data_emissao_formatada = datetime.now().strftime('%d/%m/%Y')
+            data_emissao_formatada = timezone.localdate().strftime('%d/%m/%Y')
     else:
-        data_emissao_formatada = datetime.now().strftime('%d/%m/%Y')
+        data_emissao_formatada = timezone.localdate().strftime('%d/%m/%Y')
 
     # Monta array de itens
     itens = []
-    for product in valid_products:
+    for product in products:
         item = {
             "produto": product.product_code,
             "quantidade": float(product.quantity) if product.quantity else 1.0,
@@ -594,39 +533,29 @@ def submit_to_protheus(request, batch_code):
         "itens": itens
     }
 
-    # URL da API Protheus (configurável via settings)
-    protheus_api_url = getattr(settings, 'PROTHEUS_API_URL', 'http://localhost:8080')
-    api_endpoint = f"{protheus_api_url}/rest/PRODCHECK/createPedidoCompra"
-
     try:
-        # Chama API Protheus com header TENANTID
-        response = requests.post(
-            api_endpoint,
-            json=payload,
-            headers={
-                'Content-Type': 'application/json',
-                'tenantid': filial
-            },
-            timeout=30
-        )
+        # Chama API Protheus com header TENANTID (cliente com pool de conexões do worker)
+        async with async_protheus_client(request) as client:
+            response = await client.create_purchase_order(payload, filial)
 
         if response.status_code == 200:
             # Sucesso - marca produtos como sincronizados
             response_data = response.json()
             numero_pedido = response_data.get('numero_pedido', 'N/A')
 
-            for product in valid_products:
-                product.synced_to_protheus = True
-                product.protheus_sync_date = datetime.now()
-                product.save()
+            now = timezone.now()
+            await Product.objects.filter(pk__in=[product.pk for product in products]).aupdate(
+                synced_to_protheus=True, protheus_sync_date=now, updated_at=now
+            )
 
             batch.synced_to_protheus = True
-            batch.save()
+            batch.synced_at = now
+            await batch.asave(update_fields=['synced_to_protheus', 'synced_at', 'updated_at'])
 
             messages.success(
                 request,
                 f"Pedido de Compra {numero_pedido} criado com sucesso! "
-                f"{valid_products.count()} produto(s) sincronizado(s)."
+                f"{len(products)} produto(s) sincronizado(s)."
             )
         else:
             # Erro na API
@@ -637,11 +566,11 @@ def submit_to_protheus(request, batch_code):
             )
             return redirect('Main:validation_table', batch_code=batch_code)
 
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         messages.error(request, "Timeout ao conectar com API Protheus. Tente novamente.")
         return redirect('Main:validation_table', batch_code=batch_code)
 
-    except requests.exceptions.ConnectionError:
+    except httpx.TransportError:
         messages.error(request, "Erro de conexão com API Protheus. Verifique a URL e conectividade.")
         return redirect('Main:validation_table', batch_code=batch_code)
 
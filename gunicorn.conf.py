@@ -0,0 +1,130 @@
+"""
+Configuração do gunicorn (produção)
+
+Carregada com `gunicorn -c gunicorn.conf.py` (Dockerfile e Procfile). Tudo é
+ajustável por variáveis de ambiente (ou .env, via python-decouple):
+
+    GUNICORN_WORKER_CLASS   uvicorn (ASGI, padrão), gthread ou sync (WSGI)
+    GUNICORN_WORKERS        0 = automático pelos CPUs do container (WEB_CONCURRENCY também vale)
+    GUNICORN_MAX_WORKERS    teto do cálculo automático (cada worker carrega pandas)
+    GUNICORN_THREADS        threads por worker no gthread
+    GUNICORN_MAX_REQUESTS   reinicia o worker após N requisições (contém o crescimento de memória)
+    GUNICORN_PRELOAD        carrega a aplicação no master antes do fork (páginas compartilhadas)
+"""
+import gc
+import math
+import multiprocessing
+import os
+
+# Importado com outro nome: `config` é uma opção do gunicorn (o próprio arquivo)
+from decouple import config as env
+
+WORKER_CLASSES = {
+    'uvicorn': 'uvicorn_worker.UvicornWorker',
+    'gthread': 'gthread',
+    'sync': 'sync',
+}
+
+APPLICATIONS = {
+    'uvicorn': 'portalweb.asgi:application',
+    'gthread': 'portalweb.wsgi:application',
+    'sync': 'portalweb.wsgi:application',
+}
+
+
+def _cgroup_cpu_quota():
+    """
+    Cota de CPU do container (cgroup v2 ou v1), em CPUs; None sem limite
+    """
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as cpu_max:
+            quota, period = cpu_max.read().split()[:2]
+        if quota != 'max':
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as quota_file, \
+                open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as period_file:
+            quota, period = int(quota_file.read()), int(period_file.read())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def cpu_count() -> int:
+    """
+    CPUs utilizáveis: afinidade do processo, limitada pela cota do cgroup
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = multiprocessing.cpu_count()
+    quota = _cgroup_cpu_quota()
+    if quota:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+
+def auto_workers(profile: str, cpus: int, max_workers: int) -> int:
+    # uvicorn atende muitas requisições por worker (a espera pelo Protheus é
+    # assíncrona): um por CPU. gthread/sync bloqueiam durante a requisição: 2N+1
+    workers = cpus if profile == 'uvicorn' else 2 * cpus + 1
+    return max(2, min(workers, max_workers))
+
+
+profile = env('GUNICORN_WORKER_CLASS', default='uvicorn').lower()
+if profile not in WORKER_CLASSES:
+    raise ValueError(f"GUNICORN_WORKER_CLASS inválido: {profile} (use {', '.join(WORKER_CLASSES)})")
+
+wsgi_app = APPLICATIONS[profile]
+worker_class = WORKER_CLASSES[profile]
+
+bind = env('GUNICORN_BIND', default=f"0.0.0.0:{env('PORT', default='3000')}")
+
+workers = env('GUNICORN_WORKERS', default=env('WEB_CONCURRENCY', default=0, cast=int), cast=int)
+if workers <= 0:
+    workers = auto_workers(profile, cpu_count(), env('GUNICORN_MAX_WORKERS', default=8, cast=int))
+
+# No worker sync, threads > 1 faria o gunicorn trocar para gthread
+threads = env('GUNICORN_THREADS', default=4, cast=int) if profile == 'gthread' else 1
+
+timeout = env('GUNICORN_TIMEOUT', default=30, cast=int)
+graceful_timeout = env('GUNICORN_GRACEFUL_TIMEOUT', default=30, cast=int)
+keepalive = env('GUNICORN_KEEPALIVE', default=5, cast=int)
+
+# Reciclagem dos workers: o pandas/openpyxl não devolvem toda a memória ao SO
+# depois de um arquivo grande; o jitter evita que todos reiniciem juntos
+max_requests = env('GUNICORN_MAX_REQUESTS', default=1000, cast=int)
+max_requests_jitter = env('GUNICORN_MAX_REQUESTS_JITTER', default=max(1, max_requests // 10), cast=int)
+
+preload_app = env('GUNICORN_PRELOAD', default=True, cast=bool)
+
+# Heartbeat dos workers em memória (o /tmp de containers pode ser disco lento)
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+# Sem access log por padrão: o QueryTimingMiddleware já registra cada requisição
+# (logger 'portalweb.db', configurado em LOGGING no settings)
+loglevel = env('GUNICORN_LOG_LEVEL', default='info')
+accesslog = env('GUNICORN_ACCESS_LOG', default='') or None
+errorlog = '-'
+
+
+def pre_fork(server, worker):
+    # Objetos já carregados no master (Django, views, DRF) vão para a geração
+    # permanente: o coletor dos workers não os toca e as páginas seguem compartilhadas.
+    # A pilha de parse (pandas, lxml) é importada sob demanda, só nos workers que processam uploads
+    if preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    # Conexões abertas no master durante o preload não podem ser herdadas
+    if preload_app:
+        from django.db import connections
+        connections.close_all()
@@ -0,0 +1,164 @@
+import heapq
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('portalweb.db')
+
+
+class _AliasStats:
+    """
+    Acumula contagem, tempo total e as consultas mais lentas de um alias
+    """
+    __slots__ = ('alias', 'count', 'duration', 'slowest', 'top_n')
+
+    def __init__(self, alias, top_n):
+        self.alias = alias
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = []
+        self.top_n = top_n
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            # Heap mínimo de tamanho fixo: só guarda o SQL das N consultas mais lentas
+            if len(self.slowest) < self.top_n:
+                heapq.heappush(self.slowest, (elapsed, self.count, sql))
+            elif elapsed > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (elapsed, self.count, sql))
+
+    def as_dict(self):
+        return {
+            'queries': self.count,
+            'duration_ms': round(self.duration * 1000, 2),
+            'slowest': [
+                {'duration_ms': round(elapsed * 1000, 2), 'sql': sql[:300]}
+                for elapsed, _, sql in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+
+class QueryTimingMiddleware:
+    """
+    Registra, por requisição e por alias de banco, a quantidade de consultas,
+    o tempo total no banco e as consultas mais lentas.
+
+    Os números são enviados como campos estruturados no log ('portalweb.db')
+    e no header Server-Timing. Requisições acima de QUERY_TIMING_SLOW_REQUEST_MS
+    geram um log de aviso com as consultas mais lentas.
+
+    Funciona em WSGI (gunicorn) e ASGI (uvicorn) sem adaptar a cadeia de
+    middlewares para o outro modo.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'QUERY_TIMING_ENABLED', True)
+        self.slow_request_ms = getattr(settings, 'QUERY_TIMING_SLOW_REQUEST_MS', 1000)
+        self.top_n = getattr(settings, 'QUERY_TIMING_TOP_QUERIES', 3)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        stats = [_AliasStats(alias, self.top_n) for alias in connections]
+
+        start = time.perf_counter()
+        with self._wrap_connections(stats):
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+
+        self._add_server_timing(response, stats, total_ms)
+        self._log(request, response, stats, total_ms)
+
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        stats = [_AliasStats(alias, self.top_n) for alias in connections]
+
+        start = time.perf_counter()
+        # No ASGI as consultas (views síncronas e sync_to_async) rodam numa
+        # thread própria da requisição, com as conexões daquela thread: os
+        # wrappers são instalados e removidos nela
+        stack = await sync_to_async(self._wrap_connections)(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        total_ms = (time.perf_counter() - start) * 1000
+
+        self._add_server_timing(response, stats, total_ms)
+        self._log(request, response, stats, total_ms)
+
+        return response
+
+    @staticmethod
+    def _wrap_connections(stats) -> ExitStack:
+        stack = ExitStack()
+        for alias_stats in stats:
+            stack.enter_context(connections[alias_stats.alias].execute_wrapper(alias_stats))
+        return stack
+
+    def _add_server_timing(self, response, stats, total_ms):
+        metrics = [
+            f'db-{s.alias};dur={s.duration * 1000:.2f};desc="{s.count} queries"'
+            for s in stats if s.count
+        ]
+        metrics.append(f'total;dur={total_ms:.2f}')
+
+        existing = response.get('Server-Timing')
+        if existing:
+            metrics.insert(0, existing)
+        response['Server-Timing'] = ', '.join(metrics)
+
+    def _log(self, request, response, stats, total_ms):
+        db_queries = sum(s.count for s in stats)
+        db_time_ms = sum(s.duration for s in stats) * 1000
+        is_slow = total_ms >= self.slow_request_ms
+
+        level = logging.WARNING if is_slow else logging.INFO
+        if not logger.isEnabledFor(level):
+            return
+
+        extra = {
+            'http_method': request.method,
+            'http_path': request.path,
+            'http_status': response.status_code,
+            'duration_ms': round(total_ms, 2),
+            'db_queries': db_queries,
+            'db_time_ms': round(db_time_ms, 2),
+            'db_aliases': {s.alias: s.as_dict() for s in stats if s.count},
+        }
+
+        if is_slow:
+            logger.warning(
+                f"Requisição lenta: {request.method} {request.path} "
+                f"{total_ms:.0f}ms ({db_queries} consultas, {db_time_ms:.0f}ms no banco)",
+                extra=extra
+            )
+        else:
+            logger.info(
+                f"{request.method} {request.path} {total_ms:.0f}ms "
+                f"({db_queries} consultas, {db_time_ms:.0f}ms no banco)",
+                extra=extra
+            )
@@ -35,6 +35,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'portalweb.middleware.QueryTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -78,7 +79,9 @@ if DATABASE_URL:
     DATABASES = {
         'default': dj_database_url.config(
             default=DATABASE_URL,
-            conn_max_age=600,
+            # Served by ASGI (uvicorn workers): persistent connections are not reused
+            # across requests there and must stay disabled (0)
+            conn_max_age=config('DB_CONN_MAX_AGE', default=0, cast=int),
             conn_health_checks=True,
         )
     }
@@ -169,6 +172,128 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Cache framework. Defaults to per-process memory; point CACHE_BACKEND/CACHE_LOCATION
+# at a shared backend (e.g. Redis) to share entries across gunicorn workers
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='portalweb'),
+    }
+}
+
+# Polled API lists (Main.api.caching): conditional GET via ETag/Last-Modified, plus the
+# serialized data cached for API_CACHE_TTL seconds (0 disables) when the response has
+# at most API_CACHE_MAX_ROWS rows. Entries are keyed by the data version, so writes
+# to products or batches invalidate them
+API_CACHE_TTL = config('API_CACHE_TTL', default=10, cast=int)
+API_CACHE_MAX_ROWS = config('API_CACHE_MAX_ROWS', default=10000, cast=int)
+
+# Query timing instrumentation (portalweb.middleware.QueryTimingMiddleware)
+QUERY_TIMING_ENABLED = config('QUERY_TIMING_ENABLED', default=True, cast=bool)
+QUERY_TIMING_SLOW_REQUEST_MS = config('QUERY_TIMING_SLOW_REQUEST_MS', default=1000, cast=int)
+QUERY_TIMING_TOP_QUERIES = config('QUERY_TIMING_TOP_QUERIES', default=3, cast=int)
+
+# Logging to stderr (collected by gunicorn/uvicorn and the container). The per-request
+# lines of QueryTimingMiddleware ('portalweb.db') replace gunicorn's access log
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'default': {
+            'format': '%(asctime)s %(levelname)s [%(name)s] %(message)s',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'default',
+        },
+    },
+    'loggers': {
+        'portalweb': {
+            'handlers': ['console'],
+            'level': config('QUERY_TIMING_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+        'Main': {
+            'handlers': ['console'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}
+
 # File Upload Settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
-DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
\ No newline at end of file
+DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
+# Upload page streams files straight to MEDIA_ROOT (Main.uploadhandlers), so memory
+# use does not grow with file size
+UPLOAD_MAX_SIZE = config('UPLOAD_MAX_SIZE', default=104857600, cast=int)  # 100MB
+# Multi-file upload (ZIP or several files): most files accepted per upload
+MULTI_UPLOAD_MAX_FILES = config('MULTI_UPLOAD_MAX_FILES', default=200, cast=int)
+# Most bytes extracted from one ZIP (sum of the members' uncompressed sizes)
+MULTI_UPLOAD_MAX_TOTAL_SIZE = config('MULTI_UPLOAD_MAX_TOTAL_SIZE', default=1073741824, cast=int)  # 1GB
+
+# Upload processing metrics: peak memory per stage uses tracemalloc, which is
+# process-wide and slows every thread of the worker while enabled; off by default
+UPLOAD_TRACK_MEMORY = config('UPLOAD_TRACK_MEMORY', default=False, cast=bool)
+
+# File parsing executor (Main.services.parse_executor)
+# 'process' sends parsing to a bounded process pool; 'inline' parses in the request process
+PARSE_EXECUTOR_BACKEND = config('PARSE_EXECUTOR_BACKEND', default='process')
+PARSE_POOL_SIZE = config('PARSE_POOL_SIZE', default=2, cast=int)
+PARSE_CPU_TIME_LIMIT = config('PARSE_CPU_TIME_LIMIT', default=120, cast=int)
+PARSE_CHUNK_SIZE = config('PARSE_CHUNK_SIZE', default=5000, cast=int)
+# Pool workers start from a clean interpreter: fork would copy the gunicorn worker's
+# threads, locks and open connections into the pool process
+PARSE_POOL_START_METHOD = config('PARSE_POOL_START_METHOD', default='forkserver')
+# Longest wait (seconds) for a parse result, including time queued behind other uploads
+PARSE_TIMEOUT = config('PARSE_TIMEOUT', default=600, cast=int)
+
+# Product exports (Main.services.export): rows read from the database per chunk
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Columnar cache of each upload's parsed output (Main.services.parsed_cache), used by
+# batch reprocessing; requires pyarrow
+PARSED_CACHE_ENABLED = config('PARSED_CACHE_ENABLED', default=True, cast=bool)
+
+# Product code validation results (Main.models.ValidationResult) are reused across
+# batches for this many seconds before the registry is queried again
+VALIDATION_CACHE_TTL = config('VALIDATION_CACHE_TTL', default=86400, cast=int)
+# "Not found" results expire sooner: the product may be registered in Protheus right after
+VALIDATION_NEGATIVE_CACHE_TTL = config('VALIDATION_NEGATIVE_CACHE_TTL', default=300, cast=int)
+
+# Protheus REST API (PRODCHECK). Product codes are checked in bulk through seekProdutos,
+# split into requests of at most PROTHEUS_SEEK_CHUNK_SIZE codes over a pooled session
+PROTHEUS_API_URL = config('PROTHEUS_API_URL', default='http://localhost:8080')
+PROTHEUS_SEEK_PATH = config('PROTHEUS_SEEK_PATH', default='/rest/PRODCHECK/api/seekProdutos')
+PROTHEUS_SEEK_CHUNK_SIZE = config('PROTHEUS_SEEK_CHUNK_SIZE', default=500, cast=int)
+PROTHEUS_SEEK_CONCURRENCY = config('PROTHEUS_SEEK_CONCURRENCY', default=2, cast=int)
+PROTHEUS_TIMEOUT = config('PROTHEUS_TIMEOUT', default=30, cast=int)
+# Connection pool of the async client used by the async views (one pool per ASGI worker)
+PROTHEUS_MAX_CONNECTIONS = config('PROTHEUS_MAX_CONNECTIONS', default=20, cast=int)
+# Where product codes are checked: 'registry' (local SB1 mirror), 'seek' (seekProdutos)
+# or 'auto' (the mirror once it has been synced, seekProdutos until then)
+PRODUCT_VALIDATION_SOURCE = config('PRODUCT_VALIDATION_SOURCE', default='auto')
+
+# Local mirror of the Protheus registries (SB1/SA2), refreshed by the
+# sync_protheus_registry command. Source: 'rest', 'odbc' or 'stub'
+REGISTRY_SOURCE = config('REGISTRY_SOURCE', default='rest')
+REGISTRY_PAGE_SIZE = config('REGISTRY_PAGE_SIZE', default=1000, cast=int)
+REGISTRY_REST_PATHS = {
+    'products': config('REGISTRY_REST_PRODUCTS_PATH', default='/rest/PRODCHECK/api/produtos'),
+    'suppliers': config('REGISTRY_REST_SUPPLIERS_PATH', default='/rest/PRODCHECK/api/fornecedores'),
+}
+# e.g. DRIVER={ODBC Driver 18 for SQL Server};SERVER=...;DATABASE=...;UID=...;PWD=...
+PROTHEUS_ODBC_CONNECTION = config('PROTHEUS_ODBC_CONNECTION', default='')
+PROTHEUS_TABLE_SUFFIX = config('PROTHEUS_TABLE_SUFFIX', default='010')
+# Time zone of the Protheus database server: S_T_A_M_P_ holds naive local times
+PROTHEUS_TIME_ZONE = config('PROTHEUS_TIME_ZONE', default=TIME_ZONE)
+# Seconds between checks for a newer registry sync before the in-memory code index is rebuilt
+REGISTRY_INDEX_CHECK_INTERVAL = config('REGISTRY_INDEX_CHECK_INTERVAL', default=30, cast=int)
+
+# Fiscal reference tables (NCM/TIPI, loaded with load_fiscal_tables) and accepted ICMS rates
+FISCAL_TABLES_CHECK_INTERVAL = config('FISCAL_TABLES_CHECK_INTERVAL', default=300, cast=int)
+# Comma-separated ICMS rates (e.g. 0,4,7,12,18); empty disables the ICMS rate check
+FISCAL_ICMS_RATES = config('FISCAL_ICMS_RATES', default='')